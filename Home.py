@@ -1,17 +1,9 @@
 # Home.py
 import os
 import streamlit as st
-from dotenv import load_dotenv
-load_dotenv()
 st.set_page_config(page_title="Home — Superteam Student Sprint", page_icon="🏠", layout="wide")
-
-# --- Imports from your app (for live stats) ---
-try:
-    from src.db import db_init, recap_stats
-    db_init()
-    stats = recap_stats()
-except Exception:
-    stats = {"students": 0, "subs": 0, "approved": 0}
+# .env is loaded by src.db on import; the static sections below render before
+# any backend work, so a cold worker shows the page before the first query
 
 # --- HERO ---
 st.markdown("# 🚀 Superteam Student Sprint")
@@ -36,6 +28,13 @@ st.info("Tip: Keep your **Telegram** & **X (Twitter)** handles handy for quick v
 st.divider()
 
 # --- Live Snapshot ---
+try:
+    from src.db import db_init, recap_stats
+    db_init()
+    stats = recap_stats()
+except Exception:
+    stats = {"students": 0, "subs": 0, "approved": 0}
+
 st.subheader("📈 Live Snapshot")
 c1, c2, c3 = st.columns(3)
 c1.metric("New Students", stats.get("students", 0))
@@ -117,3 +116,11 @@ st.caption(
     "Built with Streamlit • OpenAI (agentic micro-quests) • Supabase (Postgres + Storage). "
     "Falls back to SQLite locally. Made for Superteam Ireland students."
 )
+
+# fill the micro-quest pools for every track in the background (once per
+# process), after the page is out
+try:
+    from src.agent import warm_up
+    warm_up()
+except Exception as e:
+    print("warm_up_error:", e)
@@ -25,7 +25,14 @@ button[title="Menu"] { display: none !important; }
 
 
 
-from src.db import db_init, admin_list_subs, admin_set_status, export_users_csv
+from src.db import (
+    db_init, admin_list_subs_page, get_submission, export_users_csv,
+    change_cursor, changes_since,
+    get_signed_url, get_signed_urls,
+    admin_set_status, admin_set_status_many, admin_set_status_matching,
+    llm_metrics_summary, search_subs, import_users_csv,
+)
+from src import analytics, review
 
 st.set_page_config(page_title="Admin — Superteam Sprint", page_icon="🛡️", layout="wide")
 st.title("🛡️ Admin")
@@ -38,36 +45,281 @@ if pw != os.getenv("ADMIN_PASS", "superteamsolana"):
 
 st.success("Admin unlocked")
 
-try:
-    subs = admin_list_subs(status_filter="pending")
-except Exception as e:
-    st.error(f"Backend error while listing submissions: {e}")
-    subs = []
-
-st.write(f"Pending submissions: {len(subs)}")
-for s in subs:
-    with st.expander(f"User {s.get('user_id')} — Q{s.get('quest_idx')} {s.get('title')} ({s.get('track')})"):
-        st.write(f"Note: {s.get('text') or ''}")
-        if s.get("file_path"):
-            try:
-                from src.db_supabase import get_signed_url
-                st.image(get_signed_url(s["file_path"]), use_container_width=True)
-            except Exception:
-                st.write("Uploaded file:", s["file_path"])
-        c1, c2 = st.columns(2)
-        if c1.button("Approve", key=f"a_{s['id']}"):
+# --- review queue: one keyset page at a time, proof loaded on demand ---
+# a search query swaps the pending queue for ranked matches across all statuses.
+# The page is loaded once per navigation; after that a fragment polls the
+# change feed every ADMIN_POLL_SECONDS and patches just the rows that changed
+# (approved/rejected items drop out, edits show, new pending ones appear on
+# page 1), so other reviewers' decisions show up without a reload.
+ADMIN_POLL_SECONDS = float(os.getenv("ADMIN_POLL_SECONDS", "5"))
+# st.fragment on Streamlit >= 1.37, experimental_fragment before; without
+# either the queue is patched on every interaction instead of on a timer
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+
+if "admin_cursors" not in st.session_state:
+    st.session_state.admin_cursors = [None]   # cursor that starts each visited page
+q1, q2, q3 = st.columns([4, 1, 2])
+query = q1.text_input("Search proofs", placeholder="student name, @handle, quest title or proof text").strip()
+page_size = q2.selectbox("Per page", [10, 25, 50, 100], index=1)
+# pages stay newest-first; this orders the rows within the page
+order = q3.selectbox("Order on page", ["Newest first", "Auto-review: likely approvals first"])
+if (st.session_state.get("admin_page_size"), st.session_state.get("admin_query")) != (page_size, query):
+    st.session_state.admin_page_size, st.session_state.admin_query = page_size, query
+    st.session_state.admin_cursors = [None]
+    st.session_state.pop("admin_view", None)
+cursors = st.session_state.admin_cursors
+
+_VERDICT_ICONS = {"approve": "✅", "reject": "❌", "unsure": "❓"}
+
+# --- auto-review: rubric checks + LLM verdicts on pending proofs (src/review.py) ---
+with st.expander("🤖 Auto-review"):
+    st.caption("Pre-reviews pending proofs against prompts/quest_rubrics.json. Handle quests and empty "
+               "proofs are checked locally; verdicts are cached, so re-runs only cost LLM calls for new proofs.")
+    r1, r2 = st.columns(2)
+    if r1.button("Pre-review pending"):
+        with st.spinner("Reviewing…"):
             try:
-                admin_set_status(s["id"], "approved"); st.rerun()
+                rs = review.review_pending()
             except Exception as e:
-                st.error(f"Approve failed: {e}")
-        if c2.button("Reject", key=f"r_{s['id']}"):
+                st.error(f"Auto-review failed: {e}")
+            else:
+                st.session_state.admin_flash = (
+                    f"Reviewed {rs['seen']}: {rs['approve']} approve, {rs['reject']} reject, {rs['unsure']} unsure "
+                    f"({rs['cached']} cached, {rs['local']} local, {rs['llm']} LLM); "
+                    f"{rs['llm_failed'] + rs['no_llm']} left for the next run (LLM failed or not configured).")
+    if r1.button("Re-review all (ignore stored verdicts)"):
+        with st.spinner("Reviewing…"):
             try:
-                admin_set_status(s["id"], "rejected"); st.rerun()
+                rs = review.review_pending(force=True)
+                st.session_state.admin_flash = f"Re-reviewed {rs['seen']} ({rs['cached']} from cache)."
             except Exception as e:
-                st.error(f"Reject failed: {e}")
+                st.error(f"Auto-review failed: {e}")
+    threshold = r2.slider("Auto-approve at confidence ≥", 0.5, 1.0, review.REVIEW_AUTO_APPROVE, 0.01)
+    try:
+        ready = review.confident(threshold)
+    except Exception as e:
+        st.warning(f"Could not count confident verdicts: {e}")
+        ready = []
+    if r2.button(f"Approve {len(ready)} high-confidence", disabled=not ready):
+        try:
+            n = admin_set_status_many(ready, "approved")
+            st.session_state.admin_flash = f"Auto-approved {n} submission(s)."
+            st.session_state.admin_cursors = [None]
+            st.session_state.pop("admin_view", None)
+            st.rerun()
+        except Exception as e:
+            st.error(f"Auto-approve failed: {e}")
+
+def _load_view():
+    head = change_cursor()    # taken first: changes racing the load are replayed (harmless)
+    # (opaque: an int on SQLite, [seq, recent seqs] on Supabase)
+    try:
+        if query:
+            rows, nxt = search_subs(query, limit=page_size, cursor=cursors[-1])
+        else:
+            rows, nxt = admin_list_subs_page(status_filter="pending", limit=page_size, cursor=cursors[-1])
+    except Exception as e:
+        st.error(f"Backend error while listing submissions: {e}")
+        rows, nxt = [], None
+    return {"rows": rows, "next": nxt, "feed": head, "new": set()}
+
+def _patch(view):
+    """Apply changes_since(view["feed"]) to the rows on screen."""
+    changes, cur = [], view["feed"]
+    try:
+        while True:
+            batch, cur = changes_since(cur)
+            changes += batch
+            if len(batch) < 500:
+                break
+    except Exception as e:
+        st.warning(f"Could not poll for changes: {e}")
+        return
+    view["feed"] = cur
+    index = {r["id"]: r for r in view["rows"]}
+    for c in changes:
+        if c["id"] in index:
+            index[c["id"]].update(c)          # search rows keep their `name`
+        elif not query and c["status"] == "pending":
+            if len(cursors) == 1:
+                index[c["id"]] = c
+            else:
+                view["new"].add(c["id"])
+    if query:
+        view["rows"] = list(index.values())   # rank order, statuses shown
+    else:
+        view["rows"] = sorted((r for r in index.values() if r["status"] == "pending"),
+                              key=lambda r: (r["created_at"], r["id"]), reverse=True)
+        view["new"] -= {c["id"] for c in changes if c["status"] != "pending"}
+
+def _queue():
+    view = st.session_state.get("admin_view")
+    if view is None:
+        view = st.session_state.admin_view = _load_view()
+    else:
+        _patch(view)
+    subs, next_cursor = view["rows"], view["next"]
+
+    # sign previews only for items whose proof is open, all in one request;
+    # the list shows thumbnails (older rows without one fall back to the original)
+    open_paths = [s.get("thumb_path") or s["file_path"] for s in subs
+                  if s.get("file_path") and st.session_state.get(f"show_{s['id']}")]
+    try:
+        previews = get_signed_urls(open_paths) if open_paths else {}
+    except Exception as e:
+        st.warning(f"Could not sign previews: {e}")
+        previews = {}
+
+    if query:
+        st.write(f"Matches for “{query}” — page {len(cursors)} ({len(subs)} shown)")
+    else:
+        st.write(f"Pending submissions — page {len(cursors)} ({len(subs)} shown)")
+    if order != "Newest first":
+        subs = sorted(subs, key=review.sort_key)
+    if view["new"] and st.button(f"🔔 {len(view['new'])} new pending — go to newest"):
+        st.session_state.admin_cursors = [None]
+        st.session_state.pop("admin_view", None)
+        st.rerun()
+    for s in subs:
+        sel, body = st.columns([1, 24])
+        sel.checkbox("Select", key=f"sel_{s['id']}", label_visibility="collapsed")
+        who = s.get("name") or f"User {s.get('user_id')}"
+        state = f" [{s.get('status')}]" if query else ""
+        badge = ""
+        if s.get("review_verdict"):
+            badge = f" 🤖{_VERDICT_ICONS.get(s['review_verdict'], '')} {s.get('review_confidence') or 0:.2f}"
+        with body.expander(f"{who} — Q{s.get('quest_idx')} {s.get('title')} ({s.get('track')}){state}{badge}"):
+            if st.toggle("Show proof", key=f"show_{s['id']}"):
+                full = get_submission(s["id"])
+                st.write(f"Note: {full.get('text') or ''}")
+                if full.get("file_path"):
+                    preview = full.get("thumb_path") or full["file_path"]
+                    try:
+                        st.image(previews.get(preview) or preview)
+                        if full.get("thumb_path") and st.toggle("Full size", key=f"full_{s['id']}"):
+                            st.image(get_signed_url(full["file_path"]), use_container_width=True)
+                    except Exception:
+                        st.write("Uploaded file:", full["file_path"])
+            c1, c2 = st.columns(2)
+            # a full rerun (not a reload): the next _patch() picks the change up
+            if c1.button("Approve", key=f"a_{s['id']}"):
+                try:
+                    admin_set_status(s["id"], "approved"); st.rerun()
+                except Exception as e:
+                    st.error(f"Approve failed: {e}")
+            if c2.button("Reject", key=f"r_{s['id']}"):
+                try:
+                    admin_set_status(s["id"], "rejected"); st.rerun()
+                except Exception as e:
+                    st.error(f"Reject failed: {e}")
+
+    # --- bulk actions: one backend call and one rerun per batch ---
+    def _run_batch(label, fn):
+        try:
+            n = fn()
+        except Exception as e:
+            st.error(f"{label} failed: {e}")
+            return
+        for s in subs:
+            st.session_state.pop(f"sel_{s['id']}", None)
+        if st.session_state.admin_cursors != [None]:
+            st.session_state.admin_cursors = [None]
+            st.session_state.pop("admin_view", None)
+        st.session_state.admin_flash = f"{label}: {n} submission(s) updated."
+        st.rerun()
+
+    selected = [s["id"] for s in subs if st.session_state.get(f"sel_{s['id']}")]
+    page_ids = [s["id"] for s in subs]
+    b1, b2, b3, b4 = st.columns(4)
+    if b1.button(f"Approve selected ({len(selected)})", disabled=not selected):
+        _run_batch("Approve selected", lambda: admin_set_status_many(selected, "approved"))
+    if b2.button(f"Reject selected ({len(selected)})", disabled=not selected):
+        _run_batch("Reject selected", lambda: admin_set_status_many(selected, "rejected"))
+    if b3.button("Approve all on this page", disabled=not page_ids):
+        _run_batch("Approve page", lambda: admin_set_status_many(page_ids, "approved"))
+    confirm_all = b4.checkbox("Confirm: every pending item")
+    if b4.button("Approve all pending", disabled=not confirm_all):
+        _run_batch("Approve all pending", lambda: admin_set_status_matching("pending", "approved"))
+    if "admin_flash" in st.session_state:
+        st.success(st.session_state.pop("admin_flash"))
+
+    p1, p2, p3 = st.columns(3)
+    if p1.button("← Newer", disabled=len(cursors) == 1):
+        cursors.pop(); st.session_state.pop("admin_view", None); st.rerun()
+    if p2.button("Older →", disabled=next_cursor is None):
+        cursors.append(next_cursor); st.session_state.pop("admin_view", None); st.rerun()
+    if p3.button("Reload"):
+        st.session_state.pop("admin_view", None); st.rerun()
+
+if _fragment:
+    _queue = _fragment(run_every=ADMIN_POLL_SECONDS)(_queue)
+_queue()
+
+st.divider()
+with st.expander("LLM metrics (last 7 days)"):
+    try:
+        rows = llm_metrics_summary(days=7)
+    except Exception as e:
+        st.error(f"Metrics unavailable: {e}")
+        rows = []
+    if rows:
+        st.dataframe([{
+            "fn": r["fn"], "track": r["track"] or "—", "calls": r["calls"],
+            "fallbacks": r["fallbacks"], "timeouts": r["timeouts"], "parse errors": r["parse_errors"],
+            "errors": r["errors"], "coalesced": r["coalesced"],
+            "avg ms": r["avg_ms"], "p50 ms ≤": r["p50_ms"], "p95 ms ≤": r["p95_ms"],
+            "prompt tok": r["prompt_tokens"], "completion tok": r["completion_tokens"],
+        } for r in rows], use_container_width=True, hide_index=True)
+    else:
+        st.caption("No LLM calls recorded yet.")
+
+with st.expander("Import roster (CSV)"):
+    st.caption("Columns: name, uni, telegram, x, wallet (telegram or x required). "
+               "Existing students are matched by handle and updated; blank cells keep stored values.")
+    roster = st.file_uploader("Roster CSV", type=["csv"], key="roster_csv")
+    if roster is not None and st.button("Import roster"):
+        try:
+            rep = import_users_csv(roster)
+        except Exception as e:
+            st.error(f"Import failed: {e}")
+        else:
+            m1, m2, m3, m4 = st.columns(4)
+            m1.metric("Inserted", rep["inserted"]); m2.metric("Updated", rep["updated"])
+            m3.metric("Conflicting", rep["conflicts"]); m4.metric("Invalid", rep["invalid"])
+            if rep["conflict_rows"]:
+                st.caption("Conflicts: the handles belong to two different students, or the matched "
+                           "student already has a different Telegram/X handle (not written)")
+                st.dataframe(rep["conflict_rows"], use_container_width=True, hide_index=True)
+            if rep["invalid_rows"]:
+                st.caption("Invalid rows (skipped)")
+                st.dataframe(rep["invalid_rows"], use_container_width=True, hide_index=True)
+
+with st.expander("Onboarding funnel"):
+    f1, f2 = st.columns(2)
+    by = f1.selectbox("Split by", ["—", "track", "uni"])
+    days = f2.selectbox("Window", [1, 7, 30, None], index=1,
+                        format_func=lambda d: "All time" if d is None else f"Last {d} days")
+    try:
+        groups = analytics.funnel(by=None if by == "—" else by, days=days)
+        hours = analytics.hourly(days=2)
+    except Exception as e:
+        st.error(f"Funnel unavailable: {e}")
+        groups, hours = [], []
+    if groups:
+        labels = analytics.STAGE_LABELS
+        st.dataframe([dict({by: g[by] or "—"} if by != "—" else {},
+                           **{labels[k]: g[k] for k in analytics.FUNNEL_STAGES},
+                           **{"approved / profiles": f"{g['approved'] / g['profile']:.0%}" if g["profile"] else "–"})
+                      for g in groups], use_container_width=True, hide_index=True)
+        if hours:
+            st.caption("Students reaching each stage per hour (last 48h, UTC)")
+            st.line_chart(hours, x="hour", y=analytics.FUNNEL_STAGES)
+    else:
+        st.caption("No funnel events rolled up yet.")
 
 st.divider()
 try:
+    # rewritten in chunks only when the data changed; the button reads the file
     csv_path = export_users_csv()
     with open(csv_path, "rb") as f:
         st.download_button(
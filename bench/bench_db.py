@@ -0,0 +1,183 @@
+# bench/bench_db.py
+"""Time every public src.db function against a synthetic cohort.
+
+Generates a seeded cohort (bench/cohort.py) at the requested scale, migrates
+it with db_init() (handle dedupe included), then calls each function
+`--repeat` times and reports p50/p95 wall time plus the peak Python memory
+of one extra traced call. Output is JSON, so runs can be diffed across
+commits:
+
+    python bench/bench_db.py --users 10000 --out bench-10k.json
+    python bench/bench_db.py --users 100000 --repeat 5
+    python bench/bench_db.py --users 10000 --baseline bench-10k.json   # adds p50/p95 ratios
+"""
+import argparse, csv, io, json, os, platform, random, shutil, sqlite3, subprocess, sys, tempfile, time, tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench.cohort import generate
+
+def _pct(samples, q):
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(round(q * (len(s) - 1))))]
+
+def measure(fn, repeat, args=lambda i: ()):
+    samples = []
+    for i in range(repeat):
+        a = args(i)
+        t0 = time.perf_counter()
+        fn(*a)
+        samples.append((time.perf_counter() - t0) * 1000)
+    a = args(repeat)
+    tracemalloc.start()
+    fn(*a)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"n": repeat, "p50_ms": round(_pct(samples, 0.5), 3), "p95_ms": round(_pct(samples, 0.95), 3),
+            "max_ms": round(max(samples), 3), "peak_kb": round(peak / 1024, 1)}
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=10000)
+    ap.add_argument("--dup-rate", type=float, default=0.02)
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--out", help="write the JSON report here as well as to stdout")
+    ap.add_argument("--baseline", help="earlier report to compare against (current / baseline)")
+    args = ap.parse_args()
+    out_path = os.path.abspath(args.out) if args.out else None
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    tmp = tempfile.mkdtemp(prefix="sprint-bench-")
+    os.environ["USE_SUPABASE"] = "false"
+    os.environ["UPLOAD_DIR"] = os.path.join(tmp, "uploads")
+    os.environ["DB_PATH"] = os.path.join(tmp, "cohort.db")
+    os.chdir(tmp)                                   # CSV exports land here
+    t0 = time.perf_counter()
+    cohort = generate(os.environ["DB_PATH"], args.users, args.dup_rate, seed=args.seed)
+    gen_s = time.perf_counter() - t0
+    shutil.copy(os.environ["DB_PATH"], os.path.join(tmp, "cohort-traced.db"))
+
+    from src import db, db_sqlite
+    db_sqlite.DB_PATH = os.environ["DB_PATH"]
+    results = {}
+
+    # db_init on a version-1 database: every migration, handle dedupe included.
+    # It only does work once per file, so time one run and trace a copy.
+    t0 = time.perf_counter()
+    db.db_init()
+    init_ms = (time.perf_counter() - t0) * 1000
+    db_sqlite.DB_PATH = os.path.join(tmp, "cohort-traced.db")
+    tracemalloc.start()
+    db.db_init()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    db_sqlite.DB_PATH = os.environ["DB_PATH"]
+    results["db_init"] = {"n": 1, "p50_ms": round(init_ms, 3), "p95_ms": round(init_ms, 3),
+                          "max_ms": round(init_ms, 3), "peak_kb": round(peak / 1024, 1)}
+    results["db_init_warm"] = measure(db.db_init, args.repeat)
+
+    rnd = random.Random(args.seed)
+    con = sqlite3.connect(os.environ["DB_PATH"])
+    users = con.execute("SELECT id, telegram, x FROM users").fetchall()
+    sub_ids = [r[0] for r in con.execute("SELECT id FROM submissions")]
+    con.close()
+    pick = lambda i: rnd.choice(users)
+
+    results["upsert_user_new"] = measure(
+        db.upsert_user, args.repeat, lambda i: (f"New {i}", "UCD", f"new{i}_tg", f"new{i}_x", None))
+    results["upsert_user_existing"] = measure(
+        db.upsert_user, args.repeat, lambda i: (lambda u: ("Again", "UCD", u[1], u[2], None))(pick(i)))
+    # roster import: half new students, half already registered
+    def roster(i, n=1000):
+        buf = io.StringIO()
+        w = csv.writer(buf); w.writerow(["name", "uni", "telegram", "x"])
+        for j in range(n):
+            u = users[(i * n + j) % len(users)] if j % 2 else (None, f"r{i}_{j}_tg", None)
+            w.writerow([f"Roster {j}", "UCD", u[1] or "", u[2] or ""])
+        return (io.BytesIO(buf.getvalue().encode()),)
+    results["import_users_csv_1000"] = measure(db.import_users_csv, max(1, args.repeat // 4), roster)
+    results["upsert_user_x1000"] = measure(
+        lambda f: [db.upsert_user(*r) for r in list(csv.reader(io.TextIOWrapper(f)))[1:] for r in [r + [None]]],
+        max(1, args.repeat // 4), lambda i: roster(i + 100))
+    results["get_user"] = measure(db.get_user, args.repeat, lambda i: (pick(i)[0],))
+    results["get_user_by_handle"] = measure(db.get_user_by_handle, args.repeat, lambda i: pick(i)[1:])
+    results["set_track"] = measure(db.set_track, args.repeat, lambda i: (pick(i)[0], "Dev"))
+    results["save_submission"] = measure(
+        db.save_submission, args.repeat, lambda i: (pick(i)[0], 3, "Micro-quest", "Dev", "bench proof", None))
+    results["get_submissions"] = measure(db.get_submissions, args.repeat, lambda i: (pick(i)[0],))
+    results["get_submission"] = measure(db.get_submission, args.repeat, lambda i: (rnd.choice(sub_ids),))
+    results["admin_set_status"] = measure(db.admin_set_status, args.repeat, lambda i: (rnd.choice(sub_ids), "approved"))
+    results["admin_list_subs"] = measure(db.admin_list_subs, args.repeat, lambda i: ("pending",))
+    results["admin_list_subs_page"] = measure(db.admin_list_subs_page, args.repeat, lambda i: ("pending", 25))
+    # admin polling: one change-feed call after a couple of reviews vs reloading the page
+    def poll():
+        head = db.change_cursor()
+        db.admin_set_status(rnd.choice(sub_ids), "rejected"); db.admin_set_status(rnd.choice(sub_ids), "approved")
+        db.changes_since(head)
+    results["changes_since_poll"] = measure(poll, args.repeat)
+    results["recap_stats"] = measure(db._get_backend().recap_stats, args.repeat)
+    results["recap_stats_cached"] = measure(db.recap_stats, args.repeat)
+    results["list_social_posts"] = measure(db.list_social_posts, args.repeat)
+    results["save_event"] = measure(db.save_event, args.repeat, lambda i: (pick(i)[0], "bench", {"i": i}))
+    results["flush_events"] = measure(db.flush_events, args.repeat)
+
+    # funnel rollups: the first refresh folds the whole (backfilled) history,
+    # later ones only the events since the high-water mark
+    t0 = time.perf_counter()
+    db.refresh_funnel(time.time())
+    full_ms = (time.perf_counter() - t0) * 1000
+    results["refresh_funnel_full"] = {"n": 1, "p50_ms": round(full_ms, 3), "p95_ms": round(full_ms, 3),
+                                      "max_ms": round(full_ms, 3), "peak_kb": None}
+    def new_events_then_refresh():
+        db._get_backend().save_events([(pick(0)[0], "submission_created", {"quest_idx": 2}, time.time())] * 20)
+        db.refresh_funnel(time.time())
+    results["refresh_funnel_incremental"] = measure(new_events_then_refresh, args.repeat)
+    results["get_funnel_day"] = measure(db.get_funnel, args.repeat, lambda i: ("day", 0))
+    results["get_funnel_hour"] = measure(db.get_funnel, args.repeat, lambda i: ("hour", time.time() - 2 * 86400))
+
+    # exports are cached on the data watermark: time a rebuild (sidecar removed)
+    # and the cached hit separately
+    def rebuild(path, export):
+        def run():
+            if os.path.exists(path + ".watermark"):
+                os.remove(path + ".watermark")
+            export()
+        return run
+    results["export_users_csv"] = measure(rebuild("onboarding_users.csv", db.export_users_csv), args.repeat)
+    results["export_users_csv_cached"] = measure(db.export_users_csv, args.repeat)
+    results["export_csv"] = measure(rebuild("onboarding_proof.csv", db.export_csv), args.repeat)
+
+    report = {
+        "meta": {
+            "commit": _commit(), "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+            "seed": args.seed, "repeat": args.repeat, "generate_s": round(gen_s, 2),
+            "cohort": cohort, "db_bytes": os.path.getsize(os.environ["DB_PATH"]),
+        },
+        "results": results,
+    }
+    if baseline:
+        report["vs_baseline"] = {
+            "commit": baseline["meta"].get("commit"),
+            "ratios": {name: {q: round(r[q] / b[q], 2) if b[q] and r[q] is not None else None for q in ("p50_ms", "p95_ms", "peak_kb")}
+                       for name, r in results.items() if (b := baseline["results"].get(name))},
+        }
+    out = json.dumps(report, indent=2)
+    print(out)
+    if out_path:
+        with open(out_path, "w") as f:
+            f.write(out)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# bench/bench_images.py
+"""Bytes stored and sent to the admin page per proof, raw upload vs the
+normalize_image() pipeline, for a few typical phone uploads; then bytes on
+disk when one screenshot is submitted several times (content-addressed
+storage in the SQLite backend).
+
+    python bench/bench_images.py
+"""
+import io, json, os, random, sys, tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw
+from src.images import normalize_image
+
+def screenshot_png(w=1290, h=2796, seed=1):
+    # a phone screenshot: a feed photo on top, flat UI blocks and text-like
+    # noise below, saved as PNG
+    rnd = random.Random(seed)
+    img = Image.new("RGB", (w, h), (248, 248, 250))
+    photo = Image.frombytes("RGB", (w, h // 2), rnd.randbytes(w * (h // 2) * 3))
+    img.paste(photo.resize((w // 4, h // 8)).resize((w, h // 2), Image.BICUBIC))
+    d = ImageDraw.Draw(img)
+    for y in range(h // 2 + 40, h, 140):
+        d.rectangle([40, y, w - 40, y + 110], fill=(rnd.randint(200, 255), 240, 255))
+        for x in range(60, w - 200, 24):
+            if rnd.random() < 0.8:
+                d.rectangle([x, y + 30, x + 16, y + 50], fill=(30, 30, 30))
+    buf = io.BytesIO()
+    img.save(buf, "PNG")
+    return buf.getvalue()
+
+def camera_jpeg(w=4032, h=3024, seed=2):
+    # a camera photo: noisy gradient, EXIF orientation + GPS-ish tags
+    rnd = random.Random(seed)
+    small = Image.new("RGB", (w // 8, h // 8))
+    small.putdata([(x % 256, y % 256, rnd.randint(0, 255)) for y in range(h // 8) for x in range(w // 8)])
+    img = small.resize((w, h), Image.BICUBIC)
+    exif = Image.Exif()
+    exif[0x0112] = 6                 # Orientation: rotate 90 CW
+    exif[0x010F] = "PhoneMaker"
+    exif[0x0110] = "Model X"
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=95, exif=exif)
+    return buf.getvalue()
+
+SAMPLES = {"screenshot_png": screenshot_png, "camera_jpeg": camera_jpeg}
+
+def main():
+    results = {}
+    for name, make in SAMPLES.items():
+        raw = make()
+        out = normalize_image(raw)
+        results[name] = {
+            "before": {"stored_bytes": len(raw), "admin_transfer_bytes": len(raw), "ext": "png"},
+            "after": {
+                "stored_bytes": len(out["original"]) + len(out["thumb"]),
+                "admin_transfer_bytes": len(out["thumb"]),
+                "ext": out["ext"], "content_type": out["content_type"],
+                "original_size": Image.open(io.BytesIO(out["original"])).size,
+                "exif_kept": bool(Image.open(io.BytesIO(out["original"])).getexif()),
+            },
+        }
+
+    # the same screenshot pasted for three quests, each submitted twice
+    tmp = tempfile.mkdtemp(prefix="sprint-images-")
+    os.environ["UPLOAD_DIR"] = os.path.join(tmp, "uploads")
+    from src import db_sqlite as db
+    db.DB_PATH = os.path.join(tmp, "images.db")
+    db.db_init()
+    raw = screenshot_png()
+    uid = db.upsert_user("Ada", "UCD", "ada_tg", None, None)
+    clicks = 6
+    for i in range(clicks):
+        db.save_submission(uid, i % 3 + 1, "quest", "Dev", "", raw)
+    on_disk = sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(db.UPLOAD_DIR) for f in fs)
+    results["resubmitted_screenshot"] = {
+        "submits": clicks,
+        "before": {"stored_bytes": clicks * len(raw), "files": clicks},
+        "after": {"stored_bytes": on_disk, "files": sum(len(fs) for _, _, fs in os.walk(db.UPLOAD_DIR)),
+                  "blob_refs": db._one("SELECT refs FROM blobs")[0]},
+    }
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
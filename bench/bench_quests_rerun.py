@@ -0,0 +1,52 @@
+# bench/bench_quests_rerun.py
+"""Backend requests per pages/2_Quests.py rerun on the Supabase backend,
+straight backend reads vs the src.db per-user cache, against FakeSupabase.
+
+    python bench/bench_quests_rerun.py --reruns 20 --latency 0.02
+"""
+import argparse, json, os, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DB_BACKEND"] = "supabase"
+
+from src import db, db_supabase
+from src.fake_supabase import FakeSupabase
+
+def rerun(api, user_id):
+    # the reads one Quests page run makes, in page order
+    api.get_user(user_id)
+    api.get_or_create_track(user_id)
+    api.get_submissions(user_id)
+    api.get_submissions(user_id)
+
+def measure(fake, api, user_id, reruns):
+    fake.reset_counts()
+    t0 = time.perf_counter()
+    for _ in range(reruns):
+        rerun(api, user_id)
+    return {"requests": fake.total_requests, "per_rerun": round(fake.total_requests / reruns, 2),
+            "ms": round((time.perf_counter() - t0) * 1000, 1)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--reruns", type=int, default=20)
+    ap.add_argument("--latency", type=float, default=0.02, help="seconds per fake request")
+    args = ap.parse_args()
+
+    fake = FakeSupabase(latency=args.latency)
+    db_supabase.set_client(fake)
+    uid = db.upsert_user("Ada", "UCD", "ada_tg", "ada_x", None)
+    db.set_track(uid, "Dev")
+
+    results = {
+        "backend": measure(fake, db_supabase, uid, args.reruns),
+        "cached": measure(fake, db, uid, args.reruns),
+    }
+    # a submit invalidates only the submissions entry: the next rerun re-reads that alone
+    db.save_submission(uid, 1, "Join Superteam Ireland Telegram", "Dev", "@ada_tg", None)
+    results["cached_after_submit"] = measure(fake, db, uid, 1)
+    results["cache_stats"] = db.user_cache_stats()
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# bench/bench_review.py
+"""Batch auto-review (src/review.py) against the in-process mock LLM
+(src/fake_openai.py): a first pass over N pending proofs, then a forced
+re-run over the same proofs, which should be all cache hits and 0 LLM calls.
+Also reports the mock's peak concurrent calls (<= REVIEW_CONCURRENCY).
+
+    python bench/bench_review.py --subs 500 --latency 0.2 --concurrency 8
+    python bench/bench_review.py --backend supabase      # against FakeSupabase
+"""
+import argparse, json, os, random, sys, tempfile, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TRACKS = ["AI/Data", "Dev", "Design", "Growth"]
+PROOFS = {
+    1: lambda i, tg, x: [f"@{tg}", f"https://t.me/{tg}", "@someone_else", ""],
+    2: lambda i, tg, x: [f"@{x}", f"https://x.com/{x}", "followed!", ""],
+    3: lambda i, tg, x: [f"https://github.com/s{i}/hello", f"https://gist.github.com/s{i}/abc",
+                         f"https://www.figma.com/file/s{i}", f"https://x.com/s{i}/status/1{i}",
+                         "0x" + "ab" * 32, "done", "https://example.com/mine", ""],
+}
+
+def seed(db, n, rnd):
+    users = [db.upsert_user(f"Student {i}", "UCD", f"stud{i}_tg", f"stud{i}_x", None) for i in range(max(1, n // 3))]
+    for i in range(n):
+        j = rnd.randrange(len(users))
+        qi = rnd.randint(1, 3)
+        text = rnd.choice(PROOFS[qi](j, f"stud{j}_tg", f"stud{j}_x"))
+        db.save_submission(users[j], qi, f"Quest {qi}", rnd.choice(TRACKS), text, None)
+
+def run(review, fake_llm, **kw):
+    fake_llm.calls = fake_llm.peak_in_flight = 0
+    t0 = time.perf_counter()
+    stats = review.review_pending(**kw)
+    return dict(stats, ms=round((time.perf_counter() - t0) * 1000, 1),
+                llm_calls=fake_llm.calls, peak_in_flight=fake_llm.peak_in_flight)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--subs", type=int, default=500)
+    ap.add_argument("--latency", type=float, default=0.2, help="seconds per mock LLM call")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--backend", choices=["sqlite", "supabase"], default="sqlite")
+    args = ap.parse_args()
+
+    os.environ["LLM_CONCURRENCY"] = os.environ["REVIEW_CONCURRENCY"] = str(args.concurrency)
+    os.environ["DB_BACKEND"] = args.backend
+    tmp = tempfile.mkdtemp(prefix="sprint-review-")
+    os.environ["DB_PATH"] = os.path.join(tmp, "review.db")
+    os.environ["UPLOAD_DIR"] = os.path.join(tmp, "uploads")
+
+    from src import agent, db, review
+    from src.fake_openai import FakeAsyncOpenAI
+    if args.backend == "supabase":
+        from src import db_supabase
+        from src.fake_supabase import FakeSupabase
+        db_supabase.set_client(FakeSupabase())
+    db.db_init()
+    fake_llm = FakeAsyncOpenAI(latency=args.latency)
+    agent.set_client(fake_llm)
+    seed(db, args.subs, random.Random(42))
+
+    first = run(review, fake_llm)
+    again = run(review, fake_llm, force=True)
+    report = {
+        "subs": args.subs, "latency_s": args.latency, "concurrency": review.REVIEW_CONCURRENCY,
+        "first_run": first, "cached_rerun": again,
+        # what one-at-a-time calls would have cost
+        "serial_llm_ms_estimate": round(first["llm_calls"] * args.latency * 1000, 1),
+        "auto_approvable": len(review.confident()),
+    }
+    print(json.dumps(report, indent=2))
+    assert again["llm_calls"] == 0, "re-run should be served from the cache"
+    assert first["peak_in_flight"] <= review.REVIEW_CONCURRENCY
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# bench/bench_sqlite_writers.py
+"""Concurrent-writer throughput: connect-per-call (old src/db.py) vs src/db_sqlite.
+
+    python bench/bench_sqlite_writers.py --threads 8 --ops 300
+"""
+import argparse, json, os, sqlite3, sys, tempfile, threading, time, uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def legacy_save_event(path, user_id):
+    # what every write used to do: open, one statement, commit, close
+    con = sqlite3.connect(path, check_same_thread=False)
+    con.execute("PRAGMA foreign_keys = ON;")
+    con.execute("INSERT INTO events (id,user_id,type,meta_json) VALUES (?,?,?,?)",
+                (str(uuid.uuid4()), user_id, "bench", "{}"))
+    con.commit(); con.close()
+
+def run(label, write, threads, ops):
+    errors = []
+    def worker():
+        for _ in range(ops):
+            try:
+                write()
+            except sqlite3.OperationalError as e:
+                errors.append(str(e))
+    ts = [threading.Thread(target=worker) for _ in range(threads)]
+    t0 = time.perf_counter()
+    for t in ts: t.start()
+    for t in ts: t.join()
+    dt = time.perf_counter() - t0
+    done = threads * ops - len(errors)
+    return {"impl": label, "threads": threads, "ops": threads * ops, "ok": done,
+            "errors": len(errors), "seconds": round(dt, 3), "ops_per_s": round(done / dt, 1)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", type=int, default=8)
+    ap.add_argument("--ops", type=int, default=300, help="writes per thread")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="sprint-bench-")
+    os.environ["UPLOAD_DIR"] = os.path.join(tmp, "uploads")
+    from src import db_sqlite
+
+    results = []
+    for label in ("legacy", "pooled"):
+        db_sqlite.DB_PATH = os.path.join(tmp, f"{label}.db")
+        db_sqlite.db_init()
+        uid = db_sqlite.upsert_user("bench", "uni", f"tg_{label}", f"x_{label}", None)
+        db_sqlite.db_close()
+        if label == "legacy":
+            # the old layer ran in rollback-journal mode
+            con = sqlite3.connect(db_sqlite.DB_PATH); con.execute("PRAGMA journal_mode=DELETE;"); con.close()
+            write = lambda: legacy_save_event(db_sqlite.DB_PATH, uid)
+        else:
+            write = lambda: db_sqlite.save_event(uid, "bench", {})
+        results.append(run(label, write, args.threads, args.ops))
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# bench/bench_startup.py
+"""Cold-start report: what a fresh worker pays before its first render.
+
+For each app module, a fresh interpreter imports it under -X importtime and
+the report gives its cumulative import time plus which heavy SDKs (openai,
+supabase, PIL) came along. With Streamlit installed, each page is also run
+once in a fresh interpreter through streamlit.testing's AppTest, timing the
+first element sent (time to first render) and the whole script run. Runs
+use DB_BACKEND=memory and no OPENAI_API_KEY, so nothing touches the network.
+
+    python bench/bench_startup.py --runs 5 --out startup.json
+"""
+import argparse, json, os, statistics, subprocess, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["src.db", "src.agent", "src.analytics", "src.review", "src.db_sqlite", "src.db_supabase"]
+SDKS = ["openai", "supabase", "PIL.Image", "dotenv"]
+PAGES = ["Home.py", "pages/1_Profile.py", "pages/2_Quests.py", "pages/4_About_&_Stats.py", "admin_app.py"]
+
+_RENDER = """
+import json, sys, time
+from streamlit.delta_generator import DeltaGenerator
+from streamlit.testing.v1 import AppTest
+first = []
+_enqueue = DeltaGenerator._enqueue
+def _timed(self, *a, **k):
+    if not first:
+        first.append(time.perf_counter())
+    return _enqueue(self, *a, **k)
+DeltaGenerator._enqueue = _timed
+t0 = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=120).run()
+t1 = time.perf_counter()
+print(json.dumps({"first_render_ms": (first[0] - t0) * 1000 if first else None,
+                  "script_ms": (t1 - t0) * 1000, "exception": bool(at.exception)}))
+"""
+
+def _env():
+    env = dict(os.environ, DB_BACKEND="memory", PYTHONDONTWRITEBYTECODE="1")
+    env.pop("OPENAI_API_KEY", None)
+    env.pop("USE_SUPABASE", None)
+    return env
+
+def import_once(module):
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                          f"import sys, {module}; print(','.join(m for m in {SDKS!r} if m in sys.modules))"],
+                         cwd=ROOT, env=_env(), capture_output=True, text=True)
+    if out.returncode:
+        return None, out.stderr.strip().splitlines()[-1]
+    us = None
+    for line in out.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            us = int(parts[1])
+    lines = out.stdout.strip().splitlines()
+    return us / 1000, lines[-1] if lines else ""
+
+def render_once(page):
+    out = subprocess.run([sys.executable, "-c", _RENDER, page], cwd=ROOT, env=_env(),
+                         capture_output=True, text=True)
+    if out.returncode:
+        return {"error": (out.stderr.strip().splitlines() or ["failed"])[-1]}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def _median(xs):
+    xs = [x for x in xs if x is not None]
+    return round(statistics.median(xs), 1) if xs else None
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=3, help="fresh interpreters per measurement (median)")
+    ap.add_argument("--out", help="write the JSON report here as well as to stdout")
+    args = ap.parse_args()
+
+    report = {"python": sys.version.split()[0], "imports": {}, "sdk_imports": {}, "pages": {}}
+    for module in MODULES + SDKS:
+        runs = [import_once(module) for _ in range(args.runs)]
+        ms = [r[0] for r in runs]
+        entry = {"ms": _median(ms)}
+        if module in MODULES:
+            entry["pulls_in"] = runs[-1][1].split(",") if runs[-1][1] else []
+        if ms[-1] is None:
+            entry["error"] = runs[-1][1]
+        report["sdk_imports" if module in SDKS else "imports"][module] = entry
+
+    try:
+        import streamlit  # noqa: F401
+    except ImportError:
+        report["pages"] = "streamlit not installed; time to first render skipped"
+    else:
+        for page in PAGES:
+            runs = [render_once(page) for _ in range(args.runs)]
+            if "error" in runs[-1]:
+                report["pages"][page] = runs[-1]
+                continue
+            report["pages"][page] = {
+                "first_render_ms": _median([r["first_render_ms"] for r in runs]),
+                "script_ms": _median([r["script_ms"] for r in runs]),
+                "exception": any(r["exception"] for r in runs),
+            }
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+
+if __name__ == "__main__":
+    main()
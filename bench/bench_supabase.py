@@ -0,0 +1,132 @@
+# bench/bench_supabase.py
+"""Round trips and wall time of every public src.db_supabase function,
+offline, against FakeSupabase seeded with a synthetic cohort.
+
+Each call reports how many requests it made (by table/op, storage and rpc),
+the network time those cost at `--latency` seconds each (`network_ms`,
+where N+1 patterns show up) and the measured wall time (`ms`, which also
+includes the fake's own filtering in Python).
+
+    python bench/bench_supabase.py --users 2000 --latency 0.02
+"""
+import argparse, io, json, os, random, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from src import db_supabase as db
+from src.fake_supabase import FakeSupabase, _now
+
+TRACKS = ["AI/Data", "Dev", "Design", "Growth"]
+
+def seed(fake, users, subs_per_user=2.5, seed=42):
+    """Fill the fake's tables directly (no counted requests)."""
+    rnd = random.Random(seed)
+    for i in range(users):
+        u = fake._insert("users", {"name": f"Student {i}", "uni": "UCD", "telegram": f"s{i}_tg",
+                                   "x": f"s{i}_x" if i % 3 else None, "track": rnd.choice(TRACKS)})
+        for _ in range(int(subs_per_user) + (rnd.random() < subs_per_user % 1)):
+            qi = rnd.randint(1, 3)
+            link = rnd.random() < 0.4
+            fake._insert("submissions", {"user_id": u["id"], "quest_idx": qi, "title": f"Quest {qi}",
+                                         "track": u["track"], "status": rnd.choice(["pending", "approved"]),
+                                         "text": f"https://x.com/s{i}" if link else "done", "is_url": link})
+    fake._after_write("submissions")
+
+def _png(seed):
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 64), (seed % 256, 80, 160)).save(buf, "PNG")
+    return buf.getvalue()
+
+def measure(fake, fn, *args, **kwargs):
+    fake.reset_counts()
+    t0 = time.perf_counter()
+    out = fn(*args, **kwargs)
+    if hasattr(out, "__next__"):
+        out = sum(len(chunk) for chunk in out)     # drain generators
+    return {"requests": fake.total_requests, "by_kind": dict(fake.requests),
+            "network_ms": round(fake.total_requests * fake.latency * 1000, 1),
+            "ms": round((time.perf_counter() - t0) * 1000, 1), "uploaded_bytes": fake.bytes_uploaded}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=2000)
+    ap.add_argument("--latency", type=float, default=0.02, help="seconds per fake request")
+    ap.add_argument("--out", help="write the JSON report here as well as to stdout")
+    args = ap.parse_args()
+
+    fake = FakeSupabase()
+    db.set_client(fake)
+    seed(fake, args.users)
+    fake.latency = args.latency
+    users = fake.tables["users"]
+    some = users[len(users) // 2]
+    sub_ids = [s["id"] for s in fake.tables["submissions"]]
+    now = time.time()
+
+    r = {}
+    r["db_init"] = measure(fake, db.db_init)
+    r["upsert_user_new"] = measure(fake, db.upsert_user, "Ada", "UCD", "ada_tg", "ada_x", None)
+    r["upsert_user_existing"] = measure(fake, db.upsert_user, "Ada", "UCD", "ada_tg", "ada_x", "w")
+    uid = db.get_user_by_handle("ada_tg", None)["id"]
+    r["get_user"] = measure(fake, db.get_user, some["id"])
+    r["get_user_by_handle"] = measure(fake, db.get_user_by_handle, None, some["x"] or "nobody")
+    r["get_or_create_track"] = measure(fake, db.get_or_create_track, some["id"])
+    r["set_track"] = measure(fake, db.set_track, uid, "Dev")
+    r["save_event"] = measure(fake, db.save_event, uid, "bench", {})
+    r["save_events_x100"] = measure(fake, db.save_events, [(uid, "bench", {}, now)] * 100)
+    r["save_submission_text"] = measure(fake, db.save_submission, uid, 1, "Quest 1", "Dev", "@ada_tg", None)
+    r["save_submission_image"] = measure(fake, db.save_submission, uid, 2, "Quest 2", "Dev", "", _png(1))
+    r["save_submission_same_image"] = measure(fake, db.save_submission, uid, 3, "Quest 3", "Dev", "", _png(1))
+    r["get_submissions"] = measure(fake, db.get_submissions, some["id"])
+    r["get_submission"] = measure(fake, db.get_submission, sub_ids[0])
+    r["admin_list_subs"] = measure(fake, db.admin_list_subs, "pending")
+    page, cursor = db.admin_list_subs_page("pending", 25)
+    r["admin_list_subs_page"] = measure(fake, db.admin_list_subs_page, "pending", 25, cursor)
+    paths = [s["file_path"] for s in fake.tables["submissions"] if s.get("file_path")]
+    r["get_signed_url"] = measure(fake, db.get_signed_url, paths[0], 60)
+    r["get_signed_urls"] = measure(fake, db.get_signed_urls, paths + [s.get("thumb_path") for s in fake.tables["submissions"]], 120)
+    head = db.change_cursor()
+    r["change_cursor"] = measure(fake, db.change_cursor)
+    r["admin_set_status"] = measure(fake, db.admin_set_status, sub_ids[0], "approved")
+    r["admin_set_status_many_x25"] = measure(fake, db.admin_set_status_many, [p["id"] for p in page], "approved")
+    r["changes_since"] = measure(fake, db.changes_since, head)
+    batch, _ = db.list_review_batch(200)
+    r["list_review_batch"] = measure(fake, db.list_review_batch, 200)
+    verdicts = [{"hash": f"h{i}", "verdict": "approve", "confidence": 0.9, "reason": "", "source": "llm"}
+                for i in range(len(batch))]
+    r["save_review_cache_x200"] = measure(fake, db.save_review_cache, verdicts)
+    r["get_review_cache_x200"] = measure(fake, db.get_review_cache, [v["hash"] for v in verdicts])
+    r["set_reviews_x200"] = measure(fake, db.set_reviews, [(b["id"], "approve", 0.9) for b in batch])
+    r["iter_export_rows"] = measure(fake, db.iter_export_rows)
+    r["iter_users_rows"] = measure(fake, db.iter_users_rows)
+    r["export_watermark"] = measure(fake, db.export_watermark)
+    r["recap_stats"] = measure(fake, db.recap_stats)
+    r["reconcile_stats"] = measure(fake, db.reconcile_stats)
+    r["list_social_posts"] = measure(fake, db.list_social_posts)
+    r["search_subs"] = measure(fake, db.search_subs, some["name"], None, 25)
+    r["save_pool_quest"] = measure(fake, db.save_pool_quest, "Dev", "v1", {"title": "t", "instructions": "i"})
+    r["get_quest_pool"] = measure(fake, db.get_quest_pool, "Dev", "v1")
+    r["prune_quest_pool"] = measure(fake, db.prune_quest_pool, now - 3600)
+    r["set_user_quest"] = measure(fake, db.set_user_quest, uid, "Dev", "v1", {"title": "t", "instructions": "i"})
+    r["get_user_quest"] = measure(fake, db.get_user_quest, uid, "Dev", "v1")
+    r["save_llm_metrics"] = measure(fake, db.save_llm_metrics, [{"ts": now, "fn": "route_track", "track": "", "calls": 1}])
+    r["get_llm_metrics"] = measure(fake, db.get_llm_metrics, now - 86400)
+    roster = [{"name": f"Roster {j}", "uni": "UCD", "telegram": f"roster{j}_tg" if j % 2 else users[j]["telegram"],
+               "x": None, "wallet": None} for j in range(500)]
+    r["import_users_x500"] = measure(fake, db.import_users, roster)
+    r["refresh_funnel"] = measure(fake, db.refresh_funnel, time.time())
+    r["get_funnel"] = measure(fake, db.get_funnel, "day", now - 7 * 86400)
+    r["funnel_watermark"] = measure(fake, db.funnel_watermark)
+    r["admin_set_status_matching"] = measure(fake, db.admin_set_status_matching, "pending", "approved")
+
+    report = {"meta": {"users": len(users), "submissions": len(fake.tables["submissions"]),
+                       "latency_s": args.latency, "at": _now()}, "results": r}
+    out = json.dumps(report, indent=2)
+    print(out)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(out)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# bench/bench_supabase_users.py
+"""Round trips per profile save / handle lookup on the Supabase backend,
+old sequential lookups vs the current db_supabase, against FakeSupabase.
+
+    python bench/bench_supabase_users.py --latency 0.02
+"""
+import argparse, json, os, sys, threading, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import db_supabase
+from src.db_supabase import sb
+from src.fake_supabase import FakeSupabase
+
+# --- the previous implementations, kept here as the baseline ---
+def legacy_get_user_by_handle(tg_handle, x_handle):
+    if tg_handle:
+        r = sb().table("users").select("id").eq("telegram", tg_handle).execute()
+        if r.data: return {"id": r.data[0]["id"]}
+    if x_handle:
+        r = sb().table("users").select("id").eq("x", x_handle).execute()
+        if r.data: return {"id": r.data[0]["id"]}
+    return None
+
+def legacy_upsert_user(name, uni, telegram, x, wallet):
+    if telegram:
+        r = sb().table("users").select("id").eq("telegram", telegram).execute()
+        if r.data:
+            uid = r.data[0]["id"]
+            sb().table("users").update({"name":name,"uni":uni,"wallet":wallet}).eq("id", uid).execute()
+            return uid
+    if x:
+        r = sb().table("users").select("id").eq("x", x).execute()
+        if r.data:
+            uid = r.data[0]["id"]
+            sb().table("users").update({"name":name,"uni":uni,"wallet":wallet}).eq("id", uid).execute()
+            return uid
+    r = sb().table("users").insert({"name":name,"uni":uni,"telegram":telegram,"x":x,"wallet":wallet}).execute()
+    return r.data[0]["id"]
+
+IMPLS = {
+    "legacy": (legacy_upsert_user, legacy_get_user_by_handle),
+    "current": (db_supabase.upsert_user, db_supabase.get_user_by_handle),
+}
+
+def measure(fake, fn, *args):
+    fake.reset_counts()
+    t0 = time.perf_counter()
+    fn(*args)
+    return {"requests": fake.total_requests, "ms": round((time.perf_counter() - t0) * 1000, 1)}
+
+def race(impl, latency, threads=8):
+    # the same new profile saved from several tabs at once
+    fake = FakeSupabase(latency=latency)
+    db_supabase.set_client(fake)
+    upsert, _ = IMPLS[impl]
+    errors = []
+    def save():
+        try:
+            upsert("Ada", "UCD", "ada_tg", "ada_x", None)
+        except Exception as e:
+            errors.append(type(e).__name__)
+    ts = [threading.Thread(target=save) for _ in range(threads)]
+    for t in ts: t.start()
+    for t in ts: t.join()
+    return {"users_created": len(fake.tables["users"]), "errors": len(errors)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--latency", type=float, default=0.02, help="seconds per fake request")
+    args = ap.parse_args()
+
+    results = {}
+    for impl, (upsert, by_handle) in IMPLS.items():
+        fake = FakeSupabase(latency=args.latency)
+        db_supabase.set_client(fake)
+        upsert("Bob", "TCD", "bob_tg", "bob_x", None)
+        results[impl] = {
+            "upsert_new_user": measure(fake, upsert, "Ada", "UCD", "ada_tg", "ada_x", None),
+            "upsert_match_telegram": measure(fake, upsert, "Ada", "UCD", "ada_tg", "ada_x", "w1"),
+            "upsert_match_x_only": measure(fake, upsert, "Ada", "UCD", "ada_new_tg", "ada_x", "w2"),
+            "by_handle_telegram": measure(fake, by_handle, "bob_tg", "bob_x"),
+            "by_handle_x_only": measure(fake, by_handle, "nobody", "bob_x"),
+            "by_handle_miss": measure(fake, by_handle, "nobody", "nobody_x"),
+            "concurrent_same_profile": race(impl, args.latency),
+        }
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# bench/bench_uploads.py
+"""Peak Python memory per proof submission: the old path (the caller reads
+the whole upload into `bytes` and save_submission() gets that) against the
+new one (save_submission() gets the file object and spools it once, in
+chunks), for Streamlit-style in-memory uploads and for a file on disk; plus
+uploads over MAX_UPLOAD_BYTES, which should be refused without being read
+(sized) or after at most the cap (unsized), and never decoded.
+
+Peaks are tracemalloc's: the Python-side copies (upload bytes, spool
+buffers, encoded outputs), not Pillow's own decode buffers, which both
+paths share. An in-memory upload is not counted (Streamlit already holds
+it), and BytesIO.read() of the whole buffer shares rather than copies it,
+so the two paths only differ for real files.
+
+    python bench/bench_uploads.py
+"""
+import io, json, os, random, sys, tempfile, tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DB_BACKEND"] = "memory"
+
+from bench.bench_images import screenshot_png, camera_jpeg
+
+class Upload(io.BytesIO):
+    """What the page gets from st.file_uploader: in-memory, with a .size."""
+    def __init__(self, data):
+        super().__init__(data)
+        self.size = len(data)
+
+def peak_kb(fn):
+    tracemalloc.start()
+    try:
+        fn()
+    except ValueError as e:
+        print("refused:", e)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+def main():
+    from src import db
+    from src.uploads import MAX_UPLOAD_BYTES
+    db.db_init()
+    uid = db.upsert_user("Ada", "UCD", "ada_tg", None, None)
+    submit = lambda f: db.save_submission(uid, 3, "quest", "Dev", "", f)
+
+    results = {"max_upload_bytes": MAX_UPLOAD_BYTES}
+    # distinct seeds per path: the blob store dedupes identical uploads
+    for name, make in {"screenshot_png": screenshot_png, "camera_jpeg": camera_jpeg}.items():
+        old, new = Upload(make(seed=10)), Upload(make(seed=20))
+        paths = []
+        for seed in (30, 40):
+            fd, path = tempfile.mkstemp(suffix=".img")
+            with os.fdopen(fd, "wb") as f:
+                f.write(make(seed=seed))
+            paths.append(path)
+        def from_disk(path, stream):
+            with open(path, "rb") as f:
+                submit(f if stream else f.read())
+        results[name] = {
+            "upload_kb": round(old.size / 1024, 1),
+            "uploaded_old_kb": peak_kb(lambda: submit(old.read())),
+            "uploaded_new_kb": peak_kb(lambda: submit(new)),
+            "disk_file_old_kb": peak_kb(lambda: from_disk(paths[0], False)),
+            "disk_file_new_kb": peak_kb(lambda: from_disk(paths[1], True)),
+        }
+        for path in paths:
+            os.remove(path)
+
+    big = Upload(random.Random(1).randbytes(MAX_UPLOAD_BYTES + 1))
+    results["oversize_submit_kb"] = peak_kb(lambda: submit(big))
+    big.size = None                      # a file-like without a size: refused after the cap is read
+    results["oversize_unsized_submit_kb"] = peak_kb(lambda: submit(big))
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# bench/check_handles.py
+"""Fail if a student saved through the Profile page and the same student in
+a roster import end up as two users. Runs both orders (Profile first with
+raw input like "@Ada_TG", then the roster; roster first, then a Profile
+save in another case) through src.db, on the SQLite backend and on
+FakeSupabase, plus the canonical-handle migration on a legacy SQLite row.
+
+    python bench/check_handles.py
+"""
+import io, os, subprocess, sys, tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def roster(*lines):
+    return io.BytesIO(("name,uni,telegram,x\n" + "\n".join(lines) + "\n").encode())
+
+def students(backend) -> int:
+    if backend == "supabase":
+        from src import db_supabase
+        return len(db_supabase.sb().tables["users"])
+    from src import db_sqlite
+    return db_sqlite._one("SELECT COUNT(*) FROM users")[0]
+
+def check(backend) -> list:
+    from src import db
+    if backend == "supabase":
+        from src import db_supabase
+        from src.fake_supabase import FakeSupabase
+        db_supabase.set_client(FakeSupabase())
+    db.db_init()
+    failures = []
+
+    # Profile first, with raw input; then the roster's canonical form
+    ada = db.upsert_user("Ada", "UCD", "@Ada_TG", "AdaX", None)
+    report = db.import_users_csv(roster("Ada L,UCD,ada_tg,adax"))
+    if (report["inserted"], report["updated"]) != (0, 1):
+        failures.append(f"profile then roster: {report}")
+    if (db.get_user_by_handle("https://t.me/ADA_tg", None) or {}).get("id") != ada:
+        failures.append("lookup of a raw handle missed the profile user")
+
+    # roster first; then a Profile save typed differently
+    db.import_users_csv(roster("Bob,TCD,bob_tg1,bobx"))
+    bob = db.get_user_by_handle("bob_tg1", None)["id"]
+    if db.upsert_user("Bob B", "TCD", "Bob_TG1", "@BobX", None) != bob:
+        failures.append("roster then profile: a second user was created")
+
+    if students(backend) != 2:
+        failures.append(f"expected 2 students, found {students(backend)}")
+    try:
+        db.upsert_user("Eve", "UCD", "not a handle", "evex", None)
+        failures.append("an invalid handle was saved")
+    except ValueError:
+        pass
+    return failures
+
+def check_migration() -> list:
+    # a pre-migration database holding "@Ada_TG" and its duplicate "ada_tg"
+    from src import db_sqlite
+    db_sqlite.configure(os.path.join(tempfile.mkdtemp(prefix="sprint-handles-"), "legacy.db"))
+    step = next(s for v, _, s in db_sqlite.MIGRATIONS if v == 15)
+    db_sqlite.MIGRATIONS[:] = [m for m in db_sqlite.MIGRATIONS if m[0] < 15]
+    db_sqlite.migrate()
+    db_sqlite._exec("INSERT INTO users (id,name,telegram,x,created_at) VALUES ('a','Ada','@Ada_TG','AdaX',1)")
+    db_sqlite._exec("INSERT INTO users (id,name,telegram,created_at) VALUES ('b','Ada','ada_tg',2)")
+    db_sqlite._exec("INSERT INTO users (id,name,x) VALUES ('c','Cy','@CyX')")
+    db_sqlite.MIGRATIONS.append((15, "canonical handles", step))
+    db_sqlite.migrate()
+    rows = db_sqlite._all("SELECT id, telegram, x FROM users ORDER BY id")
+    want = [("b", "ada_tg", "adax"), ("c", None, "cyx")]
+    return [] if [tuple(r) for r in rows] == want else [f"migration left {rows}, expected {want}"]
+
+def main() -> int:
+    if len(sys.argv) > 1:
+        os.environ["DB_BACKEND"] = sys.argv[1]
+        failures = check(sys.argv[1]) + (check_migration() if sys.argv[1] == "memory" else [])
+        for f in failures:
+            print("FAIL:", f)
+        print(f"{sys.argv[1]}: {'ok' if not failures else f'{len(failures)} failures'}")
+        return 1 if failures else 0
+    # one interpreter per backend: src.db picks its backend at first use
+    codes = [subprocess.run([sys.executable, __file__, b], cwd=ROOT).returncode for b in ("memory", "supabase")]
+    return max(codes)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+# bench/check_query_plans.py
+"""Fail if any query the SQLite backend issues falls back to a full table scan.
+
+Runs every public src.db_sqlite function against a small seeded database,
+captures the SQL it executes, and checks EXPLAIN QUERY PLAN for each statement.
+Exits non-zero on a plain `SCAN <table>` or a temp B-tree sort.
+
+    python bench/check_query_plans.py
+"""
+import io, os, re, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+# Queries whose job is to read every row (exports, the small stats_rollup
+# table) may scan, but not sort in a temp B-tree; anything else must SEARCH.
+FULL_READ_OK = re.compile(r"^\s*(WITH marks|SELECT u\.name|SELECT metric, dim, n FROM stats_rollup)", re.S)
+BAD_PLAN = re.compile(r"^(SCAN \w+( AS \w+)?$|USE TEMP B-TREE)")
+# Per-run scratch tables (funnel refresh) are read whole by design; the
+# SELECT that fills one is checked for scans but may group in a temp B-tree.
+SCRATCH = re.compile(r"\b_funnel_new\b")
+FILL_SCRATCH = re.compile(r"^\s*CREATE TEMP TABLE _funnel_new AS\s+(.*)$", re.S)
+
+def exercise(db):
+    uid = db.upsert_user("Ada", "UCD", "ada_tg", "ada_x", None)
+    other = db.upsert_user("Bob", "TCD", "bob_tg", "bob_x", None)
+    db.get_user(uid); db.get_user_by_handle("ada_tg", None); db.get_user_by_handle(None, "bob_x")
+    db.set_track(uid, "Dev"); db.get_or_create_track(uid)
+    db.save_event(uid, "profile_saved", {"uni": "UCD"})
+    sid = db.save_submission(uid, 1, "Join Superteam Ireland Telegram", "Dev", "https://t.me/x", None)
+    db.save_submission(other, 3, "Hello Solana Tx", "Dev", "tx hash", None)
+    buf = io.BytesIO(); Image.new("RGB", (8, 8)).save(buf, "PNG")
+    db.save_submission(other, 2, "Screenshot", "Dev", "", buf.getvalue())
+    db.save_submission(uid, 2, "Screenshot", "Dev", "", buf.getvalue())   # same blob
+    db.get_submissions(uid)
+    db.admin_list_subs(); db.admin_list_subs(status_filter="pending")
+    _, cursor = db.admin_list_subs_page(status_filter="pending", limit=1)
+    db.admin_list_subs_page(status_filter="pending", limit=1, cursor=cursor)
+    db.admin_list_subs_page(limit=1, cursor=cursor)
+    db.get_submission(sid)
+    head = db.change_cursor(); db.changes_since(head - 2); db.changes_since(head, limit=10)
+    rows, cursor = db.list_review_batch(limit=1); db.list_review_batch(limit=1, cursor=cursor)
+    db.save_review_cache([{"hash": "h1", "verdict": "approve", "confidence": 0.9, "reason": "r", "source": "llm"}])
+    db.get_review_cache(["h1", "h2"]); db.set_reviews([(rows[0]["id"], "approve", 0.9)])
+    db.confident_review_ids(0.9)
+    db.admin_set_status(sid, "approved")
+    list(db.iter_export_rows()); list(db.iter_users_rows()); db.export_watermark()
+    db.recap_stats(); db.list_social_posts()
+    _, cursor = db.search_subs("ada join", limit=1)
+    db.search_subs("ada", status_filter="pending", limit=1, cursor=cursor)
+    db.upsert_user("Ada L", "UCD", "ada_tg", "ada_x", None)      # re-indexes her submissions
+    db.save_pool_quest("Dev", "v1", {"title": "t", "instructions": "i"})
+    db.get_quest_pool("Dev", "v1"); db.prune_quest_pool(0)
+    db.set_user_quest(uid, "Dev", "v1", {"title": "t", "instructions": "i"})
+    db.get_user_quest(uid, "Dev", "v1")
+    db.set_user_quest(uid, "Dev", "v2", {"title": "t2", "instructions": "i2"})      # re-pins on a new version
+    db.save_llm_metrics([{"ts": 1.0, "fn": "route_track", "track": "", "calls": 1, "buckets": [1]}])
+    db.get_llm_metrics(0)
+    db.save_events([(uid, "submission_created", {"quest_idx": 1, "track": "Dev"}, 2.0)])
+    db.refresh_funnel(time.time() + 1); db.refresh_funnel(time.time() + 2)
+    db.get_funnel("hour", 0); db.get_funnel("day", time.time() - 86400); db.funnel_watermark()
+
+def main() -> int:
+    tmp = tempfile.mkdtemp(prefix="sprint-plans-")
+    os.environ["UPLOAD_DIR"] = os.path.join(tmp, "uploads")
+    from src import db_sqlite as db
+    db.DB_PATH = os.path.join(tmp, "plans.db")
+
+    db.db_init()    # one-time migration statements aren't query paths
+    seen = []
+    con = db.db_conn()
+    con.set_trace_callback(seen.append)
+    exercise(db)
+    con.set_trace_callback(None)
+
+    failures, checked = [], set()
+    for sql in seen:
+        fill = FILL_SCRATCH.match(sql)
+        if fill:
+            sql = fill.group(1)
+        elif SCRATCH.search(sql):
+            continue
+        head = sql.lstrip().split(None, 1)[0].upper()
+        if head not in ("SELECT", "WITH", "UPDATE", "DELETE") or sql in checked:
+            continue
+        if "sqlite_master" in sql or "schema_version" in sql:
+            continue
+        checked.add(sql)
+        plan = [r[3] for r in con.execute("EXPLAIN QUERY PLAN " + sql)]
+        bad = [p for p in plan if BAD_PLAN.match(p)]
+        if FULL_READ_OK.match(sql):
+            bad = [p for p in bad if not p.startswith("SCAN")]
+        if fill:
+            bad = [p for p in bad if p.startswith("SCAN")]
+        status = "FAIL" if bad else "ok"
+        print(f"[{status}] {' '.join(sql.split())[:100]}")
+        for p in plan:
+            print(f"         {p}")
+        if bad:
+            failures.append(sql)
+
+    print(f"\n{len(checked)} statements checked, {len(failures)} with full scans")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
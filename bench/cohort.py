@@ -0,0 +1,100 @@
+# bench/cohort.py
+"""Seeded synthetic cohort for the SQLite backend.
+
+Writes users, submissions and events straight into a database that is left
+at schema version 1 (base tables only), so the next db_init() runs every
+later migration on realistic data -- including the handle dedupe of
+migration 2, exercised by a share of students who signed up twice.
+
+    python bench/cohort.py --users 10000 --out /tmp/cohort.db
+"""
+import argparse, json, os, random, sqlite3, sys, time, uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TRACKS = ["AI/Data", "Dev", "Design", "Growth"]
+UNIS = ["UCD", "TCD", "DCU", "UCC", "UL", "NUIG", "MU", "TUD"]
+QUESTS = {1: "Join Superteam Ireland Telegram", 2: "Follow @superteamIE on X", 3: "Micro-quest"}
+STATUSES = ["pending"] * 6 + ["approved"] * 3 + ["rejected"]
+EVENT_TYPES = ["page_view", "profile_saved", "quests_viewed", "submission_created"]
+
+def _uuid(rnd):
+    return str(uuid.UUID(int=rnd.getrandbits(128), version=4))
+
+def _proof(rnd, qi, handle):
+    if qi == 1:
+        return f"@{handle}"
+    if rnd.random() < 0.4:
+        return f"https://x.com/{handle}/status/{rnd.getrandbits(60)}"
+    return "done " + "".join(rnd.choices("abcdefghijklmnopqrstuvwxyz ", k=rnd.randint(10, 80)))
+
+def generate(path: str, users: int, dup_rate: float = 0.02, subs_per_user: float = 2.5,
+             events_per_user: float = 6.0, seed: int = 42) -> dict:
+    """Create `path` with a cohort of `users` students; returns row counts.
+
+    `dup_rate` of the students get a second users row sharing their Telegram
+    or X handle (a re-registration), with submissions hanging off both.
+    """
+    from src.db_sqlite import MIGRATIONS
+    rnd = random.Random(seed)
+    if os.path.exists(path):
+        os.remove(path)
+    con = sqlite3.connect(path, isolation_level=None)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("BEGIN")
+    for sql in MIGRATIONS[0][2]:
+        con.execute(sql)
+    con.execute("""CREATE TABLE schema_version (
+      version INTEGER PRIMARY KEY, name TEXT,
+      applied_at REAL DEFAULT (strftime('%s','now'))
+    )""")
+    con.execute("INSERT INTO schema_version (version,name) VALUES (1,?)", (MIGRATIONS[0][1],))
+
+    now = time.time()
+    start = now - 30 * 86400
+    user_rows, sub_rows, event_rows = [], [], []
+    for i in range(users):
+        created = start + (now - start) * i / max(users, 1)
+        handle = f"student{i}"
+        profile = [f"Student {i}", rnd.choice(UNIS),
+                   f"{handle}_tg" if rnd.random() < 0.9 else None,
+                   f"{handle}_x" if rnd.random() < 0.7 else None,
+                   None, rnd.choice(TRACKS + [None])]
+        ids = [_uuid(rnd)]
+        user_rows.append([ids[0]] + profile + [created])
+        if rnd.random() < dup_rate and (profile[2] or profile[3]):
+            # signed up again later: same handle(s), sometimes only one of them
+            dup = list(profile)
+            if dup[2] and dup[3] and rnd.random() < 0.5:
+                dup[rnd.choice((2, 3))] = None
+            ids.append(_uuid(rnd))
+            user_rows.append([ids[1]] + dup + [created + rnd.randint(60, 86400)])
+        for _ in range(int(subs_per_user) + (rnd.random() < subs_per_user % 1)):
+            qi = rnd.choice(list(QUESTS))
+            sub_rows.append([_uuid(rnd), rnd.choice(ids), qi, QUESTS[qi], profile[5] or "Growth",
+                             _proof(rnd, qi, handle), None, rnd.choice(STATUSES),
+                             created + rnd.randint(60, 7 * 86400)])
+        for _ in range(int(events_per_user) + (rnd.random() < events_per_user % 1)):
+            event_rows.append([_uuid(rnd), ids[0], rnd.choice(EVENT_TYPES), json.dumps({"i": i}),
+                               created + rnd.randint(0, 7 * 86400)])
+
+    con.executemany("INSERT INTO users (id,name,uni,telegram,x,wallet,track,created_at) VALUES (?,?,?,?,?,?,?,?)", user_rows)
+    con.executemany("""INSERT INTO submissions (id,user_id,quest_idx,title,track,text,file_path,status,created_at)
+                       VALUES (?,?,?,?,?,?,?,?,?)""", sub_rows)
+    con.executemany("INSERT INTO events (id,user_id,type,meta_json,ts) VALUES (?,?,?,?,?)", event_rows)
+    con.execute("COMMIT")
+    con.close()
+    return {"students": users, "users": len(user_rows), "duplicates": len(user_rows) - users,
+            "submissions": len(sub_rows), "events": len(event_rows)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=10000)
+    ap.add_argument("--dup-rate", type=float, default=0.02)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--out", default="cohort.db")
+    args = ap.parse_args()
+    print(json.dumps(generate(args.out, args.users, args.dup_rate, seed=args.seed)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+-- Supabase (Postgres) objects used by src/db_supabase.py on top of the
+-- users / submissions / events tables. Run once in the SQL editor.
+
+-- micro-quest cache (src/agent.py)
+create table if not exists quest_pool (
+  id uuid primary key default gen_random_uuid(),
+  track text, version text, title text, instructions text,
+  created_at timestamptz default now()
+);
+create index if not exists ix_quest_pool_track on quest_pool(track, version, created_at);
+
+create table if not exists user_quests (
+  user_id uuid references users(id) on delete cascade,
+  track text, version text, title text, instructions text,
+  created_at timestamptz default now(),
+  primary key (user_id, track)
+);
+
+-- one user per handle; plain (non-partial) unique indexes so upserts can use
+-- on_conflict=telegram / on_conflict=x (NULLs never conflict)
+create unique index if not exists ux_users_telegram on users(telegram);
+create unique index if not exists ux_users_x        on users(x);
+
+-- query-path indexes
+create index if not exists ix_submissions_user    on submissions(user_id, created_at);
+create index if not exists ix_submissions_status  on submissions(status, created_at, id);
+create index if not exists ix_submissions_created on submissions(created_at, id);
+create index if not exists ix_events_user         on events(user_id, ts);
+create index if not exists ix_users_created       on users(created_at);
+
+-- stats rollup behind recap_stats(): maintained by triggers in the same
+-- transaction as each write; reconcile_stats() rebuilds it from scratch.
+create table if not exists stats_rollup (
+  metric text not null, dim text not null default '', n bigint not null default 0,
+  primary key (metric, dim)
+);
+
+create or replace function stats_bump(p_metric text, p_dim text, p_n bigint) returns void
+language sql as $$
+  insert into stats_rollup (metric, dim, n) values (p_metric, p_dim, p_n)
+  on conflict (metric, dim) do update set n = stats_rollup.n + excluded.n;
+$$;
+
+create or replace function stats_users_trg() returns trigger language plpgsql as $$
+begin
+  if tg_op in ('UPDATE', 'DELETE') then
+    perform stats_bump('students', '', -1);
+    perform stats_bump('students', 'track:' || coalesce(old.track, ''), -1);
+  end if;
+  if tg_op in ('INSERT', 'UPDATE') then
+    perform stats_bump('students', '', 1);
+    perform stats_bump('students', 'track:' || coalesce(new.track, ''), 1);
+  end if;
+  return null;
+end $$;
+
+create or replace function stats_submissions_trg() returns trigger language plpgsql as $$
+declare
+  r record;
+  sign int;
+begin
+  foreach sign in array (case tg_op when 'INSERT' then array[1] when 'DELETE' then array[-1] else array[-1, 1] end) loop
+    r := case when sign = -1 then old else new end;
+    perform stats_bump('subs', '', sign);
+    perform stats_bump('subs', 'track:' || coalesce(r.track, ''), sign);
+    perform stats_bump('subs', 'quest:' || coalesce(r.quest_idx::text, ''), sign);
+    if r.status = 'approved' then
+      perform stats_bump('approved', '', sign);
+      perform stats_bump('approved', 'track:' || coalesce(r.track, ''), sign);
+      perform stats_bump('approved', 'quest:' || coalesce(r.quest_idx::text, ''), sign);
+    end if;
+  end loop;
+  return null;
+end $$;
+
+drop trigger if exists trg_stats_users on users;
+create trigger trg_stats_users after insert or delete or update of track on users
+  for each row execute function stats_users_trg();
+drop trigger if exists trg_stats_submissions on submissions;
+create trigger trg_stats_submissions after insert or delete or update of status, track, quest_idx on submissions
+  for each row execute function stats_submissions_trg();
+
+create or replace function reconcile_stats() returns void language sql as $$
+  delete from stats_rollup where true;
+  insert into stats_rollup (metric, dim, n)
+  select 'students', '', count(*) from users
+  union all select 'students', 'track:' || coalesce(track, ''), count(*) from users group by 2
+  union all select 'subs', '', count(*) from submissions
+  union all select 'subs', 'track:' || coalesce(track, ''), count(*) from submissions group by 2
+  union all select 'subs', 'quest:' || coalesce(quest_idx::text, ''), count(*) from submissions group by 2
+  union all select 'approved', '', count(*) from submissions where status = 'approved'
+  union all select 'approved', 'track:' || coalesce(track, ''), count(*) from submissions where status = 'approved' group by 2
+  union all select 'approved', 'quest:' || coalesce(quest_idx::text, ''), count(*) from submissions where status = 'approved' group by 2;
+$$;
+select reconcile_stats();
+
+-- updated_at, bumped on every update; drives export_watermark()
+alter table users       add column if not exists updated_at timestamptz default clock_timestamp();
+alter table submissions add column if not exists updated_at timestamptz default clock_timestamp();
+create index if not exists ix_users_updated       on users(updated_at);
+create index if not exists ix_submissions_updated on submissions(updated_at);
+
+create or replace function touch_updated_at() returns trigger language plpgsql as $$
+begin
+  new.updated_at := clock_timestamp();
+  return new;
+end $$;
+drop trigger if exists trg_users_touch on users;
+create trigger trg_users_touch before update on users
+  for each row execute function touch_updated_at();
+drop trigger if exists trg_submissions_touch on submissions;
+create trigger trg_submissions_touch before update on submissions
+  for each row execute function touch_updated_at();
+
+create or replace function export_watermark() returns json language sql stable as $$
+  select json_build_array(
+    (select max(updated_at) from users),
+    (select max(updated_at) from submissions),
+    (select n from stats_rollup where metric = 'students' and dim = ''),
+    (select n from stats_rollup where metric = 'subs' and dim = ''));
+$$;
+
+-- review thumbnail stored next to each normalized proof image
+alter table submissions add column if not exists thumb_path text;
+
+-- content-addressed proof storage: one object per distinct upload
+-- (blobs/<h[:2]>/<h>.<ext>); refs counts the submissions pointing at it
+create table if not exists blobs (
+  hash text primary key,
+  path text not null unique, thumb_path text, bytes bigint,
+  refs int not null default 0,
+  created_at timestamptz default now()
+);
+
+create or replace function blobs_ref_trg() returns trigger language plpgsql as $$
+begin
+  if tg_op in ('UPDATE', 'DELETE') and old.file_path is not null then
+    update blobs set refs = refs - 1 where path = old.file_path;
+  end if;
+  if tg_op in ('INSERT', 'UPDATE') and new.file_path is not null then
+    update blobs set refs = refs + 1 where path = new.file_path;
+  end if;
+  return null;
+end $$;
+drop trigger if exists trg_blobs_ref on submissions;
+create trigger trg_blobs_ref after insert or delete or update of file_path on submissions
+  for each row execute function blobs_ref_trg();
+
+-- LLM call metrics from src/metrics.py: one row per (flush, fn, track)
+create table if not exists llm_metrics (
+  id bigserial primary key,
+  ts timestamptz not null, fn text, track text,
+  calls int, ok int, timeouts int, parse_errors int, errors int,
+  coalesced int, fallbacks int, prompt_tokens bigint, completion_tokens bigint,
+  latency_ms_sum bigint, buckets jsonb
+);
+create index if not exists ix_llm_metrics_ts on llm_metrics(ts);
+
+-- is_url: set at write time by db_supabase.save_submission (src/utils.is_url);
+-- list_social_posts() reads it through a partial index
+alter table submissions add column if not exists is_url boolean not null default false;
+update submissions set is_url = true where text ~ '^https?://' and not is_url;
+create index if not exists ix_submissions_url on submissions(created_at) where is_url;
+
+-- full-text search behind search_subs(): title, proof text and the owner's
+-- name/handles in one tsvector, kept current by triggers on both tables
+alter table submissions add column if not exists search tsvector;
+create index if not exists ix_submissions_search on submissions using gin(search);
+
+create or replace function subs_search_doc(p_title text, p_text text, p_name text, p_tg text, p_x text)
+returns tsvector language sql immutable as $$
+  select setweight(to_tsvector('simple', concat_ws(' ', p_name, p_tg, p_x)), 'A')
+      || setweight(to_tsvector('simple', coalesce(p_title, '')), 'B')
+      || setweight(to_tsvector('simple', coalesce(p_text, '')), 'C');
+$$;
+
+create or replace function subs_search_trg() returns trigger language plpgsql as $$
+declare
+  u users%rowtype;
+begin
+  select * into u from users where id = new.user_id;
+  new.search := subs_search_doc(new.title, new.text, u.name, u.telegram, u.x);
+  return new;
+end $$;
+drop trigger if exists trg_subs_search on submissions;
+create trigger trg_subs_search before insert or update of title, text, user_id on submissions
+  for each row execute function subs_search_trg();
+
+create or replace function users_search_trg() returns trigger language plpgsql as $$
+begin
+  update submissions set search = subs_search_doc(title, text, new.name, new.telegram, new.x)
+  where user_id = new.id;
+  return null;
+end $$;
+drop trigger if exists trg_users_search on users;
+create trigger trg_users_search after update of name, telegram, x on users
+  for each row execute function users_search_trg();
+
+update submissions s set search = subs_search_doc(s.title, s.text, u.name, u.telegram, u.x)
+from users u where u.id = s.user_id;
+
+-- every word must match as a prefix; rank by ts_rank (name/handles > title > text)
+create or replace function search_subs(p_query text, p_status text default null,
+                                       p_limit int default 25, p_offset int default 0)
+returns table (id uuid, user_id uuid, quest_idx int, title text, track text, status text,
+               file_path text, thumb_path text, created_at timestamptz, name text)
+language sql stable as $$
+  with q as (
+    select to_tsquery('simple', string_agg(quote_literal(w) || ':*', ' & ')) as tsq
+    from regexp_split_to_table(lower(p_query), '[^[:alnum:]]+') w where w <> ''
+  )
+  select s.id, s.user_id, s.quest_idx, s.title, s.track, s.status,
+         s.file_path, s.thumb_path, s.created_at, u.name
+  from q, submissions s left join users u on u.id = s.user_id
+  where s.search @@ q.tsq and (p_status is null or s.status = p_status)
+  order by ts_rank(s.search, q.tsq) desc, s.created_at desc, s.id
+  limit p_limit offset p_offset;
+$$;
+
+-- funnel analytics (src/analytics.py): approvals become events by trigger,
+-- refresh_funnel() folds events past a high-water mark into hourly/daily
+-- rollups, counting each student once per stage (funnel_seen)
+create index if not exists ix_events_ts on events(ts);
+
+create table if not exists funnel_seen (
+  user_id uuid not null references users(id) on delete cascade,
+  stage text not null, ts timestamptz,
+  primary key (user_id, stage)
+);
+create table if not exists funnel_rollup (
+  grain text not null, bucket timestamptz not null, stage text not null,
+  track text not null default '', uni text not null default '', users bigint not null default 0,
+  primary key (grain, bucket, stage, track, uni)
+);
+create table if not exists rollup_state (name text primary key, hwm timestamptz not null);
+
+create or replace function events_approved_trg() returns trigger language plpgsql as $$
+begin
+  insert into events (user_id, type, meta_json, ts)
+  values (new.user_id, 'submission_approved',
+          jsonb_build_object('quest_idx', new.quest_idx, 'track', new.track, 'sub_id', new.id), now());
+  return null;
+end $$;
+drop trigger if exists trg_events_approved on submissions;
+create trigger trg_events_approved after update of status on submissions
+  for each row when (new.status = 'approved' and old.status is distinct from 'approved')
+  execute function events_approved_trg();
+
+-- history from before the funnel, marked as backfill; each insert skips what
+-- is already there, so re-running this script adds nothing
+insert into events (user_id, type, meta_json, ts)
+select u.id, 'profile_saved', jsonb_build_object('track', u.track, 'backfill', 1), u.created_at
+from users u where not exists (select 1 from events e where e.user_id = u.id and e.type = 'profile_saved');
+insert into events (user_id, type, meta_json, ts)
+select s.user_id, 'submission_created', jsonb_build_object('quest_idx', s.quest_idx, 'track', s.track, 'backfill', 1), s.created_at
+from submissions s
+where not exists (select 1 from events e where e.user_id = s.user_id and e.type = 'submission_created'
+                  and e.meta_json->>'quest_idx' = s.quest_idx::text);
+insert into events (user_id, type, meta_json, ts)
+select s.user_id, 'submission_approved', jsonb_build_object('quest_idx', s.quest_idx, 'track', s.track, 'backfill', 1),
+       coalesce(s.updated_at, s.created_at)
+from submissions s
+where s.status = 'approved'
+  and not exists (select 1 from events e where e.user_id = s.user_id and e.type = 'submission_approved'
+                  and e.meta_json->>'quest_idx' = s.quest_idx::text);
+
+create or replace function refresh_funnel(p_cutoff timestamptz) returns int
+language plpgsql as $$
+declare
+  v_hwm timestamptz;
+  v_n int;
+begin
+  insert into rollup_state (name, hwm) values ('funnel', 'epoch') on conflict (name) do nothing;
+  select hwm into v_hwm from rollup_state where name = 'funnel' for update;   -- one refresher at a time
+  if p_cutoff <= v_hwm then
+    return 0;
+  end if;
+  create temp table _funnel_new on commit drop as
+  select distinct on (e.user_id, stage) e.user_id, stage, e.ts,
+         coalesce(e.meta_json->>'track', u.track, '') as track, coalesce(u.uni, '') as uni
+  from events e join users u on u.id = e.user_id,
+       lateral (select case e.type
+                  when 'profile_saved' then 'profile'
+                  when 'submission_created' then 'quest_' || (e.meta_json->>'quest_idx')
+                  when 'submission_approved' then 'approved' end as stage) st
+  where e.ts > v_hwm and e.ts <= p_cutoff and st.stage is not null
+  order by e.user_id, stage, e.ts;
+  delete from _funnel_new n using funnel_seen f where f.user_id = n.user_id and f.stage = n.stage;
+  insert into funnel_seen (user_id, stage, ts) select user_id, stage, ts from _funnel_new;
+  insert into funnel_rollup (grain, bucket, stage, track, uni, users)
+  select g.grain, date_trunc(g.grain, n.ts), n.stage, n.track, n.uni, count(*)
+  from _funnel_new n cross join (values ('hour'), ('day')) g(grain)
+  group by 1, 2, 3, 4, 5
+  on conflict (grain, bucket, stage, track, uni) do update set users = funnel_rollup.users + excluded.users;
+  select count(*) into v_n from _funnel_new;
+  update rollup_state set hwm = p_cutoff where name = 'funnel';
+  return v_n;
+end $$;
+
+-- change feed behind changes_since(): seq comes from one sequence on every
+-- insert and every update of a column the admin queue shows. Sequence values
+-- are taken before commit, so a write racing a poll can land behind its
+-- cursor; changes_since() re-reads FEED_OVERLAP seqs behind the cursor to
+-- catch those, which makes the feed best-effort here (exact on SQLite).
+create sequence if not exists submissions_change_seq;
+alter table submissions add column if not exists seq bigint;
+update submissions set seq = nextval('submissions_change_seq') where seq is null;
+create unique index if not exists ix_submissions_seq on submissions(seq);
+
+create or replace function subs_seq_trg() returns trigger language plpgsql as $$
+begin
+  new.seq := nextval('submissions_change_seq');
+  return new;
+end $$;
+drop trigger if exists trg_subs_seq on submissions;
+create trigger trg_subs_seq before insert or update of status, title, text, track, quest_idx, user_id, file_path, thumb_path
+  on submissions for each row execute function subs_seq_trg();
+
+-- auto-review (src/review.py): verdicts cached by content hash, the latest
+-- one per submission on the row (the queue sorts on it, the change feed
+-- carries it)
+create table if not exists review_cache (
+  hash text primary key, verdict text, confidence real, reason text, source text,
+  created_at timestamptz default now()
+);
+alter table submissions add column if not exists review_verdict text;
+alter table submissions add column if not exists review_confidence real;
+drop trigger if exists trg_subs_seq on submissions;
+create trigger trg_subs_seq before insert or update of status, title, text, track, quest_idx, user_id, file_path, thumb_path,
+  review_verdict, review_confidence on submissions for each row execute function subs_seq_trg();
+
+-- admin "Approve high-confidence": confident_review_ids() reads only this
+create index if not exists ix_submissions_review_approve on submissions(review_confidence)
+  where status = 'pending' and review_verdict = 'approve';
+
+-- search_subs() rows carry the verdict too (return type changed: drop first)
+drop function if exists search_subs(text, text, int, int);
+create function search_subs(p_query text, p_status text default null,
+                            p_limit int default 25, p_offset int default 0)
+returns table (id uuid, user_id uuid, quest_idx int, title text, track text, status text,
+               file_path text, thumb_path text, created_at timestamptz,
+               review_verdict text, review_confidence real, name text)
+language sql stable as $$
+  with q as (
+    select to_tsquery('simple', string_agg(quote_literal(w) || ':*', ' & ')) as tsq
+    from regexp_split_to_table(lower(p_query), '[^[:alnum:]]+') w where w <> ''
+  )
+  select s.id, s.user_id, s.quest_idx, s.title, s.track, s.status,
+         s.file_path, s.thumb_path, s.created_at, s.review_verdict, s.review_confidence, u.name
+  from q, submissions s left join users u on u.id = s.user_id
+  where s.search @@ q.tsq and (p_status is null or s.status = p_status)
+  order by ts_rank(s.search, q.tsq) desc, s.created_at desc, s.id
+  limit p_limit offset p_offset;
+$$;
+
+-- canonical handles: src.db stores every handle as src.utils.handle_key
+-- does ("ada_tg", not "@Ada_TG" or "https://t.me/Ada_TG"), from the Profile
+-- page and the roster import alike. Older rows are rewritten to that form;
+-- a row whose canonical handle another user also maps to is left as is
+-- (merge those by hand).
+create or replace function handle_key(h text, kind text) returns text language sql immutable as $$
+  with t as (select regexp_replace(lower(trim(h)), '^(https?://)?(www\.)?', '') as v),
+  u as (select case when v ~ (case kind when 'telegram' then '^(t\.me|telegram\.me)/' else '^(x\.com|twitter\.com)/' end)
+                    then split_part(split_part(substr(v, strpos(v, '/') + 1), '/', 1), '?', 1)
+                    else v end as v from t),
+  c as (select ltrim(v, '@') as v from u)
+  select nullif(case when c.v ~ (case kind when 'telegram' then '^[a-z0-9_]{5,32}$' else '^[a-z0-9_]{1,15}$' end)
+                     then c.v else lower(ltrim(trim(h), '@')) end, '')
+  from c
+$$;
+with k as (
+  select id, handle_key(telegram, 'telegram') as key,
+         count(*) over (partition by handle_key(telegram, 'telegram')) as n
+  from users where telegram is not null
+)
+update users u set telegram = k.key from k
+where k.id = u.id and k.n = 1 and u.telegram is distinct from k.key;
+with k as (
+  select id, handle_key(x, 'x') as key, count(*) over (partition by handle_key(x, 'x')) as n
+  from users where x is not null
+)
+update users u set x = k.key from k
+where k.id = u.id and k.n = 1 and u.x is distinct from k.key;
@@ -2,7 +2,7 @@ import os, streamlit as st
 if os.getenv("APP_MODE") == "admin":
     st.stop()  # hide this page in the admin deployment
 
-from src.db import db_init, upsert_user, set_track
+from src.db import db_init, upsert_user, set_track, save_event
 import streamlit as st
 st.title("👤 Profile")
 db_init()
@@ -21,7 +21,10 @@ if submitted:
     if not name or not tg or not xh:
         st.error("Name, Telegram and X handle are required.")
     else:
-        uid = upsert_user(name, uni, tg, xh, wallet)
+        try:
+            uid = upsert_user(name, uni, tg, xh, wallet)   # stores the canonical handles
+        except ValueError as e:
+            st.error(str(e)); st.stop()
         st.session_state["user_id"] = uid
         # optional AI suggestion
         #if use_ai:
@@ -29,4 +32,5 @@ if submitted:
         #   suggested = route_track({"id": uid, "name": name, "uni": uni, "telegram": tg, "x": xh})
         #  st.info(f"AI suggests: {suggested}")
         set_track(uid, track_choice)  # user’s choice wins
+        save_event(uid, "profile_saved", {"track": track_choice})
         st.success("Saved! Go to **Quests**.")
@@ -8,9 +8,10 @@ if os.getenv("APP_MODE") == "admin":
 
 from src.db import (
     db_init, get_user, get_or_create_track, set_track,
-    save_submission, get_submissions
+    save_submission, get_submissions, save_event
 )
 from src.agent import make_micro_quests
+from src.uploads import MAX_UPLOAD_BYTES
 
 st.title("🧭 Quests")
 db_init()
@@ -27,7 +28,7 @@ st.write(f"Hello **{user.get('name','')}** from **{user.get('uni','')}**!")
 # --- track & quests ---
 track = get_or_create_track(user_id)
 st.success(f"Your track: **{track}**")
-quests = make_micro_quests(track)
+quests = make_micro_quests(track, user_id=user_id)
 
 # --- load prior submissions once ---
 existing = {s["quest_idx"]: s for s in get_submissions(user_id)}
@@ -50,33 +51,41 @@ for i, q in enumerate(quests, start=1):
 
         proof_text = st.text_area("Paste link / handle / short note", key=txt_key)
         proof_img  = st.file_uploader(
-            "Upload screenshot (optional)",
+            f"Upload screenshot (optional, max {MAX_UPLOAD_BYTES // 1048576} MB)",
             type=["png", "jpg", "jpeg"],
             key=file_key
         )
-        file_bytes = proof_img.read() if proof_img else None
+        # not read here: the backend streams it once, on submit
+        too_big = proof_img is not None and proof_img.size > MAX_UPLOAD_BYTES
+        if too_big:
+            st.error(f"That file is {proof_img.size / 1048576:.1f} MB; the limit is {MAX_UPLOAD_BYTES // 1048576} MB.")
 
         already = i in existing
         # Optional: block duplicate submits from UI side
-        disabled = already
+        disabled = already or too_big
 
         if st.button(f"Submit Q{i}", key=btn_key, disabled=disabled):
             text_clean = (proof_text or "").strip()
 
             # basic validation: require either text or file
-            if not text_clean and not file_bytes:
+            if not text_clean and proof_img is None:
                 st.warning("Please paste a link/handle or upload a screenshot.")
             else:
-                save_submission(
-                    user_id=user_id,
-                    quest_idx=i,
-                    title=q["title"],
-                    track=track,
-                    text=text_clean,
-                    file=file_bytes,  # bytes (not UploadedFile)
-                )
-                st.session_state.just_submitted[i] = True
-                st.rerun()
+                try:
+                    sid = save_submission(
+                        user_id=user_id,
+                        quest_idx=i,
+                        title=q["title"],
+                        track=track,
+                        text=text_clean,
+                        file=proof_img,   # UploadedFile (file-like), read only now
+                    )
+                except ValueError as e:   # not a readable image, or over MAX_UPLOAD_BYTES
+                    st.error(str(e))
+                else:
+                    save_event(user_id, "submission_created", {"quest_idx": i, "track": track, "sub_id": sid})
+                    st.session_state.just_submitted[i] = True
+                    st.rerun()
 
         # Messaging logic
         if st.session_state.just_submitted.get(i):
@@ -6,6 +6,7 @@ if os.getenv("APP_MODE") == "admin":
 import streamlit as st
 import os, socket
 from src.db import db_init, recap_stats, list_social_posts
+from src.analytics import funnel, stage_rows
 
 st.title("📊 About & Stats")
 db_init()
@@ -54,6 +55,19 @@ c1.metric("New students", stats["students"])
 c2.metric("Submissions", stats["subs"])
 c3.metric("Approved proofs", stats["approved"])
 
+if stats.get("by_track"):
+    st.caption("By track")
+    st.table([
+        {"track": t, "students": v.get("students", 0), "submissions": v.get("subs", 0), "approved": v.get("approved", 0)}
+        for t, v in sorted(stats["by_track"].items())
+    ])
+
+# --- Funnel (precomputed rollups, see src/analytics.py) ---
+overall = funnel()
+if overall and overall[0]["profile"]:
+    st.caption("Onboarding funnel")
+    st.table(stage_rows(overall[0]))
+
 st.divider()
 
 st.subheader("Summary")
@@ -1,48 +1,269 @@
-import os, json
-from openai import OpenAI
-from .db import set_track
+import os, json, time, random, asyncio, threading
+from .cache import TTLCache
+from . import db    # attribute access, so the backend is only resolved on first use
 
 TRACKS = ["AI/Data", "Dev", "Design", "Growth"]
 
+# Bump when the micro-quest prompt changes so cached quests are regenerated.
+PROMPT_VERSION = "v1"
+QUEST_POOL_SIZE = int(os.getenv("QUEST_POOL_SIZE", "5"))
+QUEST_TTL = float(os.getenv("QUEST_TTL", str(7 * 24 * 3600)))   # seconds a pooled quest stays servable
+
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "20"))             # seconds per completion, then give up
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))        # completions in flight per process
+
+# --- async LLM layer ---
+# One event loop on a daemon thread owns a single AsyncOpenAI client (so its
+# connection pool is reused), the concurrency semaphore and the table of
+# in-flight requests. Streamlit script threads call the sync wrappers, which
+# submit to that loop and wait for the result.
+_loop = None
+_loop_lock = threading.Lock()
+_aclient = None
+_sem = None
+_inflight = {}          # request key -> Task, only touched on the loop thread
+
+def _get_loop():
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, daemon=True, name="llm-loop").start()
+                _loop = loop
+    return _loop
+
+def _run(coro):
+    """Run a coroutine on the LLM loop from sync code and wait for it."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result(timeout=LLM_TIMEOUT + 5)
+
 def _client():
-    key = os.getenv("OPENAI_API_KEY")
-    return OpenAI(api_key=key) if key else None
+    # created lazily on the loop thread; None when no key is configured
+    global _aclient, _sem
+    if _aclient is None:
+        key = os.getenv("OPENAI_API_KEY")
+        if not key:
+            return None
+        from openai import AsyncOpenAI    # ~0.8 s to import; only once a key is configured
+        _aclient = AsyncOpenAI(api_key=key, timeout=LLM_TIMEOUT, max_retries=1)
+    if _sem is None:
+        _sem = asyncio.Semaphore(LLM_CONCURRENCY)
+    return _aclient
 
-def route_track(profile: dict) -> str:
-    """Pick one track; persist on the user record."""
-    choice = "Growth"
+def set_client(client):
+    """Swap the completion client (e.g. src.fake_openai.FakeAsyncOpenAI for
+    tests and benchmarks); None goes back to OPENAI_API_KEY."""
+    global _aclient
+    _aclient = client
+
+def llm_enabled() -> bool:
+    return _aclient is not None or bool(os.getenv("OPENAI_API_KEY"))
+
+async def _complete(client, prompt: str, temperature: float, fn: str, track: str) -> dict:
+    started = None
+    async def call():
+        nonlocal started
+        async with _sem:
+            started = time.perf_counter()
+            return await client.chat.completions.create(
+                model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
+                messages=[
+                    {"role": "system", "content": "Respond with valid JSON only."},
+                    {"role": "user", "content": prompt},
+                ],
+                temperature=temperature,
+                response_format={"type": "json_object"},
+            )
+    elapsed = lambda: (time.perf_counter() - started) * 1000 if started else None
+    # the timeout covers waiting for a semaphore slot as well as the request
+    try:
+        r = await asyncio.wait_for(call(), LLM_TIMEOUT)
+    except asyncio.TimeoutError:
+        db.llm_metrics.record(fn, track, "timeout", elapsed())
+        raise
+    except Exception:
+        db.llm_metrics.record(fn, track, "error", elapsed())
+        raise
+    latency, usage = elapsed(), getattr(r, "usage", None)
+    try:
+        data = json.loads(r.choices[0].message.content or "{}")
+    except ValueError:
+        db.llm_metrics.record(fn, track, "parse_error", latency, usage)
+        raise
+    db.llm_metrics.record(fn, track, "ok", latency, usage)
+    return data
+
+async def _achat(prompt: str, temperature: float, fn: str, track: str = ""):
+    """JSON completion; identical prompts already in flight share one request.
+    Returns None without an API key. Every request is recorded in llm_metrics
+    under (fn, track)."""
     client = _client()
-    if not client:
-        if profile.get("id"): set_track(profile["id"], choice)
-        return choice
+    if client is None:
+        return None
+    key = (os.getenv("OPENAI_MODEL", "gpt-4o-mini"), prompt, temperature)
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_complete(client, prompt, temperature, fn, track))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    else:
+        db.llm_metrics.record(fn, track, "coalesced")
+    # shield: one caller timing out or being cancelled doesn't cancel the others
+    return await asyncio.shield(task)
 
+async def aroute_track(profile: dict) -> str:
+    """Pick one track; persist on the user record."""
+    choice, t = "Growth", None
     prompt = (
         f"Return JSON with a single key 'track' whose value is exactly one of "
         f"{TRACKS}. Use the student's profile:\n{json.dumps(profile)}"
     )
     try:
-        r = client.chat.completions.create(
-            model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
-            messages=[
-                {"role": "system", "content": "Respond with valid JSON only."},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.1,
-            response_format={"type": "json_object"},
-        )
-        data = json.loads(r.choices[0].message.content or "{}")
+        data = await _achat(prompt, 0.1, "route_track") or {}
         t = (data.get("track") or "").strip()
         if t in TRACKS:
             choice = t
     except Exception as e:
-        print("router_error:", e)
+        print("router_error:", repr(e))
+    if choice != t:
+        db.llm_metrics.fallback("route_track", "")
 
     if profile.get("id"):
-        set_track(profile["id"], choice)
+        await asyncio.to_thread(db.set_track, profile["id"], choice)
     return choice
 
-def make_micro_quests(track: str):
-    """Two fixed quests + one AI-generated micro-quest with solid fallbacks."""
+def route_track(profile: dict) -> str:
+    return _run(aroute_track(profile))
+
+HARDCODED_QUESTS = {
+    "AI/Data": {
+        "title": "Mini Data Viz",
+        "instructions": "Download a small Solana dataset (e.g., token prices on devnet) and create a simple chart. Upload PNG or share a Colab/Gist link."
+    },
+    "Dev": {
+        "title": "Hello Solana Tx",
+        "instructions": "Send a devnet transaction or run a Hello-Solana starter. Paste the tx hash or upload a screenshot of the confirmed tx."
+    },
+    "Design": {
+        "title": "Bounty Card Mockup",
+        "instructions": "Design a quick poster/banner or bounty card for a student sprint. Upload a PNG/JPG of your mock."
+    },
+    "Growth": {
+        "title": "Tweet Hooks",
+        "instructions": "Write 3 tweet ideas to promote Superteam Ireland onboarding. Paste the text or share a public doc link."
+    },
+}
+DEFAULT_FALLBACK = {"title": "Share Your Why",
+                    "instructions": "Post a short note (or tweet draft) on why you’re joining Superteam Ireland and paste the link or text here."}
+
+# --- micro-quest cache ---
+# Pools live in the DB (quest_pool) and are mirrored here for a short while so
+# Streamlit reruns don't hit the backend; pinned quests are per (user, track).
+# A static fallback is only pinned here, for FALLBACK_PIN_TTL, never in the
+# DB, so the student gets an AI quest once the LLM or the pool is back.
+_pools = TTLCache(maxsize=64, ttl=60)
+_pinned = TTLCache(maxsize=4096, ttl=3600)
+FALLBACK_PIN_TTL = float(os.getenv("FALLBACK_PIN_TTL", "300"))
+_refilling = {}         # track -> Future of the refill in progress
+_refill_lock = threading.Lock()
+
+async def _generate_quests(track: str, n: int = 1):
+    """One LLM call for n quests; returns a list of {"title", "instructions"}."""
+    prompt = (
+        f"Create {n} short and easy micro-quest{'s' if n > 1 else ''} for the '{track}' track. Each must take <50 minutes and yield a shareable artifact "
+        f"(text link, small image, tx hash, or gist). Return JSON: {{\"quests\":[{{\"title\":\"...\",\"instructions\":\"...\"}}]}}"
+    )
+    try:
+        data = await _achat(prompt, 0.5, "generate_quests", track) or {}
+        quests = data.get("quests") if isinstance(data.get("quests"), list) else [data]
+        return [{"title": q["title"], "instructions": q["instructions"]}
+                for q in quests if isinstance(q, dict) and q.get("title") and q.get("instructions")][:n]
+    except Exception as e:
+        print("quest_error:", repr(e))
+    return []
+
+def _load_pool(track: str):
+    key = (track, PROMPT_VERSION)
+    pool = _pools.get(key)
+    if pool is None:
+        pool = db.get_quest_pool(track, PROMPT_VERSION, since=time.time() - QUEST_TTL)
+        _pools.set(key, pool)
+    return pool
+
+async def _refill_pool(track: str):
+    try:
+        pool = await asyncio.to_thread(db.get_quest_pool, track, PROMPT_VERSION, since=time.time() - QUEST_TTL)
+        missing = QUEST_POOL_SIZE - len(pool)
+        if missing > 0:
+            for q in await _generate_quests(track, missing):
+                await asyncio.to_thread(db.save_pool_quest, track, PROMPT_VERSION, q)
+        await asyncio.to_thread(db.prune_quest_pool, before=time.time() - QUEST_TTL)
+        _pools.pop((track, PROMPT_VERSION))
+    except Exception as e:
+        print("quest_pool_error:", repr(e))
+    finally:
+        with _refill_lock:
+            _refilling.pop(track, None)
+
+def refill_quest_pool(track: str, wait: bool = False):
+    """Top the track's pool back up to QUEST_POOL_SIZE on the LLM loop."""
+    if not llm_enabled():
+        return
+    with _refill_lock:
+        fut = _refilling.get(track)
+        if fut is None:
+            fut = _refilling[track] = asyncio.run_coroutine_threadsafe(_refill_pool(track), _get_loop())
+    if wait:
+        fut.result()
+
+_warmed = False
+
+def warm_up(wait: bool = False):
+    """Fill the quest pools of all TRACKS concurrently; once per process."""
+    global _warmed
+    if _warmed:
+        return
+    _warmed = True
+    for t in TRACKS:
+        refill_quest_pool(t)
+    if wait:
+        for t in TRACKS:
+            fut = _refilling.get(t)
+            if fut:
+                fut.result()
+
+def _third_quest(track: str, user_id=None):
+    if user_id:
+        q = _pinned.get((user_id, track)) or db.get_user_quest(user_id, track, PROMPT_VERSION)
+        if q:
+            _pinned.set((user_id, track), q)
+            return q
+
+    pool, fallback = _load_pool(track), False
+    if pool:
+        q = random.choice(pool) if user_id else pool[0]
+        q = {"title": q["title"], "instructions": q["instructions"]}
+    else:
+        # cold pool: generate one inline so the student isn't kept waiting on the refill
+        q = next(iter(_run(_generate_quests(track, 1))), None) if llm_enabled() else None
+        if q:
+            db.save_pool_quest(track, PROMPT_VERSION, q)
+            _pools.pop((track, PROMPT_VERSION))
+        else:
+            q, fallback = HARDCODED_QUESTS.get(track, DEFAULT_FALLBACK), True
+            db.llm_metrics.fallback("generate_quests", track)
+    if len(pool) < QUEST_POOL_SIZE:
+        refill_quest_pool(track)
+
+    if user_id and fallback:
+        _pinned.set((user_id, track), q, ttl=FALLBACK_PIN_TTL)
+    elif user_id:
+        q = db.set_user_quest(user_id, track, PROMPT_VERSION, q) or q
+        _pinned.set((user_id, track), q)
+    return q
+
+def make_micro_quests(track: str, user_id=None):
+    """Two fixed quests + one cached AI micro-quest (pinned per user) with solid fallbacks."""
     quests = [
         {
             "title": "Join Superteam Ireland Telegram",
@@ -53,55 +274,11 @@ def make_micro_quests(track: str):
             "instructions": f"Follow {os.getenv('SUPERTEAM_X_HANDLE','@superteamIE')} and paste your handle. Upload a screenshot of the follow."
         },
     ]
-
-    hardcoded = {
-        "AI/Data": {
-            "title": "Mini Data Viz",
-            "instructions": "Download a small Solana dataset (e.g., token prices on devnet) and create a simple chart. Upload PNG or share a Colab/Gist link."
-        },
-        "Dev": {
-            "title": "Hello Solana Tx",
-            "instructions": "Send a devnet transaction or run a Hello-Solana starter. Paste the tx hash or upload a screenshot of the confirmed tx."
-        },
-        "Design": {
-            "title": "Bounty Card Mockup",
-            "instructions": "Design a quick poster/banner or bounty card for a student sprint. Upload a PNG/JPG of your mock."
-        },
-        "Growth": {
-            "title": "Tweet Hooks",
-            "instructions": "Write 3 tweet ideas to promote Superteam Ireland onboarding. Paste the text or share a public doc link."
-        },
-    }
-    default_fallback = {"title": "Share Your Why",
-                        "instructions": "Post a short note (or tweet draft) on why you’re joining Superteam Ireland and paste the link or text here."}
-
-    client = _client()
-    if not client:
-        quests.append(hardcoded.get(track, default_fallback))
-        return quests
-
-    prompt = (
-        f"Create ONE short and easy micro-quest for the '{track}' track. It must take <50 minutes and yield a shareable artifact "
-        f"(text link, small image, tx hash, or gist). Return JSON: {{\"title\":\"...\",\"instructions\":\"...\"}}"
-    )
     try:
-        r = client.chat.completions.create(
-            model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
-            messages=[
-                {"role": "system", "content": "Respond with valid JSON only."},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.5,
-            response_format={"type": "json_object"},
-        )
-        third = json.loads(r.choices[0].message.content or "{}")
-        title, instr = third.get("title"), third.get("instructions")
-        if title and instr:
-            quests.append({"title": title, "instructions": instr})
-        else:
-            quests.append(hardcoded.get(track, default_fallback))
+        quests.append(_third_quest(track, user_id))
     except Exception as e:
-        print("quest_error:", e)
-        quests.append(hardcoded.get(track, default_fallback))
-
+        # cache backend unavailable: keep the page usable with the static quest
+        print("quest_cache_error:", e)
+        db.llm_metrics.fallback("generate_quests", track)
+        quests.append(HARDCODED_QUESTS.get(track, DEFAULT_FALLBACK))
     return quests
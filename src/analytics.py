@@ -0,0 +1,91 @@
+# src/analytics.py
+"""Onboarding funnel over the events table:
+
+    profile saved -> quest 1 -> quest 2 -> quest 3 submitted -> first approval
+
+Pages emit `profile_saved` / `submission_created` events and the database
+records `submission_approved` when a proof is approved. refresh() folds the
+events newer than the backend's high-water mark into hourly and daily
+rollups (funnel_rollup), counting each student once per stage, in the bucket
+they first reached it. Readers only ever touch the rollups.
+
+Events are buffered (src/events.py) and may land a little after their `ts`,
+so the mark trails the clock by FUNNEL_LAG seconds; events that arrive later
+than that are not counted.
+"""
+import os, threading, time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from . import db
+
+FUNNEL_STAGES = ["profile", "quest_1", "quest_2", "quest_3", "approved"]
+STAGE_LABELS = {
+    "profile": "Profile saved",
+    "quest_1": "Q1 submitted (Telegram)",
+    "quest_2": "Q2 submitted (X follow)",
+    "quest_3": "Q3 submitted (micro-quest)",
+    "approved": "First proof approved",
+}
+
+FUNNEL_LAG = float(os.getenv("FUNNEL_LAG", "120"))            # seconds the mark trails now
+FUNNEL_REFRESH = float(os.getenv("FUNNEL_REFRESH", "60"))     # min seconds between refreshes
+
+_last_refresh = 0.0
+_refresh_lock = threading.Lock()
+
+def refresh(force: bool = False) -> int:
+    """Fold new events into the rollups (at most every FUNNEL_REFRESH
+    seconds per process unless `force`); returns newly counted (user, stage)."""
+    global _last_refresh
+    if not force and time.monotonic() - _last_refresh < FUNNEL_REFRESH:
+        return 0
+    with _refresh_lock:
+        if not force and time.monotonic() - _last_refresh < FUNNEL_REFRESH:
+            return 0
+        try:
+            n = db.refresh_funnel(time.time() - FUNNEL_LAG)
+        except Exception as e:
+            print("funnel_refresh_error:", e)
+            return 0
+        _last_refresh = time.monotonic()
+        return n
+
+def _since(days: Optional[float]) -> float:
+    return time.time() - days * 86400 if days else 0.0
+
+def funnel(by: Optional[str] = None, days: Optional[float] = None) -> List[Dict]:
+    """Students per stage, overall (by=None) or per "track" / "uni", from the
+    daily rollup. Each row: {by: value, <stage>: n, ...}, largest groups first."""
+    refresh()
+    groups = {}
+    for r in db.get_funnel("day", _since(days)):
+        key = r[by] if by else ""
+        g = groups.setdefault(key, dict({by: key} if by else {}, **{s: 0 for s in FUNNEL_STAGES}))
+        if r["stage"] in g:
+            g[r["stage"]] += r["users"]
+    return sorted(groups.values(), key=lambda g: -g["profile"])
+
+def hourly(days: float = 2) -> List[Dict]:
+    """One row per hour with students reaching each stage in it (for charts)."""
+    refresh()
+    hours = {}
+    for r in db.get_funnel("hour", _since(days)):
+        h = hours.setdefault(r["bucket"], {s: 0 for s in FUNNEL_STAGES})
+        if r["stage"] in h:
+            h[r["stage"]] += r["users"]
+    return [dict(hour=datetime.fromtimestamp(b, timezone.utc), **h) for b, h in sorted(hours.items())]
+
+def stage_rows(counts: Dict) -> List[Dict]:
+    """A funnel() row as a table: students per stage, share of profiles and
+    of the previous stage."""
+    out, prev = [], None
+    top = counts.get("profile") or 0
+    for s in FUNNEL_STAGES:
+        n = counts.get(s, 0)
+        out.append({
+            "stage": STAGE_LABELS[s], "students": n,
+            "of profiles": f"{n / top:.0%}" if top else "–",
+            "of previous": f"{n / prev:.0%}" if prev else "–",
+        })
+        prev = n
+    return out
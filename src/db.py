@@ -1,12 +1,27 @@
 # src/db.py
 # # --- env bootstrap (must be first) ---
-import os
-from dotenv import load_dotenv, find_dotenv
-import sqlite3, json, time, uuid
-from typing import Optional, Dict
+# .env has to be loaded at import: this module, agent, review, analytics,
+# uploads and images read their settings into module constants then. Only
+# the lookup is unconditional; python-dotenv is imported when a file exists.
+import os, io, csv, json, time, logging, threading
+from typing import Dict
 
-dotenv_path = find_dotenv(filename=".env", usecwd=True)
-load_dotenv(dotenv_path=dotenv_path, override=True)
+def _find_dotenv(name: str = ".env") -> str:
+    # what find_dotenv(usecwd=True) does: the cwd, then each parent
+    d = os.getcwd()
+    while True:
+        path = os.path.join(d, name)
+        if os.path.isfile(path):
+            return path
+        parent = os.path.dirname(d)
+        if parent == d:
+            return ""
+        d = parent
+
+dotenv_path = _find_dotenv()
+if dotenv_path:
+    from dotenv import load_dotenv
+    load_dotenv(dotenv_path=dotenv_path, override=True)
 
 def env_bool(name: str, default: bool=False) -> bool:
     v = os.getenv(name)
@@ -14,247 +29,334 @@ def env_bool(name: str, default: bool=False) -> bool:
         return default
     return str(v).strip().lower() in ("1", "true", "yes", "on")
 
-# Optional: debug prints during startup (shows in Streamlit terminal)
-print("DB dotenv loaded from:", dotenv_path or "(not found)")
-print("DB USE_SUPABASE raw:", repr(os.getenv("USE_SUPABASE")))
-
-# Toggle: use Supabase backend or local SQLite
+# Backend registry: DB_BACKEND picks one of BACKENDS (sqlite by default);
+# the older USE_SUPABASE=true switch still selects supabase.
 USE_SUPABASE = os.getenv("USE_SUPABASE", "false").lower() == "true"
 
-if USE_SUPABASE:
-    # Use the Supabase implementation ONLY
-    from .db_supabase import (
-        db_init,
-        upsert_user, get_user, get_user_by_handle, get_or_create_track, set_track,
-        save_event, save_submission, get_submissions,
-        admin_list_subs, admin_set_status,
-        export_csv, export_users_csv,
-        recap_stats, list_social_posts,
-    )
-
-else:
-    # ---------------------------
-    # SQLite implementation
-    # ---------------------------
-
-    DB_PATH = os.getenv("DB_PATH", "sprint.db")
-    UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-    def db_conn():
-        con = sqlite3.connect(DB_PATH, check_same_thread=False)
-        con.execute("PRAGMA foreign_keys = ON;")
-        return con
-
-    def _dedupe_users_and_add_indexes(con):
-        # 1) find duplicate groups by telegram and by x
-        def groups(by_col):
-            q = f"""
-            SELECT {by_col} AS k, id, created_at
-            FROM users WHERE {by_col} IS NOT NULL
-            ORDER BY k, created_at DESC
-            """
-            rows = con.execute(q).fetchall()
-            buckets = {}
-            for k, uid, ts in rows:
-                buckets.setdefault(k, []).append((uid, ts))
-            return [v for v in buckets.values() if len(v) > 1]
-
-        # survivor = newest created_at; reassign proofs/events from losers
-        for col in ("telegram", "x"):
-            for grp in groups(col):
-                survivor = grp[0][0]                  # newest first
-                losers   = [u for u, _ in grp[1:]]
-                for lid in losers:
-                    con.execute("UPDATE submissions SET user_id=? WHERE user_id=?", (survivor, lid))
-                    con.execute("UPDATE events      SET user_id=? WHERE user_id=?", (survivor, lid))
-                    con.execute("DELETE FROM users WHERE id=?", (lid,))
-        con.commit()
-
-        # 2) create unique indexes (now that dups are gone)
-        con.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_users_telegram ON users(telegram) WHERE telegram IS NOT NULL;")
-        con.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_users_x        ON users(x)       WHERE x IS NOT NULL;")
-        con.commit()
-
-    def db_init():
-        con = db_conn()
-        # tables only (no unique indexes here)
-        con.executescript("""
-        PRAGMA foreign_keys = ON;
-        CREATE TABLE IF NOT EXISTS users (
-          id TEXT PRIMARY KEY,
-          name TEXT, uni TEXT, telegram TEXT, x TEXT, wallet TEXT, track TEXT,
-          created_at REAL DEFAULT (strftime('%s','now'))
-        );
-        CREATE TABLE IF NOT EXISTS submissions (
-          id TEXT PRIMARY KEY,
-          user_id TEXT, quest_idx INTEGER, title TEXT, track TEXT,
-          text TEXT, file_path TEXT, status TEXT,
-          created_at REAL DEFAULT (strftime('%s','now')),
-          FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
-        );
-        CREATE TABLE IF NOT EXISTS events (
-          id TEXT PRIMARY KEY,
-          user_id TEXT, type TEXT, meta_json TEXT,
-          ts REAL DEFAULT (strftime('%s','now')),
-          FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
-        );
-        """)
-        con.commit()
-        _dedupe_users_and_add_indexes(con)
-        con.close()
-        return True
-
-    def upsert_user(name, uni, telegram, x, wallet) -> str:
-        con = db_conn()
-        row = con.execute(
-            "SELECT id FROM users WHERE (telegram IS NOT NULL AND telegram=?) OR (x IS NOT NULL AND x=?)",
-            (telegram or None, x or None)
-        ).fetchone()
-        if row:
-            uid = row[0]
-            con.execute("UPDATE users SET name=?, uni=?, wallet=? WHERE id=?", (name, uni, wallet, uid))
-        else:
-            uid = str(uuid.uuid4())
-            con.execute(
-                "INSERT INTO users (id,name,uni,telegram,x,wallet) VALUES (?,?,?,?,?,?)",
-                (uid, name, uni, telegram or None, x or None, wallet)
-            )
-        con.commit(); con.close()
-        return uid
-
-    def get_user(uid: str) -> Dict:
-        con = db_conn()
-        cur = con.execute("SELECT id,name,uni,telegram,x,wallet,track FROM users WHERE id=?", (uid,))
-        row = cur.fetchone(); con.close()
-        if not row: return {}
-        keys = ["id", "name", "uni", "telegram", "x", "wallet", "track"]
-        return dict(zip(keys, row))
-
-    def get_user_by_handle(tg_handle: Optional[str], x_handle: Optional[str]) -> Optional[Dict]:
-        con = db_conn()
-        if tg_handle:
-            r = con.execute("SELECT id FROM users WHERE telegram=?", (tg_handle,)).fetchone()
-        elif x_handle:
-            r = con.execute("SELECT id FROM users WHERE x=?", (x_handle,)).fetchone()
-        else:
-            r = None
-        con.close()
-        return {"id": r[0]} if r else None
-
-    def save_event(user_id, type, meta):
-        con = db_conn()
-        con.execute("INSERT INTO events (id,user_id,type,meta_json) VALUES (?,?,?,?)",
-                    (str(uuid.uuid4()), user_id, type, json.dumps(meta or {})))
-        con.commit(); con.close()
-
-    def get_or_create_track(user_id) -> Optional[str]:
-        con = db_conn()
-        row = con.execute("SELECT track FROM users WHERE id=?", (user_id,)).fetchone()
-        con.close()
-        return row[0] if row and row[0] else None
-
-    def set_track(user_id, track):
-        con = db_conn()
-        con.execute("UPDATE users SET track=? WHERE id=?", (track, user_id))
-        con.commit(); con.close()
-
-    def _save_file(content: bytes) -> str:
-        path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}.png")  # default to png
-        with open(path, "wb") as f:
-            f.write(content)
-        return path
-
-    def save_submission(user_id, quest_idx, title, track, text, file) -> str:
-        file_path = _save_file(file) if file else None
-        sid = str(uuid.uuid4())
-        con = db_conn()
-        con.execute("""INSERT INTO submissions
-          (id,user_id,quest_idx,title,track,text,file_path,status)
-          VALUES (?,?,?,?,?,?,?,?)""",
-          (sid, user_id, quest_idx, title, track, text, file_path, "pending"))
-        con.commit(); con.close()
-        return sid
-
-    def get_submissions(user_id):
-        con = db_conn()
-        cur = con.execute("""SELECT id,user_id,quest_idx,title,track,text,file_path,status
-                             FROM submissions WHERE user_id=?
-                             ORDER BY created_at DESC""", (user_id,))
-        rows = cur.fetchall(); con.close()
-        keys = ["id","user_id","quest_idx","title","track","text","file_path","status"]
-        return [dict(zip(keys, r)) for r in rows]
-
-    def admin_list_subs(status_filter=None):
-        con = db_conn()
-        q = "SELECT id,user_id,quest_idx,title,track,text,file_path,status FROM submissions"
-        params = ()
-        if status_filter:
-            q += " WHERE status=?"
-            params = (status_filter,)
-        q += " ORDER BY created_at DESC"
-        cur = con.execute(q, params)
-        rows = cur.fetchall(); con.close()
-        keys = ["id","user_id","quest_idx","title","track","text","file_path","status"]
-        return [dict(zip(keys, r)) for r in rows]
-
-    def admin_set_status(sub_id, status):
-        con = db_conn()
-        con.execute("UPDATE submissions SET status=? WHERE id=?", (status, sub_id))
-        con.commit(); con.close()
-
-    def export_csv() -> str:
-        import csv
-        path = "onboarding_proof.csv"
-        con = db_conn()
-        cur = con.execute("""
-          SELECT u.name,u.uni,u.telegram,u.x,s.quest_idx,s.title,s.status,s.created_at
-          FROM submissions s JOIN users u ON u.id=s.user_id
-          ORDER BY s.created_at ASC
-        """)
-        rows = cur.fetchall(); con.close()
-        with open(path, "w", newline="", encoding="utf-8") as f:
-            w = csv.writer(f)
-            w.writerow(["name","uni","telegram","x","quest_idx","title","status","created_at"])
-            w.writerows(rows)
-        return path
-
-    def export_users_csv() -> str:
-        import csv
-        path = "onboarding_users.csv"
-        con = db_conn()
-        rows = con.execute("""
-        WITH marks AS (
-          SELECT user_id,
-            MAX(CASE WHEN title LIKE 'Join Superteam%'    THEN status END) AS joined_telegram,
-            MAX(CASE WHEN title LIKE 'Follow @Superteam%' THEN status END) AS followed_x,
-            MAX(CASE WHEN quest_idx=3                     THEN status END) AS microquest
-          FROM submissions GROUP BY user_id
-        )
-        SELECT u.name,u.uni,u.telegram,u.x,u.track,
-               COALESCE(m.joined_telegram,'pending') AS joined_telegram,
-               COALESCE(m.followed_x,'pending')      AS followed_x,
-               COALESCE(m.microquest,'pending')      AS microquest
-        FROM users u
-        LEFT JOIN marks m ON m.user_id=u.id
-        ORDER BY u.created_at ASC
-        """).fetchall()
-        headers = ["name","uni","telegram","x","track","joined_telegram","followed_x","microquest"]
-        with open(path, "w", newline="", encoding="utf-8") as f:
-            w = csv.writer(f); w.writerow(headers); w.writerows(rows)
-        return path
-
-    def recap_stats():
-        con = db_conn()
-        students = con.execute("SELECT COUNT(*) FROM users").fetchone()[0]
-        subs = con.execute("SELECT COUNT(*) FROM submissions").fetchone()[0]
-        approved = con.execute("SELECT COUNT(*) FROM submissions WHERE status='approved'").fetchone()[0]
-        con.close()
-        return {"students": students, "subs": subs, "approved": approved}
-
-    def list_social_posts():
-        con = db_conn()
-        cur = con.execute("SELECT text FROM submissions WHERE text LIKE 'http%'")
-        urls = [r[0] for r in cur.fetchall()]
-        con.close()
-        return urls
+def _sqlite():
+    # local SQLite file (pooled WAL connections; see src/db_sqlite.py)
+    from . import db_sqlite
+    return db_sqlite
+
+def _supabase():
+    from . import db_supabase
+    return db_supabase
+
+def _memory():
+    # the SQLite backend on a process-private in-memory database, with uploads
+    # in a temp dir: same SQL and migrations, nothing left on disk (tests, benchmarks)
+    import tempfile
+    from . import db_sqlite
+    db_sqlite.configure(db_sqlite.MEMORY_DB, upload_dir=tempfile.mkdtemp(prefix="sprint-uploads-"))
+    return db_sqlite
+
+BACKENDS = {"sqlite": _sqlite, "supabase": _supabase, "memory": _memory}
+
+DB_BACKEND = os.getenv("DB_BACKEND", "supabase" if USE_SUPABASE else "sqlite").strip().lower()
+if DB_BACKEND not in BACKENDS:
+    raise ValueError(f"DB_BACKEND must be one of {sorted(BACKENDS)}, got {DB_BACKEND!r}")
+
+# The backend module is imported on first use, not with this one: the
+# Supabase SDK alone takes ~0.5 s to import, which every cold start and new
+# worker would otherwise pay before its first render.
+_backend = None
+_backend_lock = threading.Lock()
+
+def _get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                backend = BACKENDS[DB_BACKEND]()
+                globals().update({name: getattr(backend, name) for name in PASSTHROUGH})
+                _backend = backend
+                logging.getLogger(__name__).debug("%s backend (.env: %s)", DB_BACKEND, dotenv_path or "not found")
+    return _backend
+
+# served by the backend as-is; the wrappers below add caching / buffering
+PASSTHROUGH = (
+    "db_init",
+    "admin_list_subs", "admin_list_subs_page", "get_submission",
+    "change_cursor", "changes_since",
+    "get_signed_url", "get_signed_urls",
+    "iter_export_rows", "iter_users_rows", "export_watermark",
+    "list_social_posts", "reconcile_stats", "search_subs",
+    "get_quest_pool", "save_pool_quest", "prune_quest_pool",
+    "get_user_quest", "set_user_quest",
+    "refresh_funnel", "get_funnel", "funnel_watermark",
+    "list_review_batch", "get_review_cache", "save_review_cache", "set_reviews", "confident_review_ids",
+)
+
+def __getattr__(name):
+    # PASSTHROUGH names (including `from src.db import db_init`) resolve the
+    # backend on first access and are plain module globals after that
+    if name in PASSTHROUGH:
+        _get_backend()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# ---------------------------
+# Cached stats
+# ---------------------------
+# recap_stats() backs the two busiest pages, so it is served from memory for
+# STATS_TTL seconds; writes made through this process drop the cache at once.
+from .cache import TTLCache
+
+STATS_TTL = float(os.getenv("STATS_TTL", "30"))
+_stats_cache = TTLCache(maxsize=1, ttl=STATS_TTL)
+
+def recap_stats() -> Dict:
+    stats = _stats_cache.get("recap")
+    if stats is None:
+        stats = _get_backend().recap_stats()
+        _stats_cache.set("recap", stats)
+    return stats
+
+# ---------------------------
+# Per-user reads
+# ---------------------------
+# Every Quests page rerun reads the student's user row, track and
+# submissions. They are kept here per user for USER_CACHE_TTL seconds, and
+# the writes below drop exactly the entries they change, so a rerun without
+# changes costs no backend reads. Admin status changes don't say whose
+# submissions they touched, so they drop every cached submission list.
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+_MISS = object()
+_user_cache = {kind: TTLCache(maxsize=4096, ttl=USER_CACHE_TTL) for kind in ("user", "track", "subs")}
+_user_cache_counts = {kind: {"hits": 0, "misses": 0} for kind in _user_cache}
+_counts_lock = threading.Lock()
+
+def _cached(kind, user_id, load):
+    value = _user_cache[kind].get(user_id, _MISS)
+    hit = value is not _MISS
+    with _counts_lock:
+        _user_cache_counts[kind]["hits" if hit else "misses"] += 1
+    if not hit:
+        value = load(user_id)
+        _user_cache[kind].set(user_id, value)
+    return value
+
+def _forget(user_id, *kinds):
+    for kind in kinds:
+        _user_cache[kind].pop(user_id)
+
+def get_user(uid: str) -> Dict:
+    return _cached("user", uid, _get_backend().get_user)
+
+def get_or_create_track(user_id):
+    return _cached("track", user_id, _get_backend().get_or_create_track)
+
+def get_submissions(user_id):
+    return _cached("subs", user_id, _get_backend().get_submissions)
+
+def user_cache_stats() -> Dict:
+    """{kind: {"hits", "misses", "size"}} for user / track / subs."""
+    with _counts_lock:
+        return {k: dict(c, size=len(_user_cache[k])) for k, c in _user_cache_counts.items()}
+
+# Handles are stored in normalize_handle()'s canonical form ("ada_tg", not
+# "@Ada_TG") whichever way they arrive, Profile or roster import, so both
+# match the same row; migration 15 / supabase.sql rewrote older rows.
+from .utils import normalize_handle, handle_key
+
+def get_user_by_handle(tg_handle, x_handle):
+    return _get_backend().get_user_by_handle(handle_key(tg_handle, "telegram"), handle_key(x_handle, "x"))
+
+def upsert_user(name, uni, telegram, x, wallet) -> str:
+    """Create or update the student owning `telegram` or `x`; ValueError when
+    a handle can't be valid (see src.utils.normalize_handle)."""
+    telegram, x = normalize_handle(telegram, "telegram"), normalize_handle(x, "x")
+    uid = _get_backend().upsert_user(name, uni, telegram, x, wallet)
+    _forget(uid, "user")
+    _stats_cache.clear()
+    return uid
+
+def set_track(user_id, track):
+    _get_backend().set_track(user_id, track)
+    _forget(user_id, "user", "track")
+    _stats_cache.clear()
+
+def save_submission(user_id, quest_idx, title, track, text, file) -> str:
+    sid = _get_backend().save_submission(user_id, quest_idx, title, track, text, file)
+    _forget(user_id, "subs")
+    _stats_cache.clear()
+    return sid
+
+def admin_set_status(sub_id, status):
+    _get_backend().admin_set_status(sub_id, status)
+    _user_cache["subs"].clear()
+    _stats_cache.clear()
+
+def admin_set_status_many(ids, status) -> int:
+    n = _get_backend().admin_set_status_many(ids, status) if ids else 0
+    _user_cache["subs"].clear()
+    _stats_cache.clear()
+    return n
+
+def admin_set_status_matching(status_filter, status) -> int:
+    n = _get_backend().admin_set_status_matching(status_filter, status)
+    _user_cache["subs"].clear()
+    _stats_cache.clear()
+    return n
+
+# ---------------------------
+# Roster import
+# ---------------------------
+# Universities send rosters of hundreds to thousands of students. The CSV is
+# read row by row, handles are normalized and validated (src.utils), and
+# every IMPORT_BATCH valid rows go to the backend's import_users() as one
+# bulk write instead of one upsert_user() round trip per student.
+
+IMPORT_BATCH = int(os.getenv("IMPORT_BATCH", "500"))
+ROSTER_COLUMNS = {"name": ("name", "full name", "student"), "uni": ("uni", "university", "college"),
+                  "telegram": ("telegram", "tg"), "x": ("x", "twitter", "x handle"), "wallet": ("wallet",)}
+_ISSUES_KEPT = 200             # per kind, so a broken file doesn't blow up the report
+
+def _roster_row(rec, cols):
+    row = {k: ((rec.get(c) or "") if c else "").strip() or None for k, c in cols.items()}
+    for kind in ("telegram", "x"):
+        row[kind] = normalize_handle(row[kind], kind)   # ValueError on a bad handle
+    if not (row["telegram"] or row["x"]):
+        raise ValueError("no Telegram or X handle")
+    return row
+
+def import_users_csv(f, batch_size: int = IMPORT_BATCH) -> Dict:
+    """Import a roster CSV (binary or text file object; columns matched by
+    ROSTER_COLUMNS, case-insensitive). Returns counts of inserted, updated,
+    conflicting (handles owned by two different users, or a matched user
+    with a different other handle; not written) and invalid rows, plus up to _ISSUES_KEPT examples of the last two with line numbers."""
+    text = io.TextIOWrapper(f, encoding="utf-8-sig", newline="") if not isinstance(f, io.TextIOBase) else f
+    reader = csv.DictReader(text)
+    headers = {h.strip().lower(): h for h in reader.fieldnames or []}
+    cols = {k: next((headers[a] for a in aliases if a in headers), None) for k, aliases in ROSTER_COLUMNS.items()}
+    if not (cols["telegram"] or cols["x"]):
+        raise ValueError("roster needs a telegram or x column")
+    report = {"rows": 0, "inserted": 0, "updated": 0, "conflicts": 0, "invalid": 0,
+              "conflict_rows": [], "invalid_rows": []}
+
+    def write(batch):
+        for (line, row), (outcome, _) in zip(batch, _get_backend().import_users([r for _, r in batch])):
+            if outcome == "conflict":
+                report["conflicts"] += 1
+                if len(report["conflict_rows"]) < _ISSUES_KEPT:
+                    report["conflict_rows"].append({"line": line, "telegram": row["telegram"], "x": row["x"]})
+            else:
+                report[outcome] += 1
+
+    batch = []
+    for rec in reader:
+        report["rows"] += 1
+        line = reader.line_num
+        try:
+            batch.append((line, _roster_row(rec, cols)))
+        except ValueError as e:
+            report["invalid"] += 1
+            if len(report["invalid_rows"]) < _ISSUES_KEPT:
+                report["invalid_rows"].append({"line": line, "error": str(e)})
+            continue
+        if len(batch) >= batch_size:
+            write(batch); batch = []
+    if batch:
+        write(batch)
+    if report["inserted"] or report["updated"]:
+        _user_cache["user"].clear()
+        _stats_cache.clear()
+    return report
+
+# ---------------------------
+# Buffered events
+# ---------------------------
+# save_event() only enqueues; a background thread writes batches through the
+# backend's save_events(). See src/events.py.
+from .events import EventBuffer
+
+_events = EventBuffer(
+    lambda rows: _get_backend().save_events(rows),
+    max_queue=int(os.getenv("EVENT_QUEUE_MAX", "10000")),
+    batch_size=int(os.getenv("EVENT_BATCH_SIZE", "200")),
+    flush_interval=float(os.getenv("EVENT_FLUSH_INTERVAL", "2")),
+)
+
+def save_event(user_id, type, meta=None):
+    _events.put(user_id, type, meta)
+
+def flush_events():
+    _events.flush()
+
+def event_stats() -> Dict:
+    """queued / written / dropped / failed / batches / pending counters."""
+    return _events.stats()
+
+# ---------------------------
+# LLM metrics
+# ---------------------------
+# src/agent.py records every completion into `llm_metrics`; the counters are
+# written through the backend's save_llm_metrics() every
+# LLM_METRICS_FLUSH_INTERVAL seconds. See src/metrics.py.
+from .metrics import LLMMetrics, fold as _fold_llm_metrics
+
+llm_metrics = LLMMetrics(
+    lambda rows: _get_backend().save_llm_metrics(rows),
+    flush_interval=float(os.getenv("LLM_METRICS_FLUSH_INTERVAL", "60")),
+)
+
+def llm_metrics_summary(days: float = 7):
+    """Per (fn, track) totals, fallback counts and p50/p95 latency over the
+    last `days`, including this process's not yet flushed counters."""
+    rows = _get_backend().get_llm_metrics(time.time() - days * 86400)
+    return _fold_llm_metrics(rows + llm_metrics.pending())
+
+# ---------------------------
+# CSV exports
+# ---------------------------
+# Backends yield row chunks (fetchmany on SQLite, keyset pages on Supabase),
+# written as CSV chunk by chunk to a file on disk that export_csv() /
+# export_users_csv() only rewrite when export_watermark() has moved. That
+# file is the public API: st.download_button takes bytes or a file object,
+# not a generator, so the admin page hands it the open file.
+
+PROOF_HEADERS = ["name","uni","telegram","x","quest_idx","title","status","created_at"]
+USER_HEADERS = ["name","uni","telegram","x","track","joined_telegram","followed_x","microquest"]
+
+def _csv_stream(headers, chunks):
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(headers)
+    for rows in chunks:
+        w.writerows(rows)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0); buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+def _stream_export_csv(chunk_size: int = 500):
+    """Submission-level CSV as a generator of byte chunks."""
+    return _csv_stream(PROOF_HEADERS, _get_backend().iter_export_rows(chunk_size))
+
+def _stream_users_csv(chunk_size: int = 200):
+    """One-row-per-student CSV as a generator of byte chunks."""
+    return _csv_stream(USER_HEADERS, _get_backend().iter_users_rows(chunk_size))
+
+def _export_cached(path: str, stream) -> str:
+    mark = json.dumps(_get_backend().export_watermark(), default=str)
+    side = path + ".watermark"
+    try:
+        with open(side, encoding="utf-8") as f:
+            if f.read() == mark and os.path.exists(path):
+                return path
+    except OSError:
+        pass
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        for chunk in stream():
+            f.write(chunk)
+    os.replace(tmp, path)   # readers never see a half-written file
+    with open(side, "w", encoding="utf-8") as f:
+        f.write(mark)
+    return path
+
+def export_csv() -> str:
+    return _export_cached("onboarding_proof.csv", _stream_export_csv)
+
+def export_users_csv() -> str:
+    return _export_cached("onboarding_users.csv", _stream_users_csv)
@@ -0,0 +1,1022 @@
+# src/db_sqlite.py
+import os, sqlite3, json, time, uuid, random, threading, weakref
+from contextlib import contextmanager
+from typing import Optional, Dict
+from .images import normalize_image
+from .uploads import spool
+from .utils import fold_stats, is_url, handle_key
+
+DB_PATH = os.getenv("DB_PATH", "sprint.db")
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")     # created on first upload
+
+BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+LOCK_RETRIES = int(os.getenv("DB_LOCK_RETRIES", "5"))
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+
+# ---------------------------
+# Connection manager
+# ---------------------------
+# Each thread keeps one long-lived connection (Streamlit runs every script
+# run on a thread), so a page render reuses one connection and its statement
+# cache instead of reconnecting per query. When a thread finishes, its
+# connection goes back to a small idle pool for the next thread to pick up.
+# Connections run in autocommit mode; use `transaction()` to group writes.
+
+_local = threading.local()
+_idle = []                      # [(path, con)] released by finished threads
+_idle_lock = threading.Lock()
+
+class _Slot:
+    """Lives in thread-local storage; its finalizer fires when the thread exits."""
+
+def _connect(path: str) -> sqlite3.Connection:
+    con = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None,
+                          check_same_thread=False, cached_statements=256, uri=path.startswith("file:"))
+    con.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS};")
+    con.execute("PRAGMA journal_mode = WAL;")      # readers don't block the writer
+    con.execute("PRAGMA synchronous = NORMAL;")    # safe with WAL, far fewer fsyncs
+    con.execute("PRAGMA foreign_keys = ON;")
+    return con
+
+def _release(path: str, con: sqlite3.Connection):
+    try:
+        if con.in_transaction:
+            con.execute("ROLLBACK")
+        with _idle_lock:
+            if path == DB_PATH and len(_idle) < POOL_SIZE:
+                _idle.append((path, con))
+                return
+        con.close()
+    except sqlite3.Error:
+        pass
+
+def _checkout(path: str) -> sqlite3.Connection:
+    with _idle_lock:
+        while _idle:
+            p, con = _idle.pop()
+            if p == path:
+                return con
+            con.close()
+    return _connect(path)
+
+def db_conn() -> sqlite3.Connection:
+    """The calling thread's connection to DB_PATH (opened on first use)."""
+    con = getattr(_local, "con", None)
+    if con is not None and _local.path == DB_PATH:
+        return con
+    if con is not None:
+        db_close()
+    con = _checkout(DB_PATH)
+    slot = _Slot()
+    _local.con, _local.path, _local.slot = con, DB_PATH, slot
+    _local.finalizer = weakref.finalize(slot, _release, DB_PATH, con)
+    return con
+
+def db_close():
+    """Close the calling thread's connection (tests, benchmarks, path switches)."""
+    con = getattr(_local, "con", None)
+    if con is None:
+        return
+    _local.finalizer.detach()
+    _local.con = _local.slot = _local.finalizer = None
+    con.close()
+
+# In-memory database shared by every connection of this process (the
+# "memory" backend in src/db.py). Shared-cache readers see a writer's table
+# lock as "database table is locked", which _with_retry treats as busy.
+MEMORY_DB = f"file:sprint-memory-{os.getpid()}?mode=memory&cache=shared"
+_anchor = None                  # keeps the in-memory database alive between connections
+
+def configure(path: str, upload_dir: Optional[str] = None):
+    """Point this process at another database (a file or MEMORY_DB) and
+    optionally another upload directory; the next call reconnects."""
+    global DB_PATH, UPLOAD_DIR, _anchor
+    db_close()
+    DB_PATH = path
+    if upload_dir:
+        UPLOAD_DIR = upload_dir
+    if "mode=memory" in path and _anchor is None:
+        _anchor = _connect(path)
+
+def _is_busy(e: sqlite3.OperationalError) -> bool:
+    msg = str(e).lower()
+    return "locked" in msg or "busy" in msg
+
+def _with_retry(fn):
+    # busy_timeout already waits inside SQLite; this covers the cases it
+    # can't (e.g. lock upgrades) with jittered exponential backoff.
+    for attempt in range(LOCK_RETRIES):
+        try:
+            return fn()
+        except sqlite3.OperationalError as e:
+            if not _is_busy(e) or attempt == LOCK_RETRIES - 1:
+                raise
+            time.sleep(min(0.05 * 2 ** attempt, 1.0) * (0.5 + random.random()))
+
+def _exec(sql: str, params=()) -> sqlite3.Cursor:
+    con = db_conn()
+    return _with_retry(lambda: con.execute(sql, params))
+
+def _one(sql: str, params=()):
+    return _exec(sql, params).fetchone()
+
+def _all(sql: str, params=()):
+    return _exec(sql, params).fetchall()
+
+@contextmanager
+def transaction():
+    """Group several statements into one write transaction that commits once.
+
+    Uses BEGIN IMMEDIATE so the write lock is taken up front (and retried if
+    busy) rather than failing halfway through. Nested use joins the outer one.
+    """
+    con = db_conn()
+    if con.in_transaction:
+        yield con
+        return
+    _with_retry(lambda: con.execute("BEGIN IMMEDIATE"))
+    try:
+        yield con
+    except BaseException:
+        con.execute("ROLLBACK")
+        raise
+    else:
+        con.execute("COMMIT")
+
+# ---------------------------
+# Schema migrations
+# ---------------------------
+# Every page calls db_init() at import time, so it has to be cheap: after the
+# first call in a process it is a set lookup. Migrations run once per
+# database, in order, each in its own transaction, and are recorded in
+# schema_version. Append new steps; never edit an applied one.
+
+# ---------------------------
+# Duplicate-user merge
+# ---------------------------
+# Users sharing a Telegram or X handle are the same student. Duplicates are
+# linked through any shared handle (a telegram twin of one row can be the
+# x twin of another), so the merge works on connected components: every
+# component keeps its newest row; older rows hand over their submissions
+# and events, fill the survivor's missing handles and are deleted. All of
+# it is a few set-based statements over temp tables in the caller's
+# transaction. Run it by hand with `python -m src.maintenance dedupe`.
+
+def _handle_key(col: str, normalized: bool) -> str:
+    # src.utils.handle_key, the form src.db stores; registered per connection
+    return f"handle_key({col}, '{col}')" if normalized else col
+
+def merge_duplicate_users(con, dry_run: bool = False, normalized: bool = False) -> dict:
+    """Merge users that share a handle; returns what was (or would be) merged.
+
+    `normalized` also treats handles with the same canonical form (case,
+    spaces, a leading @ or a t.me / x.com link aside) as equal. With `dry_run` nothing but temp tables is written.
+    """
+    con.create_function("handle_key", 2, handle_key, deterministic=True)
+    tg, x = _handle_key("telegram", normalized), _handle_key("x", normalized)
+    con.execute("DROP TABLE IF EXISTS temp._dd_keys")
+    con.execute("DROP TABLE IF EXISTS temp._dd_map")
+    # one row per (user, handle) in a group of 2+, linked to the group's smallest id
+    con.execute(f"""CREATE TEMP TABLE _dd_keys AS
+        WITH keyed AS (
+          SELECT id, 't:' || {tg} AS k FROM users WHERE telegram IS NOT NULL AND {tg} <> ''
+          UNION ALL
+          SELECT id, 'x:' || {x} FROM users WHERE x IS NOT NULL AND {x} <> ''
+        ), counted AS (
+          SELECT id, k, COUNT(*) OVER w AS n, MIN(id) OVER w AS root FROM keyed WINDOW w AS (PARTITION BY k)
+        )
+        SELECT id, k, root FROM counted WHERE n > 1""")
+    # connected components over those links; a component's label is its smallest id.
+    # "chained" components hold 3+ rows, e.g. A~B by telegram and B~C by x
+    con.execute("""CREATE TEMP TABLE _dd_map AS
+        WITH RECURSIVE edges(a, b) AS (
+          SELECT id, root FROM _dd_keys UNION SELECT root, id FROM _dd_keys
+        ), reach(id, comp) AS (
+          SELECT a, a FROM edges
+          UNION
+          SELECT e.b, r.comp FROM reach r JOIN edges e ON e.a = r.id
+        ), comps AS (
+          SELECT id, MIN(comp) AS comp FROM reach GROUP BY id
+        ), ranked AS (
+          SELECT c.id, c.comp, ROW_NUMBER() OVER (PARTITION BY c.comp ORDER BY u.created_at DESC, u.id DESC) AS rn,
+                 FIRST_VALUE(c.id) OVER (PARTITION BY c.comp ORDER BY u.created_at DESC, u.id DESC) AS survivor
+          FROM comps c JOIN users u ON u.id = c.id
+        )
+        SELECT id AS loser, survivor, comp FROM ranked WHERE rn > 1""")
+    con.execute("CREATE UNIQUE INDEX temp._dd_map_loser ON _dd_map(loser)")
+
+    stats = dict(zip(
+        ["duplicate_handles", "components", "users_merged", "chained_components", "submissions_moved", "events_moved"],
+        con.execute("""SELECT
+            (SELECT COUNT(DISTINCT k) FROM _dd_keys),
+            (SELECT COUNT(DISTINCT comp) FROM _dd_map),
+            (SELECT COUNT(*) FROM _dd_map),
+            (SELECT COUNT(*) FROM (SELECT comp FROM _dd_map GROUP BY comp HAVING COUNT(*) > 1)),
+            (SELECT COUNT(*) FROM submissions WHERE user_id IN (SELECT loser FROM _dd_map)),
+            (SELECT COUNT(*) FROM events WHERE user_id IN (SELECT loser FROM _dd_map))""").fetchone()))
+    stats["dry_run"] = dry_run
+    if dry_run or not stats["users_merged"]:
+        con.execute("DROP TABLE temp._dd_keys"); con.execute("DROP TABLE temp._dd_map")
+        return stats
+
+    moved = "(SELECT survivor FROM _dd_map WHERE loser = {t}.user_id)"
+    con.execute(f"UPDATE submissions SET user_id = {moved.format(t='submissions')} WHERE user_id IN (SELECT loser FROM _dd_map)")
+    con.execute(f"UPDATE events SET user_id = {moved.format(t='events')} WHERE user_id IN (SELECT loser FROM _dd_map)")
+    con.execute("DELETE FROM user_quests WHERE user_id IN (SELECT loser FROM _dd_map)")   # pinned quests regenerate
+    # the survivor keeps its own handles and takes the newest loser's where it has none
+    con.execute("""CREATE TEMP TABLE _dd_handles AS
+        SELECT m.survivor,
+          (SELECT l.telegram FROM _dd_map m2 JOIN users l ON l.id = m2.loser
+           WHERE m2.survivor = m.survivor AND l.telegram IS NOT NULL ORDER BY l.created_at DESC LIMIT 1) AS telegram,
+          (SELECT l.x FROM _dd_map m2 JOIN users l ON l.id = m2.loser
+           WHERE m2.survivor = m.survivor AND l.x IS NOT NULL ORDER BY l.created_at DESC LIMIT 1) AS x
+        FROM (SELECT DISTINCT survivor FROM _dd_map) m""")
+    con.execute("DELETE FROM users WHERE id IN (SELECT loser FROM _dd_map)")
+    con.execute("""UPDATE users SET
+        telegram = COALESCE(telegram, (SELECT h.telegram FROM _dd_handles h WHERE h.survivor = users.id)),
+        x        = COALESCE(x,        (SELECT h.x        FROM _dd_handles h WHERE h.survivor = users.id))
+        WHERE id IN (SELECT survivor FROM _dd_handles)""")
+    for t in ("_dd_keys", "_dd_map", "_dd_handles"):
+        con.execute(f"DROP TABLE temp.{t}")
+    return stats
+
+def _dedupe_users_and_add_indexes(con):
+    # 1) merge duplicate users (set-based; see merge_duplicate_users)
+    stats = merge_duplicate_users(con)
+    if stats["users_merged"]:
+        print("db_migrate: merged duplicate users:", stats)
+
+    # 2) create unique indexes (now that dups are gone)
+    con.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_users_telegram ON users(telegram) WHERE telegram IS NOT NULL;")
+    con.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_users_x        ON users(x)       WHERE x IS NOT NULL;")
+
+def _normalize_handles(con):
+    # src.db now stores every handle canonical: merge users whose handles
+    # only differ in form, then rewrite the survivors' handles to that form
+    stats = merge_duplicate_users(con, normalized=True)
+    if stats["users_merged"]:
+        print("db_migrate: merged duplicate users:", stats)
+    for col in ("telegram", "x"):
+        key = _handle_key(col, True)
+        con.execute(f"UPDATE users SET {col} = {key} WHERE {col} IS NOT NULL AND {col} IS NOT {key}")
+
+def _stats_delta(row: str, sign: int, table: str) -> str:
+    """SQL adding (sign=1) or removing (sign=-1) one users/submissions row's
+    contribution to stats_rollup; `row` is NEW or OLD inside a trigger."""
+    track = f"'track:'||COALESCE({row}.track,'')"
+    if table == "users":
+        vals = [("students", "''", "1"), ("students", track, "1")]
+    else:
+        quest = f"'quest:'||COALESCE({row}.quest_idx,'')"
+        approved = f"(CASE WHEN {row}.status='approved' THEN 1 ELSE 0 END)"
+        vals = [(m, d, w) for m, w in (("subs", "1"), ("approved", approved))
+                for d in ("''", track, quest)]
+    values = ",".join(f"('{m}',{d},{sign}*{w})" for m, d, w in vals)
+    return (f"INSERT INTO stats_rollup (metric,dim,n) VALUES {values} "
+            "ON CONFLICT(metric,dim) DO UPDATE SET n=n+excluded.n;")
+
+def _create_stats_rollup(con):
+    # Counters for recap_stats, kept exact by triggers so every write path
+    # (including cascades and the dedupe merge) updates them in the same
+    # transaction. reconcile_stats() rebuilds them from the base tables.
+    con.execute("""CREATE TABLE IF NOT EXISTS stats_rollup (
+      metric TEXT NOT NULL, dim TEXT NOT NULL DEFAULT '', n INTEGER NOT NULL DEFAULT 0,
+      PRIMARY KEY(metric, dim)
+    ) WITHOUT ROWID""")
+    for table, cols in (("users", "track"), ("submissions", "status, track, quest_idx")):
+        con.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_stats_{table}_ins AFTER INSERT ON {table}
+          BEGIN {_stats_delta("NEW", 1, table)} END""")
+        con.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_stats_{table}_del AFTER DELETE ON {table}
+          BEGIN {_stats_delta("OLD", -1, table)} END""")
+        con.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_stats_{table}_upd AFTER UPDATE OF {cols} ON {table}
+          BEGIN {_stats_delta("OLD", -1, table)} {_stats_delta("NEW", 1, table)} END""")
+    reconcile_stats()
+
+_NOW = "((julianday('now') - 2440587.5) * 86400.0)"   # epoch seconds, ms precision
+
+def _add_updated_at(con):
+    # Touched by triggers so every write path bumps it; export_watermark()
+    # and incremental readers key off it.
+    for table in ("users", "submissions"):
+        con.execute(f"ALTER TABLE {table} ADD COLUMN updated_at REAL")
+        con.execute(f"UPDATE {table} SET updated_at=created_at")
+        con.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_updated ON {table}(updated_at)")
+        con.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_touch_ins AFTER INSERT ON {table}
+          WHEN NEW.updated_at IS NULL
+          BEGIN UPDATE {table} SET updated_at={_NOW} WHERE id=NEW.id; END""")
+        con.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_touch_upd AFTER UPDATE ON {table}
+          WHEN NEW.updated_at IS OLD.updated_at
+          BEGIN UPDATE {table} SET updated_at={_NOW} WHERE id=NEW.id; END""")
+
+# Full-text search over submissions: subs_fts shares submissions' rowid and
+# carries the owner's name and handles, kept in sync by triggers. VACUUM may
+# renumber rowids of tables without an INTEGER PRIMARY KEY, so
+# reindex_search() rebuilds it from scratch.
+_HANDLES = "trim(coalesce({u}.telegram,'') || ' ' || coalesce({u}.x,''))"
+_FTS_ROW = f"""INSERT INTO subs_fts (rowid, title, text, name, handles)
+    SELECT {{s}}.rowid, {{s}}.title, {{s}}.text, u.name, {_HANDLES.format(u="u")}
+    FROM (SELECT 1) LEFT JOIN users u ON u.id = {{s}}.user_id"""
+
+def _fill_search(con):
+    con.execute("DELETE FROM subs_fts")
+    con.execute(f"""INSERT INTO subs_fts (rowid, title, text, name, handles)
+        SELECT s.rowid, s.title, s.text, u.name, {_HANDLES.format(u="u")}
+        FROM submissions s LEFT JOIN users u ON u.id = s.user_id""")
+
+def _add_search(con):
+    # is_url: written by save_submission with src.utils.is_url; backfilled here the same way
+    con.execute("ALTER TABLE submissions ADD COLUMN is_url INTEGER NOT NULL DEFAULT 0")
+    con.executemany("UPDATE submissions SET is_url=1 WHERE id=?",
+                    [(sid,) for sid, text in con.execute("SELECT id, text FROM submissions WHERE text LIKE 'http%'")
+                     if is_url(text)])
+    con.execute("DROP INDEX IF EXISTS ix_submissions_links")
+    con.execute("CREATE INDEX ix_submissions_url ON submissions(created_at) WHERE is_url=1")
+
+    con.execute("CREATE VIRTUAL TABLE subs_fts USING fts5(title, text, name, handles, tokenize='unicode61 remove_diacritics 2')")
+    # rank = bm25 with name/handles weighted over title over proof text
+    con.execute("INSERT INTO subs_fts (subs_fts, rank) VALUES ('rank', 'bm25(2.0, 1.0, 3.0, 3.0)')")
+    con.execute(f"""CREATE TRIGGER trg_fts_subs_ins AFTER INSERT ON submissions BEGIN
+        {_FTS_ROW.format(s="NEW")}; END""")
+    con.execute("""CREATE TRIGGER trg_fts_subs_del AFTER DELETE ON submissions BEGIN
+        DELETE FROM subs_fts WHERE rowid = OLD.rowid; END""")
+    con.execute(f"""CREATE TRIGGER trg_fts_subs_upd AFTER UPDATE OF title, text, user_id ON submissions BEGIN
+        DELETE FROM subs_fts WHERE rowid = OLD.rowid;
+        {_FTS_ROW.format(s="NEW")}; END""")
+    con.execute(f"""CREATE TRIGGER trg_fts_users_upd AFTER UPDATE OF name, telegram, x ON users BEGIN
+        UPDATE subs_fts SET name = NEW.name, handles = {_HANDLES.format(u="NEW")}
+        WHERE rowid IN (SELECT rowid FROM submissions WHERE user_id = NEW.id); END""")
+    _fill_search(con)
+
+# Funnel analytics (src/analytics.py): approvals are recorded as events by a
+# trigger, so every status write path (single, bulk, matching) emits them.
+# History from before the funnel is backfilled as events marked "backfill".
+_FUNNEL_STAGE = """CASE e.type
+    WHEN 'profile_saved' THEN 'profile'
+    WHEN 'submission_created' THEN 'quest_' || CAST(json_extract(e.meta_json, '$.quest_idx') AS INTEGER)
+    WHEN 'submission_approved' THEN 'approved' END"""
+
+def _add_funnel(con):
+    con.execute("CREATE INDEX ix_events_ts ON events(ts)")
+    con.execute("""CREATE TABLE funnel_seen (
+      user_id TEXT NOT NULL, stage TEXT NOT NULL, ts REAL,
+      PRIMARY KEY(user_id, stage),
+      FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+    ) WITHOUT ROWID""")
+    con.execute("""CREATE TABLE funnel_rollup (
+      grain TEXT NOT NULL, bucket REAL NOT NULL, stage TEXT NOT NULL,
+      track TEXT NOT NULL DEFAULT '', uni TEXT NOT NULL DEFAULT '', users INTEGER NOT NULL DEFAULT 0,
+      PRIMARY KEY(grain, bucket, stage, track, uni)
+    ) WITHOUT ROWID""")
+    con.execute("CREATE TABLE rollup_state (name TEXT PRIMARY KEY, hwm REAL NOT NULL DEFAULT 0)")
+    con.execute(f"""CREATE TRIGGER trg_events_approved AFTER UPDATE OF status ON submissions
+      WHEN NEW.status = 'approved' AND OLD.status IS NOT 'approved' BEGIN
+        INSERT INTO events (id, user_id, type, meta_json, ts)
+        VALUES (lower(hex(randomblob(16))), NEW.user_id, 'submission_approved',
+                json_object('quest_idx', NEW.quest_idx, 'track', NEW.track, 'sub_id', NEW.id), {_NOW});
+      END""")
+    backfill = "json_object('quest_idx', quest_idx, 'track', track, 'backfill', 1)"
+    con.execute("""INSERT INTO events (id, user_id, type, meta_json, ts)
+        SELECT lower(hex(randomblob(16))), id, 'profile_saved', json_object('track', track, 'backfill', 1), created_at
+        FROM users u WHERE NOT EXISTS (SELECT 1 FROM events e WHERE e.user_id = u.id AND e.type = 'profile_saved')""")
+    con.execute(f"""INSERT INTO events (id, user_id, type, meta_json, ts)
+        SELECT lower(hex(randomblob(16))), user_id, 'submission_created', {backfill}, created_at FROM submissions""")
+    con.execute(f"""INSERT INTO events (id, user_id, type, meta_json, ts)
+        SELECT lower(hex(randomblob(16))), user_id, 'submission_approved', {backfill}, COALESCE(updated_at, created_at)
+        FROM submissions WHERE status = 'approved'""")
+
+# Change feed: submissions.seq is bumped from one counter on every insert
+# and every update of a column the admin queue shows, by triggers, so all
+# write paths keep it. Writes are serialized, so seq order is commit order
+# and changes_since() never skips a row.
+_SEQ_COLS = "status, title, text, track, quest_idx, user_id, file_path, thumb_path"
+_NEXT_SEQ = "UPDATE submissions SET seq = (SELECT COALESCE(MAX(seq), 0) + 1 FROM submissions) WHERE rowid = NEW.rowid"
+
+def _add_change_seq(con):
+    con.execute("ALTER TABLE submissions ADD COLUMN seq INTEGER")
+    con.execute("UPDATE submissions SET seq = rowid")
+    con.execute("CREATE UNIQUE INDEX ix_submissions_seq ON submissions(seq)")
+    con.execute(f"CREATE TRIGGER trg_subs_seq_ins AFTER INSERT ON submissions BEGIN {_NEXT_SEQ}; END")
+    con.execute(f"CREATE TRIGGER trg_subs_seq_upd AFTER UPDATE OF {_SEQ_COLS} ON submissions BEGIN {_NEXT_SEQ}; END")
+
+def _add_review(con):
+    # verdicts of src/review.py: cached by content hash, the latest one per
+    # submission on the row itself (so the queue can sort on it and the
+    # change feed carries it)
+    con.execute("""CREATE TABLE review_cache (
+      hash TEXT PRIMARY KEY, verdict TEXT, confidence REAL, reason TEXT, source TEXT,
+      created_at REAL DEFAULT (strftime('%s','now'))
+    ) WITHOUT ROWID""")
+    con.execute("ALTER TABLE submissions ADD COLUMN review_verdict TEXT")
+    con.execute("ALTER TABLE submissions ADD COLUMN review_confidence REAL")
+    con.execute("DROP TRIGGER trg_subs_seq_upd")
+    con.execute(f"""CREATE TRIGGER trg_subs_seq_upd AFTER UPDATE OF {_SEQ_COLS}, review_verdict, review_confidence
+      ON submissions BEGIN {_NEXT_SEQ}; END""")
+
+MIGRATIONS = [
+    (1, "base tables", [
+        """CREATE TABLE IF NOT EXISTS users (
+          id TEXT PRIMARY KEY,
+          name TEXT, uni TEXT, telegram TEXT, x TEXT, wallet TEXT, track TEXT,
+          created_at REAL DEFAULT (strftime('%s','now'))
+        )""",
+        """CREATE TABLE IF NOT EXISTS submissions (
+          id TEXT PRIMARY KEY,
+          user_id TEXT, quest_idx INTEGER, title TEXT, track TEXT,
+          text TEXT, file_path TEXT, status TEXT,
+          created_at REAL DEFAULT (strftime('%s','now')),
+          FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+        )""",
+        """CREATE TABLE IF NOT EXISTS events (
+          id TEXT PRIMARY KEY,
+          user_id TEXT, type TEXT, meta_json TEXT,
+          ts REAL DEFAULT (strftime('%s','now')),
+          FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+        )""",
+        """CREATE TABLE IF NOT EXISTS quest_pool (
+          id TEXT PRIMARY KEY,
+          track TEXT, version TEXT, title TEXT, instructions TEXT,
+          created_at REAL DEFAULT (strftime('%s','now'))
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_quest_pool_track ON quest_pool(track, version, created_at)",
+        """CREATE TABLE IF NOT EXISTS user_quests (
+          user_id TEXT, track TEXT, version TEXT, title TEXT, instructions TEXT,
+          created_at REAL DEFAULT (strftime('%s','now')),
+          PRIMARY KEY(user_id, track),
+          FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+        )""",
+    ]),
+    (2, "dedupe users, unique handle indexes", _dedupe_users_and_add_indexes),
+    (3, "query-path indexes", [
+        "CREATE INDEX IF NOT EXISTS ix_submissions_user    ON submissions(user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_submissions_status  ON submissions(status, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_submissions_created ON submissions(created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_submissions_links   ON submissions(created_at) WHERE text LIKE 'http%'",
+        "CREATE INDEX IF NOT EXISTS ix_events_user         ON events(user_id, ts)",
+        "CREATE INDEX IF NOT EXISTS ix_users_created       ON users(created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_quest_pool_created  ON quest_pool(created_at)",
+    ]),
+    (4, "stats rollup", _create_stats_rollup),
+    (5, "updated_at on users and submissions", _add_updated_at),
+    (6, "keyset indexes for the admin queue", [
+        "DROP INDEX IF EXISTS ix_submissions_status",
+        "DROP INDEX IF EXISTS ix_submissions_created",
+        "CREATE INDEX ix_submissions_status  ON submissions(status, created_at, id)",
+        "CREATE INDEX ix_submissions_created ON submissions(created_at, id)",
+    ]),
+    (7, "proof thumbnails", ["ALTER TABLE submissions ADD COLUMN thumb_path TEXT"]),
+    (8, "content-addressed proof blobs", [
+        """CREATE TABLE blobs (
+          hash TEXT PRIMARY KEY,
+          path TEXT NOT NULL UNIQUE, thumb_path TEXT, bytes INTEGER,
+          refs INTEGER NOT NULL DEFAULT 0,
+          created_at REAL DEFAULT (strftime('%s','now'))
+        )""",
+        # refs = submissions pointing at the blob, kept by triggers so cascaded
+        # deletes count too; legacy uuid-named files simply match no blob
+        """CREATE TRIGGER trg_blobs_ref_ins AFTER INSERT ON submissions WHEN NEW.file_path IS NOT NULL
+           BEGIN UPDATE blobs SET refs = refs + 1 WHERE path = NEW.file_path; END""",
+        """CREATE TRIGGER trg_blobs_ref_del AFTER DELETE ON submissions WHEN OLD.file_path IS NOT NULL
+           BEGIN UPDATE blobs SET refs = refs - 1 WHERE path = OLD.file_path; END""",
+        """CREATE TRIGGER trg_blobs_ref_upd AFTER UPDATE OF file_path ON submissions
+           WHEN OLD.file_path IS NOT NEW.file_path BEGIN
+             UPDATE blobs SET refs = refs - 1 WHERE path = OLD.file_path;
+             UPDATE blobs SET refs = refs + 1 WHERE path = NEW.file_path;
+           END""",
+    ]),
+    (9, "llm metrics", [
+        """CREATE TABLE llm_metrics (
+          ts REAL, fn TEXT, track TEXT,
+          calls INTEGER, ok INTEGER, timeouts INTEGER, parse_errors INTEGER, errors INTEGER,
+          coalesced INTEGER, fallbacks INTEGER, prompt_tokens INTEGER, completion_tokens INTEGER,
+          latency_ms_sum INTEGER, buckets TEXT
+        )""",
+        "CREATE INDEX ix_llm_metrics_ts ON llm_metrics(ts)",
+    ]),
+    (10, "submission search (is_url, subs_fts)", _add_search),
+    (11, "funnel rollups", _add_funnel),
+    (12, "submission change feed (seq)", _add_change_seq),
+    (13, "auto-review verdicts", _add_review),
+    (14, "auto-approve index", [
+        "CREATE INDEX ix_submissions_review ON submissions(status, review_verdict, review_confidence, id)",
+    ]),
+    (15, "canonical handles", _normalize_handles),
+]
+
+_migrated = set()               # DB paths already checked in this process
+_migrate_lock = threading.Lock()
+
+def schema_version() -> int:
+    row = _one("SELECT name FROM sqlite_master WHERE type='table' AND name='schema_version'")
+    return _one("SELECT COALESCE(MAX(version),0) FROM schema_version")[0] if row else 0
+
+def migrate() -> int:
+    """Apply pending migrations; returns the resulting schema version."""
+    _exec("""CREATE TABLE IF NOT EXISTS schema_version (
+      version INTEGER PRIMARY KEY, name TEXT,
+      applied_at REAL DEFAULT (strftime('%s','now'))
+    )""")
+    current = schema_version()
+    for version, name, step in MIGRATIONS:
+        if version <= current:
+            continue
+        with transaction() as con:
+            # another process may have applied it while we waited for the write lock
+            if con.execute("SELECT 1 FROM schema_version WHERE version=?", (version,)).fetchone():
+                continue
+            if callable(step):
+                step(con)
+            else:
+                for sql in step:
+                    con.execute(sql)
+            con.execute("INSERT INTO schema_version (version,name) VALUES (?,?)", (version, name))
+            print(f"db_migrate: applied {version} ({name})")
+    return schema_version()
+
+def db_init():
+    if DB_PATH in _migrated:
+        return True
+    with _migrate_lock:
+        if DB_PATH not in _migrated:
+            migrate()
+            _migrated.add(DB_PATH)
+    return True
+
+# ---------------------------
+# Users
+# ---------------------------
+
+def upsert_user(name, uni, telegram, x, wallet) -> str:
+    with transaction() as con:
+        row = con.execute(
+            "SELECT id FROM users WHERE (telegram IS NOT NULL AND telegram=?) OR (x IS NOT NULL AND x=?)",
+            (telegram or None, x or None)
+        ).fetchone()
+        if row:
+            uid = row[0]
+            con.execute("UPDATE users SET name=?, uni=?, wallet=? WHERE id=?", (name, uni, wallet, uid))
+        else:
+            uid = str(uuid.uuid4())
+            con.execute(
+                "INSERT INTO users (id,name,uni,telegram,x,wallet) VALUES (?,?,?,?,?,?)",
+                (uid, name, uni, telegram or None, x or None, wallet)
+            )
+    return uid
+
+def import_users(rows):
+    """Bulk upsert of roster rows ({name, uni, telegram, x, wallet}, handles
+    already normalized) in one transaction. Existing users are resolved
+    through the unique handle indexes in two queries; new ones go in with
+    one executemany. Blank fields never overwrite stored ones; a handle the
+    user lacks is filled in if nobody else has it. Returns one
+    (outcome, user_id) per row: inserted | updated | conflict (telegram and
+    x belong to two different users, or the matched user already has a
+    different value for the other handle; nothing written)."""
+    rows = list(rows)
+    with transaction() as con:
+        by, have = {"telegram": {}, "x": {}}, {}     # handle -> user id; user id -> its handles
+        for col in ("telegram", "x"):
+            vals = json.dumps(sorted({r[col] for r in rows if r.get(col)}))
+            for uid, tg, x in con.execute(
+                    f"SELECT id, telegram, x FROM users WHERE {col} IN (SELECT value FROM json_each(?))", (vals,)):
+                have[uid] = {"telegram": tg, "x": x}
+                by["telegram"][tg] = by["x"][x] = uid
+        by["telegram"].pop(None, None); by["x"].pop(None, None)
+        out, inserts, updates = [], [], []
+        for r in rows:
+            a, b = by["telegram"].get(r.get("telegram")), by["x"].get(r.get("x"))
+            if a and b and a != b:
+                out.append(("conflict", None))
+                continue
+            uid = a or b
+            if uid and any(r.get(col) and have[uid][col] and have[uid][col] != r[col] for col in ("telegram", "x")):
+                out.append(("conflict", None))
+                continue
+            if uid:
+                fill = {col: r[col] for col in ("telegram", "x")
+                        if r.get(col) and r[col] not in by[col] and not have[uid][col]}
+                for col, h in fill.items():
+                    by[col][h] = uid; have[uid][col] = h
+                updates.append((r.get("name"), r.get("uni"), r.get("wallet"), fill.get("telegram"), fill.get("x"), uid))
+                out.append(("updated", uid))
+                continue
+            uid = str(uuid.uuid4())
+            inserts.append((uid, r.get("name"), r.get("uni"), r.get("telegram"), r.get("x"), r.get("wallet")))
+            have[uid] = {"telegram": r.get("telegram"), "x": r.get("x")}
+            # later rows of the same roster with these handles update this user
+            for col in ("telegram", "x"):
+                if r.get(col):
+                    by[col][r[col]] = uid
+            out.append(("inserted", uid))
+        con.executemany("INSERT INTO users (id,name,uni,telegram,x,wallet) VALUES (?,?,?,?,?,?)", inserts)
+        con.executemany("""UPDATE users SET name=COALESCE(?,name), uni=COALESCE(?,uni), wallet=COALESCE(?,wallet),
+                           telegram=COALESCE(telegram,?), x=COALESCE(x,?) WHERE id=?""", updates)
+    return out
+
+def get_user(uid: str) -> Dict:
+    row = _one("SELECT id,name,uni,telegram,x,wallet,track FROM users WHERE id=?", (uid,))
+    if not row: return {}
+    keys = ["id", "name", "uni", "telegram", "x", "wallet", "track"]
+    return dict(zip(keys, row))
+
+def get_user_by_handle(tg_handle: Optional[str], x_handle: Optional[str]) -> Optional[Dict]:
+    if tg_handle:
+        r = _one("SELECT id FROM users WHERE telegram=?", (tg_handle,))
+    elif x_handle:
+        r = _one("SELECT id FROM users WHERE x=?", (x_handle,))
+    else:
+        r = None
+    return {"id": r[0]} if r else None
+
+def save_event(user_id, type, meta):
+    _exec("INSERT INTO events (id,user_id,type,meta_json) VALUES (?,?,?,?)",
+          (str(uuid.uuid4()), user_id, type, json.dumps(meta or {})))
+
+def save_events(batch):
+    """Bulk insert [(user_id, type, meta, ts), ...] in one transaction."""
+    with transaction() as con:
+        con.executemany("INSERT INTO events (id,user_id,type,meta_json,ts) VALUES (?,?,?,?,?)",
+                        [(str(uuid.uuid4()), u, t, json.dumps(m or {}), ts) for u, t, m, ts in batch])
+
+LLM_METRIC_COLS = ["ts", "fn", "track", "calls", "ok", "timeouts", "parse_errors", "errors", "coalesced",
+                   "fallbacks", "prompt_tokens", "completion_tokens", "latency_ms_sum", "buckets"]
+
+def save_llm_metrics(rows):
+    """Append one flush of src/metrics.py counters (list of dicts)."""
+    with transaction() as con:
+        con.executemany(
+            f"INSERT INTO llm_metrics ({','.join(LLM_METRIC_COLS)}) VALUES ({','.join('?' * len(LLM_METRIC_COLS))})",
+            [[json.dumps(r[c]) if c == "buckets" else r.get(c) for c in LLM_METRIC_COLS] for r in rows])
+
+def get_llm_metrics(since: float):
+    rows = _all(f"SELECT {','.join(LLM_METRIC_COLS)} FROM llm_metrics WHERE ts>=? ORDER BY ts", (since,))
+    out = [dict(zip(LLM_METRIC_COLS, r)) for r in rows]
+    for r in out:
+        r["buckets"] = json.loads(r["buckets"] or "[]")
+    return out
+
+def get_or_create_track(user_id) -> Optional[str]:
+    row = _one("SELECT track FROM users WHERE id=?", (user_id,))
+    return row[0] if row and row[0] else None
+
+def set_track(user_id, track):
+    _exec("UPDATE users SET track=? WHERE id=?", (track, user_id))
+
+# ---------------------------
+# Submissions
+# ---------------------------
+
+def _write_once(path: str, data: bytes):
+    # content-addressed: an existing file already holds these bytes
+    if os.path.exists(path):
+        return
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def _save_file(file):
+    # stored once per distinct upload, keyed by the sha256 of the raw bytes:
+    # uploads/<h[:2]>/<h>.<ext> (normalized original) + <h>_thumb.jpg.
+    # `file` is read once, in chunks, into a size-capped spool (src/uploads.py)
+    raw, h, _ = spool(file)
+    with raw:
+        row = _one("SELECT path, thumb_path FROM blobs WHERE hash=?", (h,))
+        if row and os.path.exists(row[0]):
+            return row[0], row[1]
+        img = normalize_image(raw)
+    folder = os.path.join(UPLOAD_DIR, h[:2])
+    os.makedirs(folder, exist_ok=True)
+    path, thumb = os.path.join(folder, f"{h}.{img['ext']}"), os.path.join(folder, f"{h}_thumb.{img['thumb_ext']}")
+    _write_once(path, img["original"])
+    _write_once(thumb, img["thumb"])
+    _exec("INSERT OR IGNORE INTO blobs (hash,path,thumb_path,bytes) VALUES (?,?,?,?)",
+          (h, path, thumb, len(img["original"]) + len(img["thumb"])))
+    return path, thumb
+
+def get_signed_url(path: str, seconds: int = 3600) -> str:
+    # local uploads are served straight from disk
+    return path
+
+def get_signed_urls(paths, seconds: int = 3600) -> Dict[str, str]:
+    return {p: p for p in paths if p}
+
+def save_submission(user_id, quest_idx, title, track, text, file) -> str:
+    # `file`: an upload (file-like, e.g. Streamlit's UploadedFile) or bytes; read only here
+    file_path, thumb_path = _save_file(file) if file else (None, None)
+    sid = str(uuid.uuid4())
+    _exec("""INSERT INTO submissions
+      (id,user_id,quest_idx,title,track,text,file_path,thumb_path,status,is_url)
+      VALUES (?,?,?,?,?,?,?,?,?,?)""",
+      (sid, user_id, quest_idx, title, track, text, file_path, thumb_path, "pending", int(is_url(text))))
+    return sid
+
+def get_submissions(user_id):
+    rows = _all("""SELECT id,user_id,quest_idx,title,track,text,file_path,status
+                   FROM submissions WHERE user_id=?
+                   ORDER BY created_at DESC""", (user_id,))
+    keys = ["id","user_id","quest_idx","title","track","text","file_path","status"]
+    return [dict(zip(keys, r)) for r in rows]
+
+def admin_list_subs(status_filter=None):
+    q = "SELECT id,user_id,quest_idx,title,track,text,file_path,status FROM submissions"
+    params = ()
+    if status_filter:
+        q += " WHERE status=?"
+        params = (status_filter,)
+    q += " ORDER BY created_at DESC"
+    rows = _all(q, params)
+    keys = ["id","user_id","quest_idx","title","track","text","file_path","status"]
+    return [dict(zip(keys, r)) for r in rows]
+
+LIST_KEYS = ["id","user_id","quest_idx","title","track","status","file_path","thumb_path","created_at",
+             "review_verdict","review_confidence"]
+
+def admin_list_subs_page(status_filter=None, limit: int = 25, cursor=None):
+    """One page of the admin queue, newest first, without proof text.
+
+    `cursor` is the (created_at, id) of the last row on the previous page.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    where, params = [], []
+    if status_filter:
+        where.append("status=?"); params.append(status_filter)
+    if cursor:
+        where.append("(created_at, id) < (?, ?)"); params += list(cursor)
+    q = f"SELECT {','.join(LIST_KEYS)} FROM submissions"
+    if where:
+        q += " WHERE " + " AND ".join(where)
+    q += " ORDER BY created_at DESC, id DESC LIMIT ?"
+    rows = [dict(zip(LIST_KEYS, r)) for r in _all(q, params + [limit + 1])]
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, [rows[-1]["created_at"], rows[-1]["id"]]
+
+def change_cursor() -> int:
+    """Current head of the submissions change feed."""
+    return _one("SELECT COALESCE(MAX(seq), 0) FROM submissions")[0]
+
+def changes_since(cursor: int, limit: int = 500):
+    """Submissions inserted or changed after `cursor`, oldest change first,
+    as LIST_KEYS rows plus `seq`. Returns (rows, next_cursor); call again
+    while a full `limit` came back."""
+    rows = _all(f"SELECT {','.join(LIST_KEYS)}, seq FROM submissions WHERE seq > ? ORDER BY seq LIMIT ?",
+                (cursor or 0, limit))
+    rows = [dict(zip(LIST_KEYS + ["seq"], r)) for r in rows]
+    return rows, (rows[-1]["seq"] if rows else cursor or 0)
+
+def get_submission(sub_id) -> Dict:
+    keys = ["id","user_id","quest_idx","title","track","text","file_path","thumb_path","status","created_at"]
+    row = _one(f"SELECT {','.join(keys)} FROM submissions WHERE id=?", (sub_id,))
+    return dict(zip(keys, row)) if row else {}
+
+def admin_set_status(sub_id, status):
+    _exec("UPDATE submissions SET status=? WHERE id=?", (status, sub_id))
+
+def admin_set_status_many(ids, status) -> int:
+    """Set one status on many submissions in a single transaction."""
+    with transaction() as con:
+        cur = con.executemany("UPDATE submissions SET status=? WHERE id=?", [(status, i) for i in ids])
+    return cur.rowcount
+
+def admin_set_status_matching(status_filter, status) -> int:
+    """Set `status` on every submission currently in `status_filter`."""
+    return _exec("UPDATE submissions SET status=? WHERE status=?", (status, status_filter)).rowcount
+
+# ---------------------------
+# Auto-review (see src/review.py)
+# ---------------------------
+
+REVIEW_KEYS = ["id","user_id","quest_idx","title","track","text","file_path","created_at",
+               "review_verdict","review_confidence","telegram","x"]
+
+def list_review_batch(limit: int = 200, cursor=None):
+    """Pending submissions with proof text and the owner's handles, one
+    keyset page (newest first) at a time. Returns (rows, next_cursor)."""
+    where, params = ["s.status='pending'"], []
+    if cursor:
+        where.append("(s.created_at, s.id) < (?, ?)"); params += list(cursor)
+    rows = _all(f"""SELECT s.id, s.user_id, s.quest_idx, s.title, s.track, s.text, s.file_path, s.created_at,
+                           s.review_verdict, s.review_confidence, u.telegram, u.x
+                    FROM submissions s LEFT JOIN users u ON u.id = s.user_id
+                    WHERE {' AND '.join(where)} ORDER BY s.created_at DESC, s.id DESC LIMIT ?""", params + [limit + 1])
+    rows = [dict(zip(REVIEW_KEYS, r)) for r in rows]
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, [rows[-1]["created_at"], rows[-1]["id"]]
+
+def get_review_cache(hashes) -> Dict[str, Dict]:
+    vals = json.dumps(sorted(set(hashes)))
+    rows = _all("""SELECT hash, verdict, confidence, reason, source FROM review_cache
+                   WHERE hash IN (SELECT value FROM json_each(?))""", (vals,))
+    return {r[0]: dict(zip(("hash", "verdict", "confidence", "reason", "source"), r)) for r in rows}
+
+def save_review_cache(rows):
+    with transaction() as con:
+        con.executemany("""INSERT OR REPLACE INTO review_cache (hash, verdict, confidence, reason, source)
+                           VALUES (?,?,?,?,?)""",
+                        [(r["hash"], r["verdict"], r["confidence"], r.get("reason"), r.get("source")) for r in rows])
+
+def confident_review_ids(threshold: float):
+    """Ids of pending submissions pre-reviewed as approve with confidence >=
+    threshold, from ix_submissions_review alone."""
+    return [r[0] for r in _all("""SELECT id FROM submissions
+        WHERE status='pending' AND review_verdict='approve' AND review_confidence >= ?""", (threshold,))]
+
+def set_reviews(reviews):
+    """[(sub_id, verdict, confidence), ...] onto the submissions, one transaction."""
+    with transaction() as con:
+        con.executemany("UPDATE submissions SET review_verdict=?, review_confidence=? WHERE id=?",
+                        [(v, c, sid) for sid, v, c in reviews])
+
+# ---------------------------
+# CSV exports
+# ---------------------------
+
+# Generators yield lists of rows (chunk_size at a time) from a single cursor
+# via fetchmany; src/db turns them into CSV files / download streams.
+
+def _iter_chunks(sql: str, params=(), chunk_size: int = 500):
+    cur = _exec(sql, params)
+    while True:
+        rows = cur.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield rows
+
+def iter_export_rows(chunk_size: int = 500):
+    return _iter_chunks("""
+      SELECT u.name,u.uni,u.telegram,u.x,s.quest_idx,s.title,s.status,s.created_at
+      FROM submissions s JOIN users u ON u.id=s.user_id
+      ORDER BY s.created_at ASC
+    """, chunk_size=chunk_size)
+
+def iter_users_rows(chunk_size: int = 500):
+    return _iter_chunks("""
+    WITH marks AS (
+      SELECT user_id,
+        MAX(CASE WHEN title LIKE 'Join Superteam%'    THEN status END) AS joined_telegram,
+        MAX(CASE WHEN title LIKE 'Follow @Superteam%' THEN status END) AS followed_x,
+        MAX(CASE WHEN quest_idx=3                     THEN status END) AS microquest
+      FROM submissions GROUP BY user_id
+    )
+    SELECT u.name,u.uni,u.telegram,u.x,u.track,
+           COALESCE(m.joined_telegram,'pending') AS joined_telegram,
+           COALESCE(m.followed_x,'pending')      AS followed_x,
+           COALESCE(m.microquest,'pending')      AS microquest
+    FROM users u
+    LEFT JOIN marks m ON m.user_id=u.id
+    ORDER BY u.created_at ASC
+    """, chunk_size=chunk_size)
+
+def export_watermark():
+    """Changes whenever exported data does: latest updated_at on users and
+    submissions plus the row counts (which catch deletes)."""
+    return list(_one("""SELECT (SELECT MAX(updated_at) FROM users),
+                               (SELECT MAX(updated_at) FROM submissions),
+                               (SELECT n FROM stats_rollup WHERE metric='students' AND dim=''),
+                               (SELECT n FROM stats_rollup WHERE metric='subs' AND dim='')"""))
+
+# ---------------------------
+# Stats
+# ---------------------------
+
+def recap_stats():
+    return fold_stats(_all("SELECT metric, dim, n FROM stats_rollup"))
+
+def reconcile_stats():
+    """Rebuild stats_rollup from users/submissions (repairs any drift)."""
+    with transaction() as con:
+        con.execute("DELETE FROM stats_rollup")
+        con.execute("""
+        INSERT INTO stats_rollup (metric, dim, n)
+        SELECT 'students', '', COUNT(*) FROM users
+        UNION ALL SELECT 'students', 'track:'||COALESCE(track,''), COUNT(*) FROM users GROUP BY 2
+        UNION ALL SELECT 'subs', '', COUNT(*) FROM submissions
+        UNION ALL SELECT 'subs', 'track:'||COALESCE(track,''), COUNT(*) FROM submissions GROUP BY 2
+        UNION ALL SELECT 'subs', 'quest:'||COALESCE(quest_idx,''), COUNT(*) FROM submissions GROUP BY 2
+        UNION ALL SELECT 'approved', '', COUNT(*) FROM submissions WHERE status='approved'
+        UNION ALL SELECT 'approved', 'track:'||COALESCE(track,''), COUNT(*) FROM submissions WHERE status='approved' GROUP BY 2
+        UNION ALL SELECT 'approved', 'quest:'||COALESCE(quest_idx,''), COUNT(*) FROM submissions WHERE status='approved' GROUP BY 2
+        """)
+
+def list_social_posts():
+    return [r[0] for r in _all("SELECT text FROM submissions WHERE is_url=1")]
+
+# ---------------------------
+# Search
+# ---------------------------
+
+def _fts_query(query: str) -> str:
+    # every word must match, as a prefix; quoting keeps user input out of FTS5 syntax
+    words = [w.replace('"', '""') for w in query.split() if any(c.isalnum() for c in w)]
+    return " ".join(f'"{w}"*' for w in words)
+
+def search_subs(query: str, status_filter=None, limit: int = 25, cursor=None):
+    """Submissions matching `query` in title, proof text, student name or
+    handles, best match first. Returns (rows, next_cursor); rows carry
+    LIST_KEYS plus `name`, and the cursor is the offset of the next page."""
+    match = _fts_query(query or "")
+    if not match:
+        return [], None
+    offset = cursor or 0
+    q = f"""SELECT {','.join('s.' + k for k in LIST_KEYS)}, u.name
+            FROM subs_fts f JOIN submissions s ON s.rowid = f.rowid
+            LEFT JOIN users u ON u.id = s.user_id
+            WHERE subs_fts MATCH ?"""
+    params = [match]
+    if status_filter:
+        q += " AND s.status=?"
+        params.append(status_filter)
+    q += " ORDER BY f.rank LIMIT ? OFFSET ?"
+    rows = [dict(zip(LIST_KEYS + ["name"], r)) for r in _all(q, params + [limit + 1, offset])]
+    return rows[:limit], (offset + limit if len(rows) > limit else None)
+
+def reindex_search():
+    """Rebuild subs_fts from submissions/users (after VACUUM or any drift)."""
+    with transaction() as con:
+        _fill_search(con)
+
+# ---------------------------
+# Funnel rollups (see src/analytics.py)
+# ---------------------------
+
+def refresh_funnel(cutoff: float) -> int:
+    """Fold events with hwm < ts <= cutoff into funnel_seen/funnel_rollup and
+    move the high-water mark to `cutoff`; returns the new (user, stage) pairs.
+
+    A user counts once per stage, in the hour/day they first reached it, with
+    the track the event carried (else their current one) and their uni."""
+    with transaction() as con:
+        row = con.execute("SELECT hwm FROM rollup_state WHERE name='funnel'").fetchone()
+        hwm = row[0] if row else 0.0
+        if cutoff <= hwm:
+            return 0
+        con.execute("DROP TABLE IF EXISTS temp._funnel_new")
+        # bare track/uni next to MIN(ts) come from the earliest event (SQLite rule)
+        con.execute(f"""CREATE TEMP TABLE _funnel_new AS
+            SELECT user_id, stage, MIN(ts) AS ts, track, uni FROM (
+              SELECT e.user_id, {_FUNNEL_STAGE} AS stage, e.ts,
+                     COALESCE(json_extract(e.meta_json, '$.track'), u.track, '') AS track, COALESCE(u.uni, '') AS uni
+              FROM events e JOIN users u ON u.id = e.user_id
+              WHERE e.ts > ? AND e.ts <= ?)
+            WHERE stage IS NOT NULL GROUP BY user_id, stage""", (hwm, cutoff))
+        con.execute("""DELETE FROM _funnel_new WHERE EXISTS
+            (SELECT 1 FROM funnel_seen f WHERE f.user_id = _funnel_new.user_id AND f.stage = _funnel_new.stage)""")
+        con.execute("INSERT INTO funnel_seen (user_id, stage, ts) SELECT user_id, stage, ts FROM _funnel_new")
+        for grain, size in (("hour", 3600), ("day", 86400)):
+            con.execute("""INSERT INTO funnel_rollup (grain, bucket, stage, track, uni, users)
+                SELECT ?, CAST(ts / ? AS INTEGER) * ?, stage, track, uni, COUNT(*) FROM _funnel_new
+                WHERE true GROUP BY 2, 3, 4, 5
+                ON CONFLICT(grain, bucket, stage, track, uni) DO UPDATE SET users = users + excluded.users""",
+                        (grain, size, size))
+        n = con.execute("SELECT COUNT(*) FROM _funnel_new").fetchone()[0]
+        con.execute("DROP TABLE temp._funnel_new")
+        con.execute("""INSERT INTO rollup_state (name, hwm) VALUES ('funnel', ?)
+            ON CONFLICT(name) DO UPDATE SET hwm = excluded.hwm""", (cutoff,))
+    return n
+
+def get_funnel(grain: str = "day", since: float = 0.0):
+    """Rollup rows {bucket, stage, track, uni, users} at `grain` (hour|day)."""
+    rows = _all("""SELECT bucket, stage, track, uni, users FROM funnel_rollup
+                   WHERE grain=? AND bucket >= ? ORDER BY bucket""", (grain, since))
+    return [dict(zip(("bucket", "stage", "track", "uni", "users"), r)) for r in rows]
+
+def funnel_watermark() -> float:
+    row = _one("SELECT hwm FROM rollup_state WHERE name='funnel'")
+    return row[0] if row else 0.0
+
+# ---------------------------
+# Micro-quest cache (see src/agent.py)
+# ---------------------------
+
+def get_quest_pool(track, version, since=0.0):
+    rows = _all("""SELECT id,title,instructions FROM quest_pool
+                   WHERE track=? AND version=? AND created_at>=?
+                   ORDER BY created_at DESC""", (track, version, since))
+    return [dict(zip(["id","title","instructions"], r)) for r in rows]
+
+def save_pool_quest(track, version, quest) -> str:
+    qid = str(uuid.uuid4())
+    _exec("INSERT INTO quest_pool (id,track,version,title,instructions) VALUES (?,?,?,?,?)",
+          (qid, track, version, quest["title"], quest["instructions"]))
+    return qid
+
+def prune_quest_pool(before: float):
+    _exec("DELETE FROM quest_pool WHERE created_at<?", (before,))
+
+def get_user_quest(user_id, track, version) -> Optional[Dict]:
+    row = _one("SELECT title,instructions FROM user_quests WHERE user_id=? AND track=? AND version=?",
+               (user_id, track, version))
+    return {"title": row[0], "instructions": row[1]} if row else None
+
+def set_user_quest(user_id, track, version, quest) -> Dict:
+    # first writer wins per version, so concurrent reruns agree on the same
+    # quest; a quest pinned under an older prompt version is replaced
+    _exec("""INSERT INTO user_quests (user_id,track,version,title,instructions) VALUES (?,?,?,?,?)
+             ON CONFLICT(user_id,track) DO UPDATE SET version=excluded.version, title=excluded.title,
+               instructions=excluded.instructions, created_at=strftime('%s','now')
+             WHERE user_quests.version IS NOT excluded.version""",
+          (user_id, track, version, quest["title"], quest["instructions"]))
+    return get_user_quest(user_id, track, version)
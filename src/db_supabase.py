@@ -1,51 +1,157 @@
 # src/db_supabase.py
-import os, time, csv
-from typing import Optional, Dict
-from supabase import create_client, Client
+import os, uuid
+from datetime import datetime, timezone
+from typing import Optional, Dict, TYPE_CHECKING
+from .cache import TTLCache
+from .images import normalize_image
+from .uploads import spool
+from .utils import fold_stats, is_url
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_KEY") or os.getenv("SUPABASE_ANON_KEY")
 STORAGE_BUCKET = os.getenv("SUPABASE_BUCKET", "proofs")
 
-_sb: Optional[Client] = None
-def sb() -> Client:
+if TYPE_CHECKING:
+    from supabase import Client
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+def _epoch(v: str) -> float:
+    return datetime.fromisoformat(v.replace("Z", "+00:00")).timestamp()
+
+_sb: Optional["Client"] = None
+def sb() -> "Client":
     global _sb
     if _sb is None:
         if not SUPABASE_URL or not SUPABASE_KEY:
             raise RuntimeError("Supabase credentials missing")
+        from supabase import create_client    # the SDK stack is slow to import; only on first request
         _sb = create_client(SUPABASE_URL, SUPABASE_KEY)
     return _sb
 
+def set_client(client):
+    """Swap the client (e.g. src.fake_supabase.FakeSupabase for benchmarks)."""
+    global _sb
+    _sb = client
+
+def _quote(v) -> str:
+    # PostgREST logic-tree values must be quoted if they contain , . : ( )
+    return '"' + str(v).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def _handle_filter(telegram, x) -> str:
+    conds = []
+    if telegram: conds.append(f"telegram.eq.{_quote(telegram)}")
+    if x: conds.append(f"x.eq.{_quote(x)}")
+    return ",".join(conds)
+
+def _pick(rows, telegram):
+    # a telegram match wins over an x match, as the old sequential lookups did
+    return next((r for r in rows if telegram and r.get("telegram") == telegram), rows[0] if rows else None)
+
 # --- required by src/db.py ---
 def db_init() -> bool:
     # nothing to create here; tables are managed in Supabase
     return True
 
 def get_user_by_handle(tg_handle: Optional[str], x_handle: Optional[str]) -> Optional[Dict]:
-    if tg_handle:
-        r = sb().table("users").select("id").eq("telegram", tg_handle).execute()
-        if r.data: return {"id": r.data[0]["id"]}
-    if x_handle:
-        r = sb().table("users").select("id").eq("x", x_handle).execute()
-        if r.data: return {"id": r.data[0]["id"]}
-    return None
+    if not (tg_handle or x_handle):
+        return None
+    r = sb().table("users").select("id,telegram").or_(_handle_filter(tg_handle, x_handle)).execute()
+    row = _pick(r.data or [], tg_handle)
+    return {"id": row["id"]} if row else None
 
 # --- users ---
 def upsert_user(name, uni, telegram, x, wallet) -> str:
-    if telegram:
-        r = sb().table("users").select("id").eq("telegram", telegram).execute()
-        if r.data:
-            uid = r.data[0]["id"]
-            sb().table("users").update({"name":name,"uni":uni,"wallet":wallet}).eq("id", uid).execute()
-            return uid
-    if x:
-        r = sb().table("users").select("id").eq("x", x).execute()
-        if r.data:
-            uid = r.data[0]["id"]
-            sb().table("users").update({"name":name,"uni":uni,"wallet":wallet}).eq("id", uid).execute()
-            return uid
-    r = sb().table("users").insert({"name":name,"uni":uni,"telegram":telegram,"x":x,"wallet":wallet}).execute()
-    return r.data[0]["id"]
+    # 1 request to resolve telegram-or-x, 1 to write (was up to 5 in sequence)
+    fields = {"name": name, "uni": uni, "wallet": wallet}
+    found = None
+    if telegram or x:
+        r = sb().table("users").select("id,telegram").or_(_handle_filter(telegram, x)).execute()
+        found = _pick(r.data or [], telegram)
+    if found:
+        sb().table("users").update(fields).eq("id", found["id"]).execute()
+        return found["id"]
+    # New user. Upserting on the handle means a concurrent save of the same
+    # profile updates the row the other request created instead of duplicating it.
+    try:
+        r = sb().table("users").upsert(
+            {**fields, "telegram": telegram, "x": x},
+            on_conflict="telegram" if telegram else "x",
+        ).execute()
+        return r.data[0]["id"]
+    except Exception as e:
+        # the unique index on the other handle fired: a concurrent save created
+        # the user under it after our lookup; update that row instead
+        if getattr(e, "code", None) != "23505":
+            raise
+        found = get_user_by_handle(telegram, x)
+        if not found:
+            raise
+    sb().table("users").update(fields).eq("id", found["id"]).execute()
+    return found["id"]
+
+def import_users(rows):
+    """Bulk upsert of roster rows ({name, uni, telegram, x, wallet}, handles
+    already normalized): handles resolved with in_() reads per IN_CHUNK,
+    new users written with one insert per chunk and existing ones with one
+    upsert on id per chunk. Blank fields never overwrite stored ones; a
+    handle the user lacks is filled in if nobody else has it.
+    Returns one (outcome, user_id) per row: inserted | updated | conflict
+    (the handles point at two users, or the matched user already has a
+    different value for the other one; nothing written)."""
+    rows = list(rows)
+    by, known = {"telegram": {}, "x": {}}, {}
+    for col in ("telegram", "x"):
+        vals = sorted({r[col] for r in rows if r.get(col)})
+        for i in range(0, len(vals), IN_CHUNK):
+            r = sb().table("users").select("id,telegram,x").in_(col, vals[i:i + IN_CHUNK]).execute()
+            for u in r.data or []:
+                known[u["id"]] = u
+                for c in ("telegram", "x"):
+                    if u.get(c):
+                        by[c][u[c]] = u["id"]
+    out, inserts, updates = [], {}, {}
+    for r in rows:
+        a, b = by["telegram"].get(r.get("telegram")), by["x"].get(r.get("x"))
+        if a and b and a != b:
+            out.append(("conflict", None))
+            continue
+        uid = a or b
+        if uid and any(r.get(c) and known[uid].get(c) and known[uid][c] != r[c] for c in ("telegram", "x")):
+            out.append(("conflict", None))
+            continue
+        fields = {k: r[k] for k in ("name", "uni", "wallet") if r.get(k)}
+        for col in ("telegram", "x"):
+            if uid and r.get(col) and r[col] not in by[col] and not known[uid].get(col):
+                fields[col] = known[uid][col] = r[col]
+                by[col][r[col]] = uid
+        if uid in inserts:                  # repeated in this roster: fold into the insert
+            inserts[uid].update(fields)
+        elif uid:
+            updates.setdefault(uid, {}).update(fields)
+        if uid:
+            out.append(("updated", uid))
+            continue
+        uid = str(uuid.uuid4())
+        inserts[uid] = known[uid] = {"id": uid, "name": r.get("name"), "uni": r.get("uni"),
+                                     "telegram": r.get("telegram"), "x": r.get("x"), "wallet": r.get("wallet")}
+        for col in ("telegram", "x"):
+            if r.get(col):
+                by[col][r[col]] = uid
+        out.append(("inserted", uid))
+    new = list(inserts.values())
+    for i in range(0, len(new), IN_CHUNK):
+        sb().table("users").insert(new[i:i + IN_CHUNK]).execute()
+    # PostgREST bulk upserts take one column set per request, so group by it
+    groups = {}
+    for uid, fields in updates.items():
+        if fields:
+            groups.setdefault(tuple(sorted(fields)), []).append(dict(fields, id=uid))
+    for group in groups.values():
+        for i in range(0, len(group), IN_CHUNK):
+            sb().table("users").upsert(group[i:i + IN_CHUNK], on_conflict="id").execute()
+    return out
 
 def get_user(uid: str) -> Dict:
     r = sb().table("users").select("*").eq("id", uid).single().execute()
@@ -62,28 +168,95 @@ def set_track(user_id, track):
 def save_event(user_id, type, meta):
     sb().table("events").insert({"user_id": user_id, "type": type, "meta_json": meta}).execute()
 
+def save_events(batch):
+    """Bulk insert [(user_id, type, meta, ts), ...] in one request."""
+    sb().table("events").insert([
+        {"user_id": u, "type": t, "meta_json": m, "ts": _iso(ts)} for u, t, m, ts in batch
+    ]).execute()
+
+def save_llm_metrics(rows):
+    """Append one flush of src/metrics.py counters in one request."""
+    sb().table("llm_metrics").insert([dict(r, ts=_iso(r["ts"])) for r in rows]).execute()
+
+def get_llm_metrics(since: float):
+    out, start = [], 0
+    while True:
+        r = (sb().table("llm_metrics").select("*").gte("ts", _iso(since))
+             .order("ts").range(start, start + PAGE_SIZE - 1).execute())
+        out.extend(r.data or [])
+        if len(r.data or []) < PAGE_SIZE:
+            return out
+        start += PAGE_SIZE
+
 # --- storage helper (optional preview) ---
-def get_signed_url(path: str, seconds: int = 3600) -> str:
-    return sb().storage.from_(STORAGE_BUCKET).create_signed_url(path, seconds)["signedURL"]
+# Signed URLs are cached per (path, lifetime) and dropped well before the
+# URL itself expires, so a cached link always has time left when rendered.
+SIGNED_URL_TTL = int(os.getenv("SIGNED_URL_TTL", "3600"))
+_signed_urls = TTLCache(maxsize=4096, ttl=SIGNED_URL_TTL)
 
-def _upload_bytes(folder: str, b: bytes, content_type: str = "image/png") -> str:
-    # stable timestamp filename
-    key = f"{folder}/{int(time.time()*1000)}.png"
+def _cache_ttl(seconds: int) -> float:
+    return max(0, seconds - max(60, seconds // 4))
+
+def get_signed_urls(paths, seconds: int = SIGNED_URL_TTL) -> Dict[str, str]:
+    """{path: signed_url} for many files; uncached paths are signed in one request."""
+    out, missing = {}, []
+    for p in dict.fromkeys(p for p in paths if p):
+        url = _signed_urls.get((p, seconds))
+        if url:
+            out[p] = url
+        else:
+            missing.append(p)
+    if missing:
+        for item in sb().storage.from_(STORAGE_BUCKET).create_signed_urls(missing, seconds):
+            url = item.get("signedURL") or item.get("signedUrl")
+            if url and not item.get("error"):
+                out[item["path"]] = url
+                _signed_urls.set((item["path"], seconds), url, ttl=_cache_ttl(seconds))
+    return out
+
+def get_signed_url(path: str, seconds: int = SIGNED_URL_TTL) -> str:
+    url = _signed_urls.get((path, seconds))
+    if not url:
+        url = sb().storage.from_(STORAGE_BUCKET).create_signed_url(path, seconds)["signedURL"]
+        _signed_urls.set((path, seconds), url, ttl=_cache_ttl(seconds))
+    return url
+
+def _upload_bytes(key: str, b: bytes, content_type: str = "image/png") -> str:
     # IMPORTANT: all header values must be strings
     sb().storage.from_(STORAGE_BUCKET).upload(
         key,
         b,
         {
             "content-type": content_type,
-            "x-upsert": "true",          # string, not bool
-            "cache-control": "3600"      # optional but string
+            "x-upsert": "true",          # string, not bool; keys are content hashes, so a rewrite is the same bytes
+            "cache-control": "31536000"  # immutable for the same reason; string
         },
     )
     return key
 
+def _store_proof(file):
+    # content-addressed: blobs/<h[:2]>/<h>.<ext> keyed by the sha256 of the raw
+    # upload, so a proof already in the bucket is never normalized or sent again.
+    # `file` is read once, in chunks, into a size-capped spool (src/uploads.py);
+    # only the normalized (MAX_SIDE-capped) images are sent to Storage
+    raw, h, _ = spool(file)
+    with raw:
+        r = sb().table("blobs").select("path,thumb_path").eq("hash", h).execute()
+        if r.data:
+            return r.data[0]["path"], r.data[0]["thumb_path"]
+        img = normalize_image(raw)
+    stem = f"blobs/{h[:2]}/{h}"
+    path = _upload_bytes(f"{stem}.{img['ext']}", img["original"], img["content_type"])
+    thumb = _upload_bytes(f"{stem}_thumb.{img['thumb_ext']}", img["thumb"], img["thumb_type"])
+    sb().table("blobs").upsert(
+        {"hash": h, "path": path, "thumb_path": thumb, "bytes": len(img["original"]) + len(img["thumb"])},
+        on_conflict="hash", ignore_duplicates=True,
+    ).execute()
+    return path, thumb
+
 # --- submissions ---
 def save_submission(user_id, quest_idx, title, track, text, file) -> str:
-    file_path = _upload_bytes(f"user_{user_id}", file) if file else None
+    file_path, thumb_path = _store_proof(file) if file else (None, None)
     r = sb().table("submissions").insert({
         "user_id": user_id,
         "quest_idx": quest_idx,
@@ -91,7 +264,9 @@ def save_submission(user_id, quest_idx, title, track, text, file) -> str:
         "track": track,
         "text": text,
         "file_path": file_path,
+        "thumb_path": thumb_path,
         "status": "pending",
+        "is_url": is_url(text),
     }).execute()
     return r.data[0]["id"]
 
@@ -105,77 +280,267 @@ def admin_list_subs(status_filter=None):
         q = q.eq("status", status_filter)
     return q.execute().data or []
 
+LIST_COLUMNS = "id,user_id,quest_idx,title,track,status,file_path,thumb_path,created_at,review_verdict,review_confidence"
+
+def admin_list_subs_page(status_filter=None, limit: int = 25, cursor=None):
+    """One page of the admin queue, newest first, without proof text.
+
+    `cursor` is the (created_at, id) of the last row on the previous page.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    q = (sb().table("submissions").select(LIST_COLUMNS)
+         .order("created_at", desc=True).order("id", desc=True).limit(limit + 1))
+    if status_filter:
+        q = q.eq("status", status_filter)
+    if cursor:
+        ts, lid = cursor
+        q = q.or_(f"created_at.lt.{_quote(ts)},and(created_at.eq.{_quote(ts)},id.lt.{lid})")
+    rows = q.execute().data or []
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, [rows[-1]["created_at"], rows[-1]["id"]]
+
+# Sequence values are taken before commit, so a write can commit after a
+# poll has already moved past its seq. Each poll therefore re-reads the
+# FEED_OVERLAP seqs behind the high-water mark and drops the ones already
+# returned: the cursor is [hwm, seqs seen in that window]. A write that
+# commits more than FEED_OVERLAP changes late is still missed, so on this
+# backend the feed is best-effort (the admin queue also reloads on navigation).
+FEED_OVERLAP = int(os.getenv("FEED_OVERLAP", "200"))
+
+def _feed_cursor(hwm, seen):
+    return [hwm, sorted(s for s in seen if s > hwm - FEED_OVERLAP)]
+
+def change_cursor():
+    """Current head of the submissions change feed (with the window's seqs)."""
+    r = sb().table("submissions").select("seq").order("seq", desc=True).limit(FEED_OVERLAP).execute()
+    seqs = [row["seq"] for row in r.data or [] if row.get("seq")]
+    return _feed_cursor(seqs[0] if seqs else 0, seqs)
+
+def changes_since(cursor, limit: int = 500):
+    """Submissions inserted or changed after `cursor` (by seq, see
+    data/supabase.sql), including late commits inside the overlap window.
+    Returns (rows, next_cursor); a plain int cursor works as a start."""
+    hwm, seen = cursor if isinstance(cursor, (list, tuple)) else (cursor or 0, [])
+    seen = set(seen)
+    r = (sb().table("submissions").select(LIST_COLUMNS + ",seq")
+         .gt("seq", hwm - FEED_OVERLAP).order("seq").limit(limit + len(seen)).execute())
+    rows = [row for row in r.data or [] if row["seq"] not in seen][:limit]
+    seen.update(row["seq"] for row in rows)
+    return rows, _feed_cursor(max([hwm] + [row["seq"] for row in rows]), seen)
+
+def get_submission(sub_id) -> Dict:
+    r = sb().table("submissions").select("*").eq("id", sub_id).execute()
+    return r.data[0] if r.data else {}
+
 def admin_set_status(sub_id, status):
     sb().table("submissions").update({"status": status}).eq("id", sub_id).execute()
 
+IN_CHUNK = 200   # ids per in_() filter, keeps the request URL well under limits
+
+def admin_set_status_many(ids, status) -> int:
+    """Set one status on many submissions with one in_() update per chunk."""
+    ids, n = list(ids), 0
+    for i in range(0, len(ids), IN_CHUNK):
+        r = sb().table("submissions").update({"status": status}).in_("id", ids[i:i + IN_CHUNK]).execute()
+        n += len(r.data or [])
+    return n
+
+def admin_set_status_matching(status_filter, status) -> int:
+    """Set `status` on every submission currently in `status_filter`."""
+    r = sb().table("submissions").update({"status": status}).eq("status", status_filter).execute()
+    return len(r.data or [])
+
+# --- auto-review (see src/review.py; review_cache in data/supabase.sql) ---
+def list_review_batch(limit: int = 200, cursor=None):
+    """Pending submissions with proof text and the owner's handles, one
+    keyset page (newest first) at a time. Returns (rows, next_cursor)."""
+    q = (sb().table("submissions")
+         .select("id,user_id,quest_idx,title,track,text,file_path,created_at,review_verdict,review_confidence,"
+                 "users(telegram,x)")
+         .eq("status", "pending").order("created_at", desc=True).order("id", desc=True).limit(limit + 1))
+    if cursor:
+        ts, lid = cursor
+        q = q.or_(f"created_at.lt.{_quote(ts)},and(created_at.eq.{_quote(ts)},id.lt.{lid})")
+    rows = [dict(r, **(r.pop("users", None) or {"telegram": None, "x": None})) for r in q.execute().data or []]
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, [rows[-1]["created_at"], rows[-1]["id"]]
+
+def get_review_cache(hashes) -> Dict[str, Dict]:
+    hashes, out = sorted(set(hashes)), {}
+    for i in range(0, len(hashes), IN_CHUNK):
+        r = (sb().table("review_cache").select("hash,verdict,confidence,reason,source")
+             .in_("hash", hashes[i:i + IN_CHUNK]).execute())
+        out.update({row["hash"]: row for row in r.data or []})
+    return out
+
+def save_review_cache(rows):
+    rows = [{k: r.get(k) for k in ("hash", "verdict", "confidence", "reason", "source")} for r in rows]
+    for i in range(0, len(rows), IN_CHUNK):
+        sb().table("review_cache").upsert(rows[i:i + IN_CHUNK], on_conflict="hash").execute()
+
+def confident_review_ids(threshold: float):
+    """Ids of pending submissions pre-reviewed as approve with confidence >=
+    threshold, in id-ordered pages (partial index in supabase.sql)."""
+    ids, start = [], 0
+    while True:
+        r = (sb().table("submissions").select("id").eq("status", "pending").eq("review_verdict", "approve")
+             .gte("review_confidence", threshold).order("id").range(start, start + PAGE_SIZE - 1).execute())
+        ids += [row["id"] for row in r.data or []]
+        if len(r.data or []) < PAGE_SIZE:
+            return ids
+        start += PAGE_SIZE
+
+def set_reviews(reviews):
+    """[(sub_id, verdict, confidence), ...]: one in_() update per distinct
+    (verdict, confidence) and chunk."""
+    groups = {}
+    for sid, v, c in reviews:
+        groups.setdefault((v, c), []).append(sid)
+    for (v, c), ids in groups.items():
+        for i in range(0, len(ids), IN_CHUNK):
+            (sb().table("submissions").update({"review_verdict": v, "review_confidence": c})
+             .in_("id", ids[i:i + IN_CHUNK]).execute())
+
 # --- CSV exports ---
-def export_csv() -> str:
+# Generators yield lists of rows one keyset page at a time (ordered by
+# created_at, id); src/db turns them into CSV files / download streams.
+PAGE_SIZE = 1000   # PostgREST's default max-rows
+
+def _keyset_pages(table: str, columns: str, page_size: int = PAGE_SIZE):
+    last = None
+    while True:
+        q = sb().table(table).select(columns).order("created_at").order("id").limit(page_size)
+        if last:
+            ts, lid = last
+            q = q.or_(f"created_at.gt.{_quote(ts)},and(created_at.eq.{_quote(ts)},id.gt.{lid})")
+        rows = q.execute().data or []
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        last = (rows[-1]["created_at"], rows[-1]["id"])
+
+def iter_export_rows(chunk_size: int = PAGE_SIZE):
     # submission-level export
-    subs = sb().table("submissions").select(
-        "quest_idx,title,status,created_at,users!inner(name,uni,telegram,x)"
-    ).execute().data
-    flat = []
-    for s in subs:
-        u = s["users"]
-        flat.append([u["name"], u["uni"], u["telegram"], u["x"], s["quest_idx"], s["title"], s["status"], s["created_at"]])
-    path = "onboarding_proof.csv"
-    with open(path, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(["name","uni","telegram","x","quest_idx","title","status","created_at"])
-        w.writerows(flat)
-    return path
-
-def export_users_csv() -> str:
-    import csv
-    # 1) fetch users & all submissions
-    users = sb().table("users").select("*").order("created_at").execute().data
-    subs  = sb().table("submissions").select("user_id,quest_idx,status,created_at").execute().data
-
-    # 2) priority helper
-    def better(cur, new):
-        order = {"approved": 3, "rejected": 2, "pending": 1, None: 0}
-        return new if order.get(new, 0) >= order.get(cur, 0) else cur
-
-    # 3) fold subs by user and quest_idx
-    from collections import defaultdict
-    agg = defaultdict(lambda: {"joined_telegram": None, "followed_x": None, "microquest": None})
-    for s in subs:
-        uid = s["user_id"]
-        stt = (s.get("status") or "pending").strip().lower()
-        q   = int(s.get("quest_idx") or 0)
-        if q == 1:
-            agg[uid]["joined_telegram"] = better(agg[uid]["joined_telegram"], stt)
-        elif q == 2:
-            agg[uid]["followed_x"] = better(agg[uid]["followed_x"], stt)
-        elif q == 3:
-            agg[uid]["microquest"] = better(agg[uid]["microquest"], stt)
-
-    # 4) build rows
-    rows = []
-    for u in users:
-        m = agg[u["id"]]
-        rows.append([
-            u.get("name"), u.get("uni"), u.get("telegram"), u.get("x"), u.get("track"),
-            m["joined_telegram"] or "pending",
-            m["followed_x"] or "pending",
-            m["microquest"] or "pending",
-        ])
-
-    # 5) write CSV
-    path = "onboarding_users.csv"
-    with open(path, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(["name","uni","telegram","x","track","joined_telegram","followed_x","microquest"])
-        w.writerows(rows)
-    return path
+    cols = "id,quest_idx,title,status,created_at,users!inner(name,uni,telegram,x)"
+    for page in _keyset_pages("submissions", cols, chunk_size):
+        yield [[s["users"]["name"], s["users"]["uni"], s["users"]["telegram"], s["users"]["x"],
+                s["quest_idx"], s["title"], s["status"], s["created_at"]] for s in page]
+
+def _better(cur, new):
+    order = {"approved": 3, "rejected": 2, "pending": 1, None: 0}
+    return new if order.get(new, 0) >= order.get(cur, 0) else cur
+
+def _subs_for_users(ids):
+    # one page of users -> their submissions, in range-request pages
+    start = 0
+    while True:
+        r = (sb().table("submissions").select("user_id,quest_idx,status")
+             .in_("user_id", ids).order("id").range(start, start + PAGE_SIZE - 1).execute())
+        rows = r.data or []
+        yield from rows
+        if len(rows) < PAGE_SIZE:
+            return
+        start += PAGE_SIZE
+
+def iter_users_rows(chunk_size: int = IN_CHUNK):
+    # chunk_size bounds the user ids sent in each in_() filter (URL length)
+    cols = "id,name,uni,telegram,x,track,created_at"
+    for users in _keyset_pages("users", cols, chunk_size):
+        agg = {u["id"]: {1: None, 2: None, 3: None} for u in users}
+        for s in _subs_for_users([u["id"] for u in users]):
+            q = int(s.get("quest_idx") or 0)
+            if q in (1, 2, 3):
+                stt = (s.get("status") or "pending").strip().lower()
+                agg[s["user_id"]][q] = _better(agg[s["user_id"]][q], stt)
+        yield [[u.get("name"), u.get("uni"), u.get("telegram"), u.get("x"), u.get("track"),
+                agg[u["id"]][1] or "pending", agg[u["id"]][2] or "pending", agg[u["id"]][3] or "pending"]
+               for u in users]
+
+def export_watermark():
+    """Changes whenever exported data does (see export_watermark() in data/supabase.sql)."""
+    return sb().rpc("export_watermark").execute().data
 
 # --- stats ---
 def recap_stats():
-    users = sb().table("users").select("id", count="exact").execute().count or 0
-    subs  = sb().table("submissions").select("id", count="exact").execute().count or 0
-    appr  = sb().table("submissions").select("id", count="exact").eq("status","approved").execute().count or 0
-    return {"students": users, "subs": subs, "approved": appr}
+    # stats_rollup is maintained by triggers (data/supabase.sql): one request
+    r = sb().table("stats_rollup").select("metric,dim,n").execute()
+    return fold_stats(r.data or [])
+
+def reconcile_stats():
+    """Rebuild stats_rollup from users/submissions (repairs any drift)."""
+    sb().rpc("reconcile_stats").execute()
 
 def list_social_posts():
-    r = sb().table("submissions").select("text").ilike("text", "http%").execute()
+    r = sb().table("submissions").select("text").eq("is_url", True).execute()
     return [x["text"] for x in (r.data or [])]
+
+# --- search (search_subs() in data/supabase.sql) ---
+def search_subs(query: str, status_filter=None, limit: int = 25, cursor=None):
+    """Ranked full-text search over title, proof text, student name and
+    handles. Returns (rows, next_cursor); the cursor is an offset."""
+    if not any(c.isalnum() for c in query or ""):
+        return [], None
+    offset = cursor or 0
+    rows = sb().rpc("search_subs", {"p_query": query, "p_status": status_filter,
+                                    "p_limit": limit + 1, "p_offset": offset}).execute().data or []
+    return rows[:limit], (offset + limit if len(rows) > limit else None)
+
+# --- funnel rollups (refresh_funnel() in data/supabase.sql; see src/analytics.py) ---
+def refresh_funnel(cutoff: float) -> int:
+    return sb().rpc("refresh_funnel", {"p_cutoff": _iso(cutoff)}).execute().data or 0
+
+def get_funnel(grain: str = "day", since: float = 0.0):
+    out, start = [], 0
+    while True:
+        r = (sb().table("funnel_rollup").select("bucket,stage,track,uni,users")
+             .eq("grain", grain).gte("bucket", _iso(since))
+             .order("bucket").range(start, start + PAGE_SIZE - 1).execute())
+        out.extend(r.data or [])
+        if len(r.data or []) < PAGE_SIZE:
+            break
+        start += PAGE_SIZE
+    return [dict(r, bucket=_epoch(r["bucket"])) for r in out]
+
+def funnel_watermark() -> float:
+    r = sb().table("rollup_state").select("hwm").eq("name", "funnel").execute()
+    return _epoch(r.data[0]["hwm"]) if r.data else 0.0
+
+# --- micro-quest cache (see src/agent.py; tables in data/supabase.sql) ---
+def get_quest_pool(track, version, since=0.0):
+    r = (sb().table("quest_pool").select("id,title,instructions")
+         .eq("track", track).eq("version", version).gte("created_at", _iso(since))
+         .order("created_at", desc=True).execute())
+    return r.data or []
+
+def save_pool_quest(track, version, quest) -> str:
+    r = sb().table("quest_pool").insert({
+        "track": track, "version": version,
+        "title": quest["title"], "instructions": quest["instructions"],
+    }).execute()
+    return r.data[0]["id"]
+
+def prune_quest_pool(before: float):
+    sb().table("quest_pool").delete().lt("created_at", _iso(before)).execute()
+
+def get_user_quest(user_id, track, version) -> Optional[Dict]:
+    r = (sb().table("user_quests").select("title,instructions")
+         .eq("user_id", user_id).eq("track", track).eq("version", version).execute())
+    return r.data[0] if r.data else None
+
+def set_user_quest(user_id, track, version, quest) -> Dict:
+    # first writer wins per version, so concurrent reruns agree on the same
+    # quest; a quest pinned under an older prompt version is replaced
+    row = {"version": version, "title": quest["title"], "instructions": quest["instructions"]}
+    sb().table("user_quests").upsert({"user_id": user_id, "track": track, **row},
+                                     on_conflict="user_id,track", ignore_duplicates=True).execute()
+    pinned = get_user_quest(user_id, track, version)
+    if pinned:
+        return pinned
+    (sb().table("user_quests").update(row)
+     .eq("user_id", user_id).eq("track", track).neq("version", version).execute())
+    return get_user_quest(user_id, track, version)
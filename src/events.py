@@ -0,0 +1,86 @@
+# src/events.py
+import atexit, queue, threading, time
+
+class EventBuffer:
+    """Bounded in-process queue in front of a backend's save_events(batch).
+
+    put() never does I/O: a daemon thread drains the queue and writes a batch
+    once `batch_size` events are waiting or `flush_interval` seconds have
+    passed. When the queue is full, put() waits up to `put_timeout` seconds
+    (backpressure) and then drops the event and counts it. Pending events
+    are flushed at interpreter exit.
+    """
+
+    def __init__(self, sink, max_queue: int = 10000, batch_size: int = 200,
+                 flush_interval: float = 2.0, put_timeout: float = 0.05):
+        self._sink = sink                  # callable(list of (user_id, type, meta, ts))
+        self._q = queue.Queue(max_queue)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.counts = {"queued": 0, "written": 0, "dropped": 0, "failed": 0, "batches": 0}
+
+    def _bump(self, key, n=1):
+        with self._lock:
+            self.counts[key] += n
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name="event-flusher")
+                self._thread.start()
+                atexit.register(self.close)
+
+    def put(self, user_id, type, meta=None):
+        self._ensure_started()
+        try:
+            self._q.put((user_id, type, meta or {}, time.time()), timeout=self.put_timeout)
+            self._bump("queued")
+        except queue.Full:
+            self._bump("dropped")
+
+    def _take(self, timeout: float):
+        batch = []
+        deadline = time.monotonic() + timeout
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._q.get(timeout=remaining) if remaining > 0 else self._q.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        try:
+            self._sink(batch)
+            self._bump("written", len(batch)); self._bump("batches")
+        except Exception as e:
+            print("event_flush_error:", e)
+            self._bump("failed", len(batch))
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._take(self.flush_interval)
+            if batch:
+                self._write(batch)
+
+    def flush(self):
+        """Synchronously write everything queued so far."""
+        while True:
+            batch = self._take(0)
+            if not batch:
+                return
+            self._write(batch)
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts, pending=self._q.qsize())
@@ -0,0 +1,566 @@
+# src/fake_supabase.py
+"""In-process stand-in for the `supabase` client used by src/db_supabase.py.
+
+Implements the part of the PostgREST query builder the app uses --
+table().select() / insert() / update() / upsert() / delete() with eq, neq,
+gt(e), lt(e), like, ilike, is_, in_ and or_ filters, order, limit, range,
+single and count="exact" -- over plain Python lists, plus the storage
+bucket calls (upload, download, remove, create_signed_url(s)) over a dict of
+objects. Every execute() or storage call is one counted request and can
+sleep for `latency` seconds, so round trips and wall time of db_supabase
+functions can be measured without a live project.
+
+    from src import db_supabase
+    from src.fake_supabase import FakeSupabase
+    fake = FakeSupabase(latency=0.02)
+    db_supabase.set_client(fake)
+    ...
+    fake.requests   # Counter({"users.select": 1, "storage.upload": 2, ...})
+    fake.bytes_uploaded
+"""
+import re, time, uuid, threading
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+class FakeAPIError(Exception):
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.message, self.code = message, code
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data, self.count = data, count
+
+# unique constraints per table (the primary key first)
+UNIQUE = {
+    "users": [("id",), ("telegram",), ("x",)],
+    "submissions": [("id",)],
+    "events": [("id",)],
+    "quest_pool": [("id",)],
+    "user_quests": [("user_id", "track")],
+    "stats_rollup": [("metric", "dim")],
+    "blobs": [("hash",), ("path",)],
+    "funnel_seen": [("user_id", "stage")],
+    "funnel_rollup": [("grain", "bucket", "stage", "track", "uni")],
+    "rollup_state": [("name",)],
+    "review_cache": [("hash",)],
+}
+# embedded resource -> (column on the parent row, key column on the child)
+EMBEDS = {"users": ("user_id", "id")}
+# tables whose rows get updated_at bumped on every update (trigger in Postgres)
+TOUCHED = ("users", "submissions")
+# submissions columns whose update takes a new change-feed seq (trg_subs_seq)
+SEQ_COLS = {"status", "title", "text", "track", "quest_idx", "user_id", "file_path", "thumb_path",
+            "review_verdict", "review_confidence"}
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds")
+
+_TS = re.compile(r"^\d{4}-\d\d-\d\d[T ]\d")
+
+def _ts(v: str) -> float:
+    return datetime.fromisoformat(v.replace("Z", "+00:00")).timestamp()
+
+def _norm(a, b):
+    """Make a row value and a filter value comparable (filters from or_()
+    strings arrive as text; timestamps compare as instants)."""
+    if isinstance(a, bool) or isinstance(b, bool):
+        return str(a).lower(), str(b).lower()
+    if isinstance(a, (int, float)) and isinstance(b, str):
+        try:
+            return a, float(b)
+        except ValueError:
+            return str(a), b
+    if isinstance(a, str) and isinstance(b, str) and _TS.match(a) and _TS.match(b):
+        return _ts(a), _ts(b)
+    if isinstance(a, str) and isinstance(b, (int, float)):
+        return a, str(b)
+    return a, b
+
+def _like(pattern: str, ci: bool):
+    rx = "".join(".*" if c in "%*" else "." if c == "_" else re.escape(c) for c in pattern)
+    return re.compile(f"^{rx}$", re.I | re.S if ci else re.S)
+
+def _pred(col: str, op: str, val):
+    if op in ("like", "ilike"):
+        rx = _like(str(val), op == "ilike")
+        return lambda r: isinstance(r.get(col), str) and bool(rx.match(r[col]))
+    if op == "is":
+        want = None if val in (None, "null") else str(val).lower() == "true"
+        return lambda r: r.get(col) is want if want is None else r.get(col) == want
+    if op == "in":
+        vals = list(val)
+        # plain (non-timestamp) text compares as text: one set lookup per row
+        text = None if any(isinstance(v, bool) for v in vals) else {str(v) for v in vals if v is not None}
+        def member(r):
+            a = r.get(col)
+            if a is None:
+                return False
+            if text is not None and isinstance(a, str) and not _TS.match(a):
+                return a in text
+            return any(x == y for x, y in (_norm(a, v) for v in vals))
+        return member
+    def test(r):
+        a = r.get(col)
+        if a is None or val is None:
+            return False
+        a, b = _norm(a, val)
+        try:
+            return {"eq": a == b, "neq": a != b, "gt": a > b, "gte": a >= b, "lt": a < b, "lte": a <= b}[op]
+        except TypeError:
+            return False
+    return test
+
+def _split_top(s: str):
+    """Split a PostgREST logic string on commas outside parentheses/quotes."""
+    out, depth, quoted, cur, esc = [], 0, False, "", False
+    for c in s:
+        if esc:
+            cur += c; esc = False; continue
+        if c == "\\" and quoted:
+            cur += c; esc = True; continue
+        if c == '"':
+            quoted = not quoted
+        elif not quoted and c == "(":
+            depth += 1
+        elif not quoted and c == ")":
+            depth -= 1
+        elif not quoted and c == "," and depth == 0:
+            out.append(cur); cur = ""; continue
+        cur += c
+    if cur:
+        out.append(cur)
+    return out
+
+def _unquote(v: str) -> str:
+    if len(v) >= 2 and v[0] == v[-1] == '"':
+        return re.sub(r'\\(.)', r'\1', v[1:-1])
+    return v
+
+def _parse_logic(expr: str):
+    expr = expr.strip()
+    for kw, agg in (("and(", all), ("or(", any)):
+        if expr.startswith(kw) and expr.endswith(")"):
+            preds = [_parse_logic(p) for p in _split_top(expr[len(kw):-1])]
+            return lambda r, preds=preds, agg=agg: agg(p(r) for p in preds)
+    col, op, val = expr.split(".", 2)
+    if op == "in":
+        return _pred(col, "in", [_unquote(v) for v in _split_top(val.strip("()"))])
+    return _pred(col, op, _unquote(val))
+
+def _parse_select(cols: str):
+    """'a,b,users!inner(name,uni)' -> (['a', 'b'], [('users', True, ['name', 'uni'])])"""
+    plain, embeds = [], []
+    for part in _split_top(cols.replace(" ", "")):
+        m = re.match(r"^(\w+)(!inner)?\((.*)\)$", part)
+        if m:
+            embeds.append((m.group(1), bool(m.group(2)), m.group(3).split(",")))
+        elif part:
+            plain.append(part)
+    return plain, embeds
+
+class _Query:
+    def __init__(self, db, table):
+        self._db, self._table = db, table
+        self._op, self._cols, self._payload = "select", "*", None
+        self._filters, self._order = [], []
+        self._limit, self._offset = None, 0
+        self._single = self._maybe_single = False
+        self._count = None
+        self._on_conflict, self._ignore = "", False
+
+    # --- verbs ---
+    def select(self, *columns, count=None, head=None):
+        self._cols = ",".join(columns) or "*"
+        self._count = count
+        return self
+
+    def insert(self, json, *, count=None, returning=None, upsert=False, default_to_null=True):
+        self._op, self._payload = ("upsert" if upsert else "insert"), json
+        return self
+
+    def update(self, json, *, count=None, returning=None):
+        self._op, self._payload = "update", json
+        return self
+
+    def upsert(self, json, *, count=None, returning=None, ignore_duplicates=False,
+               on_conflict="", default_to_null=True):
+        self._op, self._payload = "upsert", json
+        self._on_conflict, self._ignore = on_conflict, ignore_duplicates
+        return self
+
+    def delete(self, *, count=None, returning=None):
+        self._op = "delete"
+        return self
+
+    # --- filters ---
+    def _add(self, col, op, val):
+        self._filters.append(_pred(col, op, val))
+        return self
+
+    def eq(self, c, v): return self._add(c, "eq", v)
+    def neq(self, c, v): return self._add(c, "neq", v)
+    def gt(self, c, v): return self._add(c, "gt", v)
+    def gte(self, c, v): return self._add(c, "gte", v)
+    def lt(self, c, v): return self._add(c, "lt", v)
+    def lte(self, c, v): return self._add(c, "lte", v)
+    def like(self, c, v): return self._add(c, "like", v)
+    def ilike(self, c, v): return self._add(c, "ilike", v)
+    def is_(self, c, v): return self._add(c, "is", v)
+    def in_(self, c, vals): return self._add(c, "in", list(vals))
+
+    def match(self, query: dict):
+        for c, v in query.items():
+            self.eq(c, v)
+        return self
+
+    def or_(self, filters: str, reference_table=None):
+        self._filters.append(_parse_logic(f"or({filters})"))
+        return self
+
+    # --- modifiers ---
+    def order(self, column, *, desc=False, nullsfirst=None, foreign_table=None):
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, size, *, foreign_table=None):
+        self._limit = size
+        return self
+
+    def offset(self, size):
+        self._offset = size
+        return self
+
+    def range(self, start, end, foreign_table=None):
+        self._offset, self._limit = start, end - start + 1
+        return self
+
+    def single(self):
+        self._single = True
+        return self
+
+    def maybe_single(self):
+        self._maybe_single = True
+        return self
+
+    def execute(self):
+        return self._db._execute(self)
+
+class _Rpc:
+    def __init__(self, db, fn, params):
+        self._db, self._fn, self._params = db, fn, params or {}
+
+    def execute(self):
+        self._db._hit(f"rpc.{self._fn}")
+        with self._db._lock:
+            return FakeResponse(self._db.rpcs[self._fn](self._db, **self._params))
+
+class _Bucket:
+    def __init__(self, db, name):
+        self._db, self._name = db, name
+
+    def _objects(self):
+        return self._db.buckets[self._name]
+
+    def upload(self, path, file, file_options=None):
+        opts = file_options or {}
+        self._db._hit("storage.upload")
+        with self._db._lock:
+            if path in self._objects() and str(opts.get("x-upsert", "false")).lower() != "true":
+                raise FakeAPIError("The resource already exists", "409")
+            self._objects()[path] = {"data": bytes(file), "content_type": opts.get("content-type")}
+            self._db.bytes_uploaded += len(file)
+        return {"Key": f"{self._name}/{path}"}
+
+    def download(self, path):
+        self._db._hit("storage.download")
+        obj = self._objects().get(path)
+        if obj is None:
+            raise FakeAPIError("Object not found", "404")
+        return obj["data"]
+
+    def remove(self, paths):
+        self._db._hit("storage.remove")
+        with self._db._lock:
+            return [{"name": p} for p in paths if self._objects().pop(p, None) is not None]
+
+    def _sign(self, path, expires_in):
+        return f"https://fake.supabase.local/storage/v1/object/sign/{self._name}/{path}?exp={int(time.time()) + int(expires_in)}"
+
+    def create_signed_url(self, path, expires_in, options=None):
+        self._db._hit("storage.sign")
+        if path not in self._objects():
+            raise FakeAPIError("Object not found", "404")
+        url = self._sign(path, expires_in)
+        return {"signedURL": url, "signedUrl": url}
+
+    def create_signed_urls(self, paths, expires_in, options=None):
+        self._db._hit("storage.sign_many")
+        out = []
+        for p in paths:
+            found = p in self._objects()
+            url = self._sign(p, expires_in) if found else None
+            out.append({"path": p, "signedURL": url, "signedUrl": url, "error": None if found else "Object not found"})
+        return out
+
+class _Storage:
+    def __init__(self, db):
+        self._db = db
+
+    def from_(self, bucket):
+        return _Bucket(self._db, bucket)
+
+class FakeSupabase:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.tables = defaultdict(list)
+        self.buckets = defaultdict(dict)    # bucket -> {path: {"data", "content_type"}}
+        self.bytes_uploaded = 0
+        self.storage = _Storage(self)
+        self.requests = Counter()
+        self.seq = 0                         # submissions_change_seq
+        self.rpcs = {"reconcile_stats": _reconcile_stats, "export_watermark": _export_watermark,
+                     "search_subs": _search_subs, "refresh_funnel": _refresh_funnel}
+        self._lock = threading.RLock()
+
+    # --- client surface ---
+    def table(self, name):
+        return _Query(self, name)
+
+    from_ = table
+
+    def rpc(self, fn, params=None, **kwargs):
+        return _Rpc(self, fn, params)
+
+    # --- accounting ---
+    @property
+    def total_requests(self) -> int:
+        return sum(self.requests.values())
+
+    def reset_counts(self):
+        self.requests.clear()
+        self.bytes_uploaded = 0
+
+    def _hit(self, key):
+        with self._lock:
+            self.requests[key] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    # --- engine ---
+    def _defaults(self, table):
+        row = {}
+        if UNIQUE.get(table, [("id",)])[0] == ("id",):
+            row["id"] = str(uuid.uuid4())
+        row["created_at"] = _now()
+        if table in TOUCHED:
+            row["updated_at"] = row["created_at"]
+        if table == "events":
+            row["ts"] = row["created_at"]
+        return row
+
+    def _check_unique(self, table, row, changed=None):
+        for cols in UNIQUE.get(table, []):
+            if changed is not None and not changed.intersection(cols):
+                continue
+            vals = [row.get(c) for c in cols]
+            if any(v is None for v in vals):
+                continue
+            for other in self.tables[table]:
+                if other is not row and [other.get(c) for c in cols] == vals:
+                    raise FakeAPIError(f'duplicate key value violates unique constraint "{table}_{"_".join(cols)}"', "23505")
+
+    def _insert(self, table, payload):
+        row = {**self._defaults(table), **payload}
+        self._check_unique(table, row)
+        if table == "submissions":
+            self.seq += 1; row["seq"] = self.seq            # stand-in for trg_subs_seq
+        self.tables[table].append(row)
+        return row
+
+    def _update(self, table, row, payload):
+        old = dict(row)
+        row.update(payload)
+        if table in TOUCHED:
+            row["updated_at"] = _now()
+        try:
+            self._check_unique(table, row, changed=set(payload))
+        except FakeAPIError:
+            row.clear(); row.update(old)
+            raise
+        if table == "submissions" and SEQ_COLS.intersection(payload):
+            self.seq += 1; row["seq"] = self.seq
+        if table == "submissions" and row.get("status") == "approved" and old.get("status") != "approved":
+            # stand-in for trg_events_approved
+            self._insert("events", {"user_id": row.get("user_id"), "type": "submission_approved",
+                                    "meta_json": {"quest_idx": row.get("quest_idx"), "track": row.get("track"),
+                                                  "sub_id": row.get("id")}})
+        return row
+
+    def _project(self, q, rows):
+        plain, embeds = _parse_select(q._cols)
+        out = []
+        for r in rows:
+            item = dict(r) if "*" in plain or not plain else {c: r.get(c) for c in plain}
+            keep = True
+            for name, inner, cols in embeds:
+                fk, key = EMBEDS.get(name, (f"{name.rstrip('s')}_id", "id"))
+                child = next((c for c in self.tables[name] if c.get(key) == r.get(fk)), None)
+                if child is None and inner:
+                    keep = False
+                item[name] = None if child is None else {c: child.get(c) for c in cols}
+            if keep:
+                out.append(item)
+        return out
+
+    def _execute(self, q):
+        self._hit(f"{q._table}.{q._op}")
+        with self._lock:
+            data, count = self._run(q)
+            if q._op != "select":
+                self._after_write(q._table)
+        if q._single or q._maybe_single:
+            if len(data) != 1:
+                if q._maybe_single and not data:
+                    return None
+                raise FakeAPIError("JSON object requested, multiple (or no) rows returned", "PGRST116")
+            data = data[0]
+        return FakeResponse(data, count)
+
+    def _run(self, q):
+        table = self.tables[q._table]
+        payload = q._payload
+        if q._op in ("insert", "upsert"):
+            items = payload if isinstance(payload, list) else [payload]
+            out = []
+            for item in items:
+                if q._op == "upsert":
+                    cols = [c.strip() for c in (q._on_conflict or "id").split(",")]
+                    existing = None
+                    if all(item.get(c) is not None for c in cols):
+                        existing = next((r for r in table if all(r.get(c) == item[c] for c in cols)), None)
+                    if existing is not None:
+                        if not q._ignore:
+                            out.append(dict(self._update(q._table, existing, item)))
+                        continue
+                out.append(dict(self._insert(q._table, item)))
+            return out, None
+
+        matched = [r for r in table if all(f(r) for f in q._filters)]
+        if q._op == "update":
+            return [dict(self._update(q._table, r, payload)) for r in matched], None
+        if q._op == "delete":
+            ids = set(map(id, matched))
+            table[:] = [r for r in table if id(r) not in ids]
+            return [dict(r) for r in matched], None
+
+        rows = self._project(q, matched)
+        count = len(rows) if q._count else None
+        for col, desc in reversed(q._order):
+            present = [r for r in rows if r.get(col) is not None]
+            missing = [r for r in rows if r.get(col) is None]
+            present.sort(key=lambda r: _norm(r[col], r[col])[0], reverse=desc)
+            rows = present + missing          # nulls last, as Postgres does for ASC
+        end = None if q._limit is None else q._offset + q._limit
+        return rows[q._offset:end], count
+
+    def _after_write(self, table):
+        # stand-in for the stats_rollup triggers in data/supabase.sql
+        if table in ("users", "submissions"):
+            _reconcile_stats(self)
+        if table == "submissions":
+            _recount_blobs(self)
+
+# --- server-side functions (data/supabase.sql) ---
+
+def _reconcile_stats(db):
+    rollup = Counter()
+    for u in db.tables["users"]:
+        rollup[("students", "")] += 1
+        rollup[("students", f"track:{u.get('track') or ''}")] += 1
+    for s in db.tables["submissions"]:
+        metrics = ("subs", "approved") if s.get("status") == "approved" else ("subs",)
+        for m in metrics:
+            rollup[(m, "")] += 1
+            rollup[(m, f"track:{s.get('track') or ''}")] += 1
+            qi = s.get("quest_idx")
+            rollup[(m, f"quest:{'' if qi is None else qi}")] += 1
+    db.tables["stats_rollup"] = [{"metric": m, "dim": d, "n": n} for (m, d), n in rollup.items()]
+    return None
+
+def _recount_blobs(db):
+    # stand-in for trg_blobs_ref
+    refs = Counter(s.get("file_path") for s in db.tables["submissions"])
+    for b in db.tables["blobs"]:
+        b["refs"] = refs[b["path"]]
+
+_WORDS = re.compile(r"[^0-9a-z]+")
+
+def _search_subs(db, p_query, p_status=None, p_limit=25, p_offset=0):
+    # prefix match on every word, ts_rank-like weights (name/handles > title > text)
+    words = [w for w in _WORDS.split(p_query.lower()) if w]
+    users = {u["id"]: u for u in db.tables["users"]}
+    hits = []
+    for s in db.tables["submissions"]:
+        if p_status and s.get("status") != p_status:
+            continue
+        u = users.get(s.get("user_id"), {})
+        fields = [(1.0, " ".join(str(u.get(k) or "") for k in ("name", "telegram", "x"))),
+                  (0.4, s.get("title") or ""), (0.2, s.get("text") or "")]
+        toks = [(w, set(_WORDS.split(text.lower()))) for w, text in fields]
+        score, matched = 0.0, 0
+        for q in words:
+            got = [w for w, ts in toks if any(t.startswith(q) for t in ts)]
+            matched += bool(got)
+            score += sum(got)
+        if words and matched == len(words):
+            hits.append((score, s, u))
+    hits.sort(key=lambda h: (-h[0], -_ts(h[1]["created_at"]), h[1]["id"]))
+    cols = ("id", "user_id", "quest_idx", "title", "track", "status", "file_path", "thumb_path", "created_at",
+            "review_verdict", "review_confidence")
+    return [dict({c: s.get(c) for c in cols}, name=u.get("name"))
+            for _, s, u in hits[p_offset:p_offset + p_limit]]
+
+_FUNNEL_STAGE = {"profile_saved": lambda m: "profile",
+                 "submission_created": lambda m: f"quest_{m['quest_idx']}" if m.get("quest_idx") is not None else None,
+                 "submission_approved": lambda m: "approved"}
+
+def _bucket(ts: float, grain: str) -> str:
+    size = 3600 if grain == "hour" else 86400
+    return datetime.fromtimestamp(ts // size * size, timezone.utc).isoformat()
+
+def _refresh_funnel(db, p_cutoff):
+    state = next((r for r in db.tables["rollup_state"] if r["name"] == "funnel"), None)
+    if state is None:
+        state = db._insert("rollup_state", {"name": "funnel", "hwm": datetime.fromtimestamp(0, timezone.utc).isoformat()})
+    hwm, cutoff = _ts(state["hwm"]), _ts(p_cutoff)
+    if cutoff <= hwm:
+        return 0
+    users = {u["id"]: u for u in db.tables["users"]}
+    seen = {(f["user_id"], f["stage"]) for f in db.tables["funnel_seen"]}
+    new = {}
+    for e in db.tables["events"]:
+        ts, u, stage_of = _ts(e["ts"]), users.get(e.get("user_id")), _FUNNEL_STAGE.get(e.get("type"))
+        if not (hwm < ts <= cutoff and u and stage_of):
+            continue
+        meta = e.get("meta_json") or {}
+        stage = stage_of(meta)
+        key = (u["id"], stage)
+        if stage and key not in seen and (key not in new or ts < new[key][0]):
+            new[key] = (ts, meta.get("track") or u.get("track") or "", u.get("uni") or "")
+    rollup = {(r["grain"], r["bucket"], r["stage"], r["track"], r["uni"]): r for r in db.tables["funnel_rollup"]}
+    for (uid, stage), (ts, track, uni) in new.items():
+        db._insert("funnel_seen", {"user_id": uid, "stage": stage, "ts": datetime.fromtimestamp(ts, timezone.utc).isoformat()})
+        for grain in ("hour", "day"):
+            key = (grain, _bucket(ts, grain), stage, track, uni)
+            if key not in rollup:
+                rollup[key] = db._insert("funnel_rollup", dict(zip(("grain", "bucket", "stage", "track", "uni"), key), users=0))
+            rollup[key]["users"] += 1
+    state["hwm"] = p_cutoff
+    return len(new)
+
+def _export_watermark(db):
+    def latest(table):
+        vals = [r["updated_at"] for r in db.tables[table] if r.get("updated_at")]
+        return max(vals, key=_ts) if vals else None
+    return [latest("users"), latest("submissions"), len(db.tables["users"]), len(db.tables["submissions"])]
@@ -0,0 +1,61 @@
+# src/images.py
+import io, os
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+MAX_SIDE = int(os.getenv("PROOF_MAX_SIDE", "2048"))      # longest edge kept for the stored original
+THUMB_SIDE = int(os.getenv("PROOF_THUMB_SIDE", "320"))   # longest edge of the review thumbnail
+JPEG_QUALITY = int(os.getenv("PROOF_JPEG_QUALITY", "85"))
+
+# format Pillow detected -> (extension, content type); anything else is stored as PNG
+FORMATS = {"PNG": ("png", "image/png"), "JPEG": ("jpg", "image/jpeg"), "WEBP": ("webp", "image/webp")}
+
+def _flatten(img: "Image.Image") -> "Image.Image":
+    # JPEG has no alpha: composite onto white instead of letting it go black
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        from PIL import Image
+        img = img.convert("RGBA")
+        bg = Image.new("RGB", img.size, (255, 255, 255))
+        bg.paste(img, mask=img.getchannel("A"))
+        return bg
+    return img.convert("RGB") if img.mode != "RGB" else img
+
+def _encode(img: "Image.Image", fmt: str) -> bytes:
+    # saving without exif=/pnginfo= drops EXIF, GPS and text chunks
+    buf = io.BytesIO()
+    if fmt == "JPEG":
+        _flatten(img).save(buf, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    elif fmt == "WEBP":
+        img.save(buf, "WEBP", quality=JPEG_QUALITY)
+    else:
+        if img.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+            img = img.convert("RGBA")
+        img.save(buf, "PNG", optimize=True)
+    return buf.getvalue()
+
+def normalize_image(data) -> dict:
+    """Decode an uploaded proof and re-encode it for storage.
+
+    Returns {"original", "ext", "content_type", "thumb", "thumb_ext",
+    "thumb_type"}: the image in its real format with metadata stripped,
+    EXIF rotation applied and the long edge capped at MAX_SIDE, plus a
+    THUMB_SIDE JPEG thumbnail. Raises ValueError if it isn't an image.
+    """
+    from PIL import Image, ImageOps    # imported on the first upload, not at app start
+    try:
+        img = Image.open(data if hasattr(data, "read") else io.BytesIO(data))
+        img.load()
+    except Exception as e:
+        raise ValueError(f"Unsupported image: {e}") from e
+    fmt = img.format if img.format in FORMATS else "PNG"
+    img = ImageOps.exif_transpose(img)       # bake rotation in before EXIF is dropped
+    img.thumbnail((MAX_SIDE, MAX_SIDE))      # only ever shrinks
+    thumb = _flatten(img.copy())
+    thumb.thumbnail((THUMB_SIDE, THUMB_SIDE))
+    ext, content_type = FORMATS[fmt]
+    return {
+        "original": _encode(img, fmt), "ext": ext, "content_type": content_type,
+        "thumb": _encode(thumb, "JPEG"), "thumb_ext": "jpg", "thumb_type": "image/jpeg",
+    }
@@ -0,0 +1,34 @@
+# src/maintenance.py
+"""One-off maintenance commands for the SQLite database, kept off the page
+hot path.
+
+    python -m src.maintenance dedupe --dry-run          # what would be merged
+    python -m src.maintenance dedupe                    # merge, one transaction
+    python -m src.maintenance dedupe --normalized       # also "@Ada" == "t.me/ada" == "ada"
+"""
+import argparse, json, time
+from . import db_sqlite
+
+def dedupe(dry_run: bool = False, normalized: bool = False) -> dict:
+    db_sqlite.db_init()
+    t0 = time.perf_counter()
+    with db_sqlite.transaction() as con:
+        stats = db_sqlite.merge_duplicate_users(con, dry_run=dry_run, normalized=normalized)
+    stats["ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    return stats
+
+def main():
+    ap = argparse.ArgumentParser(prog="python -m src.maintenance")
+    ap.add_argument("--db", help="database file (default: DB_PATH)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    d = sub.add_parser("dedupe", help="merge users that share a Telegram or X handle")
+    d.add_argument("--dry-run", action="store_true", help="report what would be merged, change nothing")
+    d.add_argument("--normalized", action="store_true", help="compare handles in canonical form (case, @, t.me/x.com links)")
+    args = ap.parse_args()
+    if args.db:
+        db_sqlite.configure(args.db)
+    if args.cmd == "dedupe":
+        print(json.dumps(dedupe(args.dry_run, args.normalized), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# src/metrics.py
+import atexit, threading, time
+
+# latency histogram upper bounds in ms; the last bucket catches everything slower
+BUCKETS_MS = [100, 250, 500, 1000, 2000, 5000, 10000, 20000, float("inf")]
+COUNTERS = ["calls", "ok", "timeouts", "parse_errors", "errors", "coalesced", "fallbacks",
+            "prompt_tokens", "completion_tokens", "latency_ms_sum"]
+
+def _empty():
+    return dict({k: 0 for k in COUNTERS}, buckets=[0] * len(BUCKETS_MS))
+
+class LLMMetrics:
+    """In-memory counters per (fn, track) in front of a backend's
+    save_llm_metrics(rows).
+
+    record()/fallback() only touch a dict under a lock. A daemon thread hands
+    the deltas accumulated since the last flush to the sink every
+    `flush_interval` seconds (and at interpreter exit); the DB keeps one
+    row per (flush, fn, track), which fold() sums back up.
+    """
+
+    def __init__(self, sink, flush_interval: float = 60.0):
+        self._sink = sink                  # callable(list of row dicts)
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending = {}                 # (fn, track) -> counters since last flush
+        self._thread = None
+
+    def _bucket(self, fn, track):
+        if self._thread is None:
+            self._start()
+        return self._pending.setdefault((fn, track or ""), _empty())
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True, name="llm-metrics")
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def record(self, fn, track, outcome, latency_ms=None, usage=None):
+        """One completion request. outcome: ok | timeout | parse_error | error | coalesced."""
+        with self._lock:
+            b = self._bucket(fn, track)
+            if outcome == "coalesced":
+                b["coalesced"] += 1
+                return
+            b["calls"] += 1
+            b[{"ok": "ok", "timeout": "timeouts", "parse_error": "parse_errors"}.get(outcome, "errors")] += 1
+            if latency_ms is not None:
+                b["latency_ms_sum"] += int(latency_ms)
+                b["buckets"][next(i for i, ub in enumerate(BUCKETS_MS) if latency_ms <= ub)] += 1
+            if usage is not None:
+                b["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+                b["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+
+    def fallback(self, fn, track):
+        """The caller served a hardcoded/default answer instead of the model's."""
+        with self._lock:
+            self._bucket(fn, track)["fallbacks"] += 1
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        ts = time.time()
+        rows = [dict(c, ts=ts, fn=fn, track=track) for (fn, track), c in pending.items()]
+        try:
+            self._sink(rows)
+        except Exception as e:
+            print("llm_metrics_flush_error:", e)
+            with self._lock:               # keep the deltas for the next attempt
+                for (fn, track), c in pending.items():
+                    b = self._pending.setdefault((fn, track), _empty())
+                    for k in COUNTERS:
+                        b[k] += c[k]
+                    b["buckets"] = [x + y for x, y in zip(b["buckets"], c["buckets"])]
+
+    def pending(self):
+        """Unflushed counters of this process, as rows fold() accepts."""
+        with self._lock:
+            return [dict(c, fn=fn, track=track, buckets=list(c["buckets"]))
+                    for (fn, track), c in self._pending.items()]
+
+def _quantile(buckets, q):
+    # upper bound of the bucket holding the q-th call (None past the last bound)
+    total = sum(buckets)
+    if not total:
+        return None
+    seen = 0
+    for ub, n in zip(BUCKETS_MS, buckets):
+        seen += n
+        if seen >= q * total:
+            return None if ub == float("inf") else ub
+    return None
+
+def fold(rows):
+    """Sum stored metric rows per (fn, track) and derive average and p50/p95
+    latency (bucket upper bounds)."""
+    out = {}
+    for r in rows:
+        key = (r["fn"], r.get("track") or "")
+        b = out.setdefault(key, _empty())
+        for k in COUNTERS:
+            b[k] += r.get(k) or 0
+        b["buckets"] = [x + y for x, y in zip(b["buckets"], r.get("buckets") or [0] * len(BUCKETS_MS))]
+    result = []
+    for (fn, track), b in sorted(out.items()):
+        calls = b["calls"]
+        result.append(dict(
+            b, fn=fn, track=track,
+            avg_ms=round(b["latency_ms_sum"] / calls) if calls else None,
+            p50_ms=_quantile(b["buckets"], 0.5), p95_ms=_quantile(b["buckets"], 0.95),
+        ))
+    return result
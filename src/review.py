@@ -0,0 +1,223 @@
+# src/review.py
+"""Batch pre-review of pending submissions against prompts/quest_rubrics.json.
+
+Cheap local checks run first: handle matches for the Telegram/X quests, and
+link shape (src.utils.is_url plus the hosts each track's rubric accepts),
+transaction hashes and uploads for the micro-quest. They settle Q1/Q2 and
+empty proofs on their own; the rest go to the LLM with the track's rubric
+and the check findings, REVIEW_CONCURRENCY at a time on src/agent's loop.
+
+Verdicts ({verdict: approve|reject|unsure, confidence, reason, source}) are
+cached by a hash of everything they depend on (rubric, quest, proof text,
+the content-addressed upload, the owner's handle), so re-running over the
+same proofs makes no LLM calls. The latest verdict is also stored on the
+submission for the admin queue to sort on or auto-approve.
+"""
+import os, re, json, asyncio, hashlib
+from urllib.parse import urlparse
+from typing import Dict, List, Optional
+from . import agent, db
+from .utils import is_url, normalize_handle
+
+RUBRICS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prompts", "quest_rubrics.json")
+# Bump when the checks or the prompt change so cached verdicts are redone.
+REVIEW_VERSION = "v2"
+# review calls in flight; they also hold agent's process-wide LLM_CONCURRENCY
+# slots, so the default leaves half of those to students' own requests
+REVIEW_CONCURRENCY = int(os.getenv("REVIEW_CONCURRENCY", str(max(1, agent.LLM_CONCURRENCY // 2))))
+REVIEW_AUTO_APPROVE = float(os.getenv("REVIEW_AUTO_APPROVE", "0.9"))   # default auto-approve threshold
+VERDICTS = ("approve", "reject", "unsure")
+# a handle match is only text: kept under the auto-approve bar so someone
+# still looks (the screenshot, if any, is never inspected)
+HANDLE_MATCH_CONFIDENCE = min(0.85, REVIEW_AUTO_APPROVE - 0.05)
+
+# what each track's rubric accepts, in checkable form
+ARTIFACT_HOSTS = {
+    "AI/Data": ("colab.research.google.com", "gist.github.com"),
+    "Dev": ("github.com", "gist.github.com", "github.dev", "app.github.dev",
+            "explorer.solana.com", "solscan.io", "solana.fm"),
+    "Design": ("figma.com", "imgur.com", "i.imgur.com"),
+    "Growth": ("x.com", "twitter.com", "linkedin.com", "docs.google.com", "notion.so", "notion.site"),
+}
+IMAGE_TRACKS = {"AI/Data", "Dev", "Design"}
+IMAGE_LINK = re.compile(r"\.(png|jpe?g)(\?|$)", re.I)
+SOL_SIG = re.compile(r"\b[1-9A-HJ-NP-Za-km-z]{86,88}\b")     # base58 transaction signature
+EVM_TX = re.compile(r"\b0x[0-9a-fA-F]{64}\b")
+URLS = re.compile(r"\S+://\S+")
+
+_rubrics = None
+
+def rubrics() -> Dict[str, str]:
+    global _rubrics
+    if _rubrics is None:
+        with open(RUBRICS_PATH, encoding="utf-8") as f:
+            _rubrics = json.load(f)
+    return _rubrics
+
+def _verdict(verdict, confidence, reason, source="local"):
+    return {"verdict": verdict, "confidence": round(float(confidence), 2), "reason": reason, "source": source}
+
+# --- local checks ---
+
+def _norm(value, kind):
+    try:
+        return normalize_handle(value, kind)
+    except ValueError:
+        return None
+
+def _handle_check(sub, kind: str):
+    # profile handles may be stored raw ("@Ada_TG"): compare normalized forms
+    raw, text = sub.get(kind), (sub.get("text") or "").strip()
+    want = _norm(raw, kind) or (raw or "").strip().lstrip("@").lower() or None
+    found = []
+    for tok in re.split(r"[\s,;]+", text):
+        h = _norm(tok, kind)
+        if h:
+            found.append(h)
+    shot = bool(sub.get("file_path"))
+    if want and want in found:
+        return _verdict("approve", HANDLE_MATCH_CONFIDENCE,
+                        "handle matches the profile" + (" (screenshot not checked)" if shot else ""))
+    if found:
+        return _verdict("unsure", 0.4, f"handle @{found[0]} differs from the profile's @{want or '—'}")
+    if shot:
+        return _verdict("unsure", 0.5, "screenshot only; check it by eye")
+    return _verdict("reject", 0.9, "no handle or screenshot")
+
+def _artifact_findings(sub) -> List[str]:
+    track, text = sub.get("track") or "", (sub.get("text") or "").strip()
+    hosts, out = ARTIFACT_HOSTS.get(track, ()), []
+    for url in URLS.findall(text):
+        host = (urlparse(url).hostname or "").lower().removeprefix("www.")
+        if not is_url(url) or not host or "." not in host:
+            out.append(f"malformed link: {url[:80]}")
+        elif any(host == h or host.endswith("." + h) for h in hosts):
+            out.append(f"accepted artifact: link to {host}")
+        elif IMAGE_LINK.search(url) and track in IMAGE_TRACKS:
+            out.append(f"accepted artifact: image link on {host}")
+        else:
+            out.append(f"link to {host} (not a host the rubric names)")
+    if SOL_SIG.search(text) or EVM_TX.search(text):
+        out.append("accepted artifact: transaction hash" if track == "Dev" else "transaction hash")
+    if sub.get("file_path"):
+        out.append("accepted artifact: uploaded image" if track in IMAGE_TRACKS
+                   else "uploaded image (rubric asks for a link)")
+    if not out:
+        out.append(f"no artifact: text only ({len(text)} chars)")
+    return out
+
+def local_review(sub):
+    """(verdict or None, findings). A verdict means no LLM call is needed."""
+    qi = sub.get("quest_idx")
+    if qi in (1, 2):
+        return _handle_check(sub, "telegram" if qi == 1 else "x"), []
+    if not (sub.get("text") or "").strip() and not sub.get("file_path"):
+        return _verdict("reject", 0.95, "empty proof"), []
+    return None, _artifact_findings(sub)
+
+def content_hash(sub) -> str:
+    qi, track = sub.get("quest_idx"), sub.get("track") or ""
+    handle = sub.get("telegram") if qi == 1 else sub.get("x") if qi == 2 else None
+    key = [REVIEW_VERSION, os.getenv("OPENAI_MODEL", "gpt-4o-mini"), rubrics().get(track, ""),
+           qi, sub.get("title"), track, (sub.get("text") or "").strip(), sub.get("file_path"), handle]
+    return hashlib.sha256(json.dumps(key).encode("utf-8")).hexdigest()
+
+# --- LLM ---
+
+def _prompt(sub, findings) -> str:
+    track = sub.get("track") or ""
+    return (
+        "You review proofs for a student onboarding sprint.\n"
+        f"Track: {track}\nQuest: {sub.get('title')}\n"
+        f"Acceptance rubric: {rubrics().get(track, 'a shareable artifact that shows the quest was done')}\n"
+        f"Proof text: {json.dumps((sub.get('text') or '')[:2000])}\n"
+        f"Screenshot uploaded: {'yes (you cannot see it)' if sub.get('file_path') else 'no'}\n"
+        f"Automatic checks: {'; '.join(findings)}\n"
+        "Return JSON {\"verdict\": \"approve\"|\"reject\"|\"unsure\", \"confidence\": 0..1, \"reason\": \"...\"}."
+    )
+
+async def _allm(sub, findings, sem) -> Optional[Dict]:
+    async with sem:
+        try:
+            data = await agent._achat(_prompt(sub, findings), 0.0, "review", sub.get("track") or "") or {}
+        except Exception as e:
+            print("review_error:", repr(e))
+            return None
+    v = str(data.get("verdict", "")).lower()
+    try:
+        conf = min(max(float(data.get("confidence")), 0.0), 1.0)
+    except (TypeError, ValueError):
+        return None
+    if v not in VERDICTS:
+        return None
+    return _verdict(v, conf, str(data.get("reason") or "")[:300], "llm")
+
+async def _allm_batch(items):
+    sem = asyncio.Semaphore(REVIEW_CONCURRENCY)
+    return await asyncio.gather(*(_allm(sub, findings, sem) for sub, findings in items))
+
+# --- batch worker ---
+
+def review_pending(limit: Optional[int] = None, force: bool = False, page_size: int = 200) -> Dict:
+    """Pre-review pending submissions (all, or the newest `limit`); ones that
+    already carry a verdict are skipped unless `force`. Rows that need the
+    LLM get no verdict while it is not configured (`no_llm`) or its call
+    fails (`llm_failed`), so the next run picks them up again. Returns counts."""
+    stats = {"seen": 0, "cached": 0, "local": 0, "llm": 0, "llm_failed": 0, "no_llm": 0,
+             "approve": 0, "reject": 0, "unsure": 0}
+    use_llm = agent.llm_enabled()
+    cursor = None
+    while True:
+        rows, cursor = db.list_review_batch(page_size, cursor)
+        if limit is not None:
+            rows = rows[:max(limit - stats["seen"], 0)]
+        stats["seen"] += len(rows)
+        todo = [r for r in rows if force or not r.get("review_verdict")]
+        hashes = {r["id"]: content_hash(r) for r in todo}
+        cached = db.get_review_cache(hashes.values()) if todo else {}
+        results, fresh, ask = {}, [], []
+        for r in todo:
+            hit = cached.get(hashes[r["id"]])
+            if hit:
+                results[r["id"]] = hit; stats["cached"] += 1
+                continue
+            verdict, findings = local_review(r)
+            if verdict:
+                results[r["id"]] = verdict; stats["local"] += 1
+                fresh.append(dict(verdict, hash=hashes[r["id"]]))
+            elif use_llm:
+                ask.append((r, findings))
+            else:
+                stats["no_llm"] += 1
+        if ask:
+            answers = asyncio.run_coroutine_threadsafe(_allm_batch(ask), agent._get_loop()).result()
+            for (r, _), v in zip(ask, answers):
+                if v is None:
+                    stats["llm_failed"] += 1
+                    continue
+                stats["llm"] += 1
+                fresh.append(dict(v, hash=hashes[r["id"]]))
+                results[r["id"]] = v
+        if fresh:
+            db.save_review_cache(fresh)
+        if results:
+            db.set_reviews([(sid, v["verdict"], v["confidence"]) for sid, v in results.items()])
+        for v in results.values():
+            stats[v["verdict"]] += 1
+        if cursor is None or (limit is not None and stats["seen"] >= limit):
+            return stats
+
+def confident(threshold: float = REVIEW_AUTO_APPROVE) -> List[str]:
+    """Ids of pending submissions pre-reviewed as approve with confidence >=
+    threshold (an id-only query on a partial index, cheap enough per rerun)."""
+    return db.confident_review_ids(threshold)
+
+def auto_approve(threshold: float = REVIEW_AUTO_APPROVE) -> int:
+    """Approve every pending submission confident() returns; returns the count."""
+    ids = confident(threshold)
+    return db.admin_set_status_many(ids, "approved") if ids else 0
+
+def sort_key(row) -> float:
+    """Likely approvals first, likely rejections last, unreviewed in the middle."""
+    v, c = row.get("review_verdict"), row.get("review_confidence") or 0.5
+    return -(c if v == "approve" else 1 - c if v == "reject" else 0.5)
@@ -0,0 +1,51 @@
+# src/uploads.py
+"""Proof uploads are taken as file-like objects (a Streamlit UploadedFile,
+an open file, or plain bytes) and read exactly once, on submit: spool()
+copies them in UPLOAD_CHUNK pieces into a SpooledTemporaryFile (memory up to
+UPLOAD_SPOOL_BYTES, then a temp file), hashing as it goes and stopping as
+soon as MAX_UPLOAD_BYTES is passed. The backends hand that file to
+normalize_image() and key the stored blob by the hash, so no full-size copy
+of the upload is ever held as `bytes`.
+"""
+import io, os, hashlib, tempfile
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))   # per proof file
+UPLOAD_SPOOL_BYTES = int(os.getenv("UPLOAD_SPOOL_BYTES", str(1024 * 1024)))     # in memory below this
+UPLOAD_CHUNK = 64 * 1024
+
+class UploadTooLarge(ValueError):
+    pass
+
+def _too_large(max_bytes, size=None) -> UploadTooLarge:
+    limit = f"the limit is {max_bytes / 1048576:g} MB"
+    return UploadTooLarge(f"File is {size / 1048576:.1f} MB; {limit}." if size else f"File is too large; {limit}.")
+
+def spool(file, max_bytes: int = None):
+    """(SpooledTemporaryFile positioned at 0, sha256 hex, size) for `file`.
+    Raises UploadTooLarge past `max_bytes` (MAX_UPLOAD_BYTES), before reading
+    at all when the object knows its size. The caller closes the spool."""
+    max_bytes = MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    if isinstance(file, (bytes, bytearray, memoryview)):
+        file = io.BytesIO(file)
+    size = getattr(file, "size", None)          # Streamlit's UploadedFile
+    if isinstance(size, int) and size > max_bytes:
+        raise _too_large(max_bytes, size)
+    if hasattr(file, "seek"):
+        file.seek(0)
+    out = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES, prefix="proof-")
+    h, n = hashlib.sha256(), 0
+    try:
+        while True:
+            chunk = file.read(UPLOAD_CHUNK)
+            if not chunk:
+                break
+            n += len(chunk)
+            if n > max_bytes:
+                raise _too_large(max_bytes)
+            h.update(chunk)
+            out.write(chunk)
+    except BaseException:
+        out.close()
+        raise
+    out.seek(0)
+    return out, h.hexdigest(), n
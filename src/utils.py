@@ -1,2 +1,53 @@
+import re
+
 def is_url(t):
     return isinstance(t,str) and t.startswith(("http://","https://"))
+
+def fold_stats(rows):
+    """Turn stats_rollup rows ((metric, dim, n) tuples or dicts) into the
+    recap_stats shape: totals plus by_track / by_quest breakdowns."""
+    out = {"students": 0, "subs": 0, "approved": 0, "by_track": {}, "by_quest": {}}
+    for r in rows:
+        metric, dim, n = (r["metric"], r["dim"], r["n"]) if isinstance(r, dict) else r
+        if not dim:
+            out[metric] = n
+            continue
+        kind, _, key = dim.partition(":")
+        if not key or not n:
+            continue
+        if kind == "quest":
+            key = int(key)
+        out[f"by_{kind}"].setdefault(key, {})[metric] = n
+    return out
+
+# Telegram usernames: 5-32 of [a-z0-9_]; X handles: 1-15. Both are
+# case-insensitive, so they are stored lowercased.
+_HANDLE_RULES = {"telegram": (re.compile(r"^[a-z0-9_]{5,32}$"), ("t.me/", "telegram.me/")),
+                 "x": (re.compile(r"^[a-z0-9_]{1,15}$"), ("x.com/", "twitter.com/"))}
+
+def normalize_handle(value, kind: str):
+    """Canonical telegram/x handle from user input ("@Ada", "https://t.me/ada",
+    " ada "): lowercased, without @ or URL. None when empty; ValueError when
+    it can't be a valid handle."""
+    h = (value or "").strip().lower()
+    pattern, hosts = _HANDLE_RULES[kind]
+    h = re.sub(r"^(https?://)?(www\.)?", "", h)
+    for host in hosts:
+        if h.startswith(host):
+            h = h[len(host):].split("/")[0].split("?")[0]
+            break
+    h = h.lstrip("@")
+    if not h:
+        return None
+    if not pattern.match(h):
+        raise ValueError(f"invalid {'Telegram' if kind == 'telegram' else 'X'} handle: {value!r}")
+    return h
+
+def handle_key(value, kind: str):
+    """normalize_handle() for lookups: a value that isn't a valid handle is
+    only trimmed, lowercased and stripped of a leading @ (the key that
+    `dedupe --normalized` and the handle migration use) instead of raising."""
+    try:
+        return normalize_handle(value, kind)
+    except ValueError:
+        return (value or "").strip().lstrip("@").lower() or None